@@ -1 +1,5 @@
-# This file makes the src directory a Python package 
\ No newline at end of file
+"""Crypto deep research agent package."""
+from dotenv import load_dotenv
+
+# Load .env before any src module reads its settings at import time
+load_dotenv()
@@ -0,0 +1,442 @@
+"""Local market analytics computed from cached price series."""
+
+import asyncio
+import hashlib
+import json
+import os
+import re
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+from langchain_core.tools import tool
+
+from src.cache import MISS, TTLCache
+from src.metrics import metrics
+
+##########################
+# Market Analytics
+##########################
+MIN_SERIES_POINTS = 10
+SERIES_STORE_TTL_SECONDS = float(os.getenv("SERIES_STORE_TTL_SECONDS", "1800"))
+DEFAULT_WINDOWS = ["1h", "24h", "7d"]
+TOP_MOVERS = 5
+
+_WINDOW = re.compile(r"^(\d+)\s*(m|h|d|w)$")
+_WINDOW_SECONDS = {"m": 60, "h": 3600, "d": 86400, "w": 7 * 86400}
+_MOVER_FIELD = re.compile(r"(price_)?change_(percentage_)?24h(_in_currency)?$|percent_change_24h$", re.IGNORECASE)
+_NAME_FIELDS = ("symbol", "name", "id")
+VOLUME_FIELDS = ("total_volumes", "volumes")
+# Series that are not prices: only summarized, never given price indicators
+LEVEL_FIELDS = ("market_caps", "market_cap") + VOLUME_FIELDS
+
+# Raw series behind each digest, so follow-up analytics never need the numbers in the prompt
+series_store = TTLCache(max_entries=int(os.getenv("SERIES_STORE_MAX_ENTRIES", "256")))
+
+
+@dataclass
+class Series:
+    """One price series; `high`, `low` and `volume` are optional."""
+    close: np.ndarray
+    timestamps: Optional[np.ndarray] = None
+    high: Optional[np.ndarray] = None
+    low: Optional[np.ndarray] = None
+    volume: Optional[np.ndarray] = None
+
+    def to_json(self) -> dict:
+        """Serialize the series to JSON-compatible lists."""
+        return {k: (v.tolist() if v is not None else None) for k, v in
+                (("close", self.close), ("timestamps", self.timestamps), ("high", self.high),
+                 ("low", self.low), ("volume", self.volume))}
+
+    @classmethod
+    def from_json(cls, data: dict) -> "Series":
+        """Rebuild a series serialized by `to_json`."""
+        return cls(**{k: (np.asarray(v, dtype=float) if v is not None else None) for k, v in data.items()})
+
+
+##########################
+# Series detection
+##########################
+def _is_number(value: Any) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def _seconds(timestamps: np.ndarray) -> np.ndarray:
+    # CoinGecko and most APIs use milliseconds
+    return timestamps / 1000.0 if timestamps.size and np.nanmax(timestamps) > 1e11 else timestamps
+
+
+def _pairs(value: Any) -> Optional[np.ndarray]:
+    """[[ts, v], ...] or [[ts, o, h, l, c(, v)], ...] as a float array."""
+    if not isinstance(value, list) or len(value) < MIN_SERIES_POINTS:
+        return None
+    width = len(value[0]) if isinstance(value[0], list) else 0
+    if width not in (2, 5, 6):
+        return None
+    if not all(isinstance(row, list) and len(row) == width and all(_is_number(x) for x in row) for row in value):
+        return None
+    return np.asarray(value, dtype=float)
+
+
+def series_from_value(value: Any, siblings: Optional[dict] = None) -> Optional[Series]:
+    """Recognise a price series in a JSON value.
+
+    Supports `[[ts, price], ...]` (with volumes from a sibling
+    `total_volumes`/`volumes` key when `value` is the sibling `prices`), `[[ts, o, h, l, c(, v)], ...]`, lists of
+    `{time, open, high, low, close, volume}` / `{timestamp, price}` records
+    and plain lists of prices.
+
+    Args:
+        value: JSON value
+        siblings: The dict containing `value`, to find matching volumes
+
+    Returns:
+        Optional[Series]: The series, or None
+    """
+    array = _pairs(value)
+    if array is not None:
+        if array.shape[1] == 2:
+            volume = None
+            # Only a `prices` series is weighted by the trading volume next to it
+            volume_keys = VOLUME_FIELDS if siblings and siblings.get("prices") is value else ()
+            for key in volume_keys:
+                vol = _pairs((siblings or {}).get(key))
+                if vol is not None and len(vol) == len(array) and vol is not value:
+                    volume = vol[:, 1]
+            return Series(close=array[:, 1], timestamps=_seconds(array[:, 0]), volume=volume)
+        return Series(close=array[:, 4], timestamps=_seconds(array[:, 0]), high=array[:, 2], low=array[:, 3],
+                      volume=array[:, 5] if array.shape[1] == 6 else None)
+
+    if not isinstance(value, list) or len(value) < MIN_SERIES_POINTS:
+        return None
+    if all(_is_number(v) for v in value):
+        return Series(close=np.asarray(value, dtype=float))
+    if all(isinstance(v, dict) for v in value):
+        close_key = next((k for k in ("close", "price", "c") if all(_is_number(v.get(k)) for v in value)), None)
+        if close_key is None:
+            return None
+        time_key = next((k for k in ("timestamp", "time", "t", "date") if all(_is_number(v.get(k)) for v in value)), None)
+
+        def column(key):
+            return np.asarray([v[key] for v in value], dtype=float) if all(_is_number(v.get(key)) for v in value) else None
+
+        return Series(
+            close=column(close_key),
+            timestamps=_seconds(column(time_key)) if time_key else None,
+            high=column("high"),
+            low=column("low"),
+            volume=column("volume"),
+        )
+    return None
+
+
+##########################
+# Batched indicators
+##########################
+def _ema(values: np.ndarray, alpha: float) -> np.ndarray:
+    """Exponential moving average along the last axis, for every row at once."""
+    out = np.empty_like(values)
+    out[..., 0] = values[..., 0]
+    for i in range(1, values.shape[-1]):
+        out[..., i] = alpha * values[..., i] + (1 - alpha) * out[..., i - 1]
+    return out
+
+
+def _rsi(close: np.ndarray, period: int = 14) -> np.ndarray:
+    delta = np.diff(close, axis=1)
+    gains = _ema(np.clip(delta, 0, None), 1 / period)[:, -1]
+    losses = _ema(np.clip(-delta, 0, None), 1 / period)[:, -1]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        rsi = 100 - 100 / (1 + gains / losses)
+    return np.where(losses == 0, 100.0, rsi)
+
+
+def _iso(ts: Optional[float]) -> Optional[str]:
+    if ts is None or not np.isfinite(ts):
+        return None
+    return datetime.fromtimestamp(float(ts), tz=timezone.utc).strftime("%Y-%m-%d %H:%M UTC")
+
+
+def _interval(seconds: float) -> str:
+    for unit, size in (("d", 86400), ("h", 3600), ("m", 60)):
+        if seconds >= size:
+            return f"{seconds / size:g}{unit}"
+    return f"{seconds:g}s"
+
+
+def _round(value: Any) -> Any:
+    if value is None:
+        return None
+    value = float(value)
+    if not np.isfinite(value):
+        return None
+    return float(f"{value:.6g}")
+
+
+def _window_seconds(window: str) -> Optional[int]:
+    match = _WINDOW.match(window.strip().lower())
+    return int(match.group(1)) * _WINDOW_SECONDS[match.group(2)] if match else None
+
+
+def analyze_series(series: Dict[str, Series], windows: Optional[List[str]] = None) -> Dict[str, dict]:
+    """Compute analytics for many series in one batched pass.
+
+    Series of equal length are stacked into one matrix, so returns,
+    volatility, drawdown, VWAP, RSI(14) and MACD(12, 26, 9) are computed for
+    all of them with array operations.
+
+    Args:
+        series: {name: Series}
+        windows: Trailing return windows such as "1h", "12h", "7d"
+
+    Returns:
+        Dict[str, dict]: Compact numeric digest per series name
+    """
+    windows = windows or DEFAULT_WINDOWS
+    groups: Dict[int, List[str]] = {}
+    for name, s in series.items():
+        if s.close is not None and len(s.close) >= 2:
+            groups.setdefault(len(s.close), []).append(name)
+
+    results: Dict[str, dict] = {}
+    for length, names in groups.items():
+        close = np.vstack([series[n].close for n in names])
+        with np.errstate(divide="ignore", invalid="ignore"):
+            log_returns = np.diff(np.log(close), axis=1)
+            change_pct = (close[:, -1] / close[:, 0] - 1) * 100
+            volatility = np.std(log_returns, axis=1, ddof=1) * 100 if length > 2 else np.full(len(names), np.nan)
+            drawdown = close / np.maximum.accumulate(close, axis=1) - 1
+        trough = drawdown.argmin(axis=1)
+        ema12, ema26 = _ema(close, 2 / 13), _ema(close, 2 / 27)
+        macd = ema12 - ema26
+        signal = _ema(macd, 2 / 10)
+        rsi = _rsi(close) if length > 14 else np.full(len(names), np.nan)
+
+        for row, name in enumerate(names):
+            s = series[name]
+            c = close[row]
+            digest = {
+                "points": length,
+                "first": _round(c[0]),
+                "last": _round(c[-1]),
+                "high": _round(np.nanmax(s.high if s.high is not None else c)),
+                "low": _round(np.nanmin(s.low if s.low is not None else c)),
+                "change_pct": _round(change_pct[row]),
+                "volatility_pct_per_interval": _round(volatility[row]),
+                "max_drawdown_pct": _round(drawdown[row, trough[row]] * 100),
+                "rsi_14": _round(rsi[row]),
+                "macd": {"line": _round(macd[row, -1]), "signal": _round(signal[row, -1]),
+                         "histogram": _round(macd[row, -1] - signal[row, -1])},
+            }
+            if s.volume is not None:
+                typical = (s.high + s.low + c) / 3 if s.high is not None and s.low is not None else c
+                total = np.nansum(s.volume)
+                digest["vwap"] = _round(np.nansum(typical * s.volume) / total) if total else None
+                digest["volume_total"] = _round(total)
+            t = s.timestamps
+            if t is not None and len(t) == length:
+                step = float(np.median(np.diff(t)))
+                peak = int(np.argmax(c[:trough[row] + 1]))
+                digest.update({
+                    "from": _iso(t[0]),
+                    "to": _iso(t[-1]),
+                    "interval": _interval(step),
+                    "drawdown_peak": _iso(t[peak]),
+                    "drawdown_trough": _iso(t[trough[row]]),
+                })
+                if step > 0 and np.isfinite(volatility[row]):
+                    periods_per_year = 365 * 86400 / step
+                    digest["annualized_volatility_pct"] = _round(volatility[row] * np.sqrt(periods_per_year))
+                returns = {}
+                for window in windows:
+                    seconds = _window_seconds(window)
+                    if seconds is None or t[-1] - t[0] < seconds * 0.95:
+                        continue
+                    start = int(np.searchsorted(t, t[-1] - seconds))
+                    returns[window] = _round((c[-1] / c[start] - 1) * 100)
+                if returns:
+                    digest["returns_pct"] = returns
+            results[name] = digest
+
+    metrics.incr("analytics.series", len(results))
+    return results
+
+
+def top_movers(changes: Dict[str, float], n: int = TOP_MOVERS) -> dict:
+    """Top gainers and losers by percentage change."""
+    names = list(changes)
+    if len(names) < 2:
+        return {}
+    values = np.asarray([changes[k] for k in names], dtype=float)
+    order = np.argsort(values)
+    n = min(n, len(names) // 2)
+    return {
+        "top_gainers": [{"name": names[i], "change_pct": _round(values[i])} for i in order[::-1][:n]],
+        "top_losers": [{"name": names[i], "change_pct": _round(values[i])} for i in order[:n]],
+    }
+
+
+##########################
+# Tool output digests
+##########################
+def _series_id(tool_name: str, path: str, s: Series) -> str:
+    payload = f"{tool_name}|{path}|{len(s.close)}|{s.close[0]}|{s.close[-1]}"
+    if s.timestamps is not None:
+        payload += f"|{s.timestamps[0]}|{s.timestamps[-1]}"
+    return "series_" + hashlib.sha1(payload.encode("utf-8")).hexdigest()[:12]
+
+
+def _level_summary(s: Series, volume: bool) -> dict:
+    """Last value and change of a non-price series (market caps, volumes), without price indicators."""
+    summary = {
+        "points": len(s.close),
+        "last": _round(s.close[-1]),
+        "change_pct": _round((s.close[-1] / s.close[0] - 1) * 100) if s.close[0] else None,
+    }
+    if volume:
+        summary["total"] = _round(np.nansum(s.close))
+    if s.timestamps is not None:
+        summary.update({"from": _iso(s.timestamps[0]), "to": _iso(s.timestamps[-1])})
+    return summary
+
+
+def _collect(value: Any, path: str, parent: Optional[dict], found: Dict[str, Series]) -> Any:
+    """Replace every price series in a JSON value with a placeholder path, collecting the series."""
+    s = series_from_value(value, parent)
+    if s is not None:
+        found[path] = s
+        return {"__series__": path}
+    if isinstance(value, dict):
+        has_prices = series_from_value(value.get("prices"), value) is not None
+        collected = {}
+        for k, v in value.items():
+            if k in LEVEL_FIELDS:
+                if has_prices and k in VOLUME_FIELDS:
+                    # Volumes next to prices are folded into the price digest (VWAP, volume_total)
+                    continue
+                level = series_from_value(v)
+                if level is not None:
+                    collected[k] = _level_summary(level, volume=k in VOLUME_FIELDS)
+                    continue
+            collected[k] = _collect(v, f"{path}.{k}" if path else k, value, found)
+        return collected
+    if isinstance(value, list):
+        return [_collect(v, f"{path}[{i}]", None, found) for i, v in enumerate(value)]
+    return value
+
+
+def _record_movers(value: Any) -> Dict[str, float]:
+    """24h changes from lists of coin records (markets, trending, categories)."""
+    changes: Dict[str, float] = {}
+    if isinstance(value, dict):
+        for child in value.values():
+            changes.update(_record_movers(child))
+    elif isinstance(value, list):
+        for item in value:
+            if isinstance(item, dict):
+                key = next((k for k in item if _MOVER_FIELD.search(k) and _is_number(item[k])), None)
+                name = next((item[f] for f in _NAME_FIELDS if isinstance(item.get(f), str)), None)
+                if key and name:
+                    changes[name] = float(item[key])
+                else:
+                    changes.update(_record_movers(item))
+            else:
+                changes.update(_record_movers(item))
+    return changes
+
+
+def digest_market_output(content: Any, tool_name: str) -> Any:
+    """Replace raw price series in a trading tool result with analytics digests.
+
+    Each price series is swapped for its digest plus a `series_id`; the raw
+    series is kept in `series_store` so `market_analytics` can compute other
+    windows from it. Market caps and volumes not folded into a price digest
+    only get their last value and change. Lists of coin records get a top
+    movers summary.
+
+    Args:
+        content: Tool result content
+        tool_name: Name of the tool that produced it
+
+    Returns:
+        The digested result as JSON text, or `content` unchanged when it holds no series
+    """
+    if not isinstance(content, str):
+        return content
+    try:
+        data = json.loads(content)
+    except (json.JSONDecodeError, ValueError):
+        return content
+    found: Dict[str, Series] = {}
+    skeleton = _collect(data, "", None, found)
+    movers = top_movers(_record_movers(data))
+    if not found and not movers and skeleton == data:
+        return content
+
+    digests = analyze_series(found)
+    for path, s in found.items():
+        series_id = _series_id(tool_name, path, s)
+        series_store.set(series_id, s.to_json(), SERIES_STORE_TTL_SECONDS)
+        digests[path]["series_id"] = series_id
+
+    def fill(value):
+        if isinstance(value, dict):
+            if set(value) == {"__series__"}:
+                return digests[value["__series__"]]
+            return {k: fill(v) for k, v in value.items()}
+        if isinstance(value, list):
+            return [fill(v) for v in value]
+        return value
+
+    result = fill(skeleton)
+    if movers:
+        result = {"data": result, "movers_24h": movers} if not isinstance(result, dict) else {**result, "movers_24h": movers}
+    output = json.dumps(result, ensure_ascii=False)
+    metrics.incr("analytics.chars_saved", max(0, len(content) - len(output)), tool=tool_name)
+    return output
+
+
+@tool
+async def market_analytics(series_ids: Optional[List[str]] = None, series: Optional[Dict[str, Any]] = None,
+                           windows: Optional[List[str]] = None) -> str:
+    """Compute price analytics locally: change, trailing returns, volatility, max drawdown, VWAP, RSI(14), MACD(12,26,9) and top movers.
+
+    Trading tool results already replace price series with a digest that has a `series_id`; pass those ids to get other
+    return windows or to compare several assets, without copying any prices. Only pass `series` for small data that has
+    no id, as {name: [[timestamp, price], ...]} or {name: [[timestamp, open, high, low, close, volume], ...]}.
+
+    Args:
+        series_ids: Ids from trading tool digests, e.g. ["series_3f2a9c1d0b7e"]
+        series: Inline series keyed by asset name
+        windows: Trailing return windows such as ["1h", "12h", "24h", "7d"]
+    """
+    collected: Dict[str, Series] = {}
+    missing = []
+    for series_id in series_ids or []:
+        stored = series_store.get(series_id)
+        if stored is MISS:
+            missing.append(series_id)
+        else:
+            collected[series_id] = Series.from_json(stored)
+    for name, value in (series or {}).items():
+        s = series_from_value(value, value if isinstance(value, dict) else None)
+        if s is None and isinstance(value, dict):
+            s = series_from_value(value.get("prices"), value)
+        if s is None:
+            missing.append(name)
+        else:
+            collected[name] = s
+    if not collected:
+        return json.dumps({"error": "No usable series. Pass series_ids from trading tool digests or at least "
+                                    f"{MIN_SERIES_POINTS} points per inline series.", "unknown": missing})
+
+    digests = await asyncio.to_thread(analyze_series, collected, windows)
+    result: Dict[str, Any] = {"series": digests}
+    movers = top_movers({name: d["change_pct"] for name, d in digests.items() if d.get("change_pct") is not None})
+    if movers:
+        result["movers"] = movers
+    if missing:
+        result["unknown"] = missing
+    return json.dumps(result, ensure_ascii=False)
@@ -0,0 +1,116 @@
+"""Per-run round, tool call and time budgets for the research agents."""
+
+import os
+import time
+from dataclasses import dataclass, fields, replace
+from typing import Optional
+
+from langchain_core.messages.utils import count_tokens_approximately
+from langchain_core.runnables import RunnableConfig
+
+from src.metrics import metrics
+
+##########################
+# Agent Budgets
+##########################
+# Time the forced final answer may take once the time budget is spent
+FINAL_ANSWER_GRACE_SECONDS = float(os.getenv("AGENT_FINAL_ANSWER_GRACE_SECONDS", "15"))
+
+
+@dataclass(frozen=True)
+class AgentBudget:
+    """Limits for one agent tool loop; None disables a limit."""
+    max_rounds: Optional[int] = int(os.getenv("AGENT_MAX_ROUNDS", "6"))
+    max_tool_calls: Optional[int] = int(os.getenv("AGENT_MAX_TOOL_CALLS", "20"))
+    max_prompt_tokens: Optional[int] = int(os.getenv("AGENT_MAX_PROMPT_TOKENS", "48000"))
+    max_seconds: Optional[float] = float(os.getenv("AGENT_MAX_SECONDS", "150"))
+
+    @classmethod
+    def from_config(cls, config: RunnableConfig, agent_name: str) -> "AgentBudget":
+        """Build the budget for an agent from `configurable.agent_budget`.
+
+        Top-level keys apply to every agent and a nested dict under the agent
+        name overrides them, e.g.
+        `{"max_rounds": 4, "flipside": {"max_seconds": 90}}`.
+
+        Args:
+            config: RunnableConfig of the current run
+            agent_name: Agent name, e.g. "heurist"
+
+        Returns:
+            AgentBudget: The effective budget
+        """
+        settings = (config or {}).get("configurable", {}).get("agent_budget") or {}
+        names = {f.name for f in fields(cls)}
+        overrides = {k: v for k, v in settings.items() if k in names}
+        overrides.update({k: v for k, v in (settings.get(agent_name) or {}).items() if k in names})
+        return replace(cls(), **overrides)
+
+
+class BudgetTracker:
+    """Tracks one agent run against its budget."""
+
+    def __init__(self, budget: AgentBudget, agent_name: str):
+        """Start tracking a budget for one agent run."""
+        self.budget = budget
+        self.agent_name = agent_name
+        self.started = time.monotonic()
+        self.rounds = 0
+        self.tool_calls = 0
+        self.prompt_tokens = 0
+
+    @property
+    def remaining_seconds(self) -> Optional[float]:
+        """Seconds left in the time budget, None without one."""
+        if self.budget.max_seconds is None:
+            return None
+        return max(0.0, self.budget.max_seconds - (time.monotonic() - self.started))
+
+    @property
+    def final_answer_seconds(self) -> Optional[float]:
+        """Time bound of the forced final answer: what is left of the budget, at least the grace period."""
+        remaining = self.remaining_seconds
+        return None if remaining is None else max(remaining, FINAL_ANSWER_GRACE_SECONDS)
+
+    @property
+    def remaining_tool_calls(self) -> Optional[int]:
+        """Tool calls left in the budget, None without a limit."""
+        if self.budget.max_tool_calls is None:
+            return None
+        return max(0, self.budget.max_tool_calls - self.tool_calls)
+
+    def exhausted(self, messages: list) -> Optional[str]:
+        """Check the budget before the next model round.
+
+        Args:
+            messages: The prompt about to be sent
+
+        Returns:
+            Optional[str]: The name of the exhausted budget, or None
+        """
+        self.prompt_tokens = count_tokens_approximately(messages)
+        budget = self.budget
+        reason = None
+        if budget.max_rounds is not None and self.rounds >= budget.max_rounds:
+            reason = "max_rounds"
+        elif budget.max_tool_calls is not None and self.tool_calls >= budget.max_tool_calls:
+            reason = "max_tool_calls"
+        elif budget.max_prompt_tokens is not None and self.prompt_tokens >= budget.max_prompt_tokens:
+            reason = "max_prompt_tokens"
+        elif self.remaining_seconds == 0.0:
+            reason = "max_seconds"
+        if reason:
+            metrics.incr("agent_budget.exhausted", agent=self.agent_name, reason=reason)
+        return reason
+
+    def record_round(self, tool_calls: int):
+        """Count a finished round and the tool calls it made."""
+        self.rounds += 1
+        self.tool_calls += tool_calls
+
+    def finish(self):
+        """Record the run's rounds, tool calls and duration."""
+        metrics.observe("agent.rounds", self.rounds, agent=self.agent_name)
+        metrics.observe("agent.tool_calls", self.tool_calls, agent=self.agent_name)
+        metrics.observe("agent.seconds", time.monotonic() - self.started, agent=self.agent_name)
+
@@ -0,0 +1,251 @@
+"""TTL response cache with in-memory and SQLite stores."""
+
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, List, Optional, Tuple
+
+from src.metrics import log_event
+
+##########################
+# Response Cache
+##########################
+CACHE_DIR = os.getenv("CACHE_DIR", ".cache")
+# Expired rows of a SQLite store are deleted when it opens and after every this many writes
+CACHE_PURGE_EVERY_WRITES = int(os.getenv("CACHE_PURGE_EVERY_WRITES", "500"))
+
+# Returned by lookups that did not find a usable entry
+MISS = object()
+
+
+class TTLCache:
+    """Bounded in-memory LRU cache with a TTL per entry.
+
+    Every entry remembers when it was stored, so callers can ask for a
+    tighter freshness bound (`max_age`) than the TTL it was stored with.
+    """
+
+    def __init__(self, max_entries: int = 1024):
+        """Create an empty cache holding at most max_entries entries."""
+        self.max_entries = max_entries
+        self._data: OrderedDict[str, Tuple[Any, float, float]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str, max_age: Optional[float] = None) -> Any:
+        """Look up a key.
+
+        Args:
+            key: Cache key
+            max_age: Optional maximum age in seconds, on top of the entry's TTL
+
+        Returns:
+            The cached value, or `MISS`
+        """
+        now = time.time()
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return MISS
+            value, stored_at, expires_at = item
+            if now >= expires_at:
+                del self._data[key]
+                return MISS
+            if max_age is not None and now - stored_at > max_age:
+                return MISS
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: Any, ttl: float, stored_at: Optional[float] = None):
+        """Store a value for ttl seconds, evicting the least recently used entry when full."""
+        stored_at = time.time() if stored_at is None else stored_at
+        with self._lock:
+            self._data[key] = (value, stored_at, stored_at + ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def delete(self, key: str):
+        """Remove an entry if present."""
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        """Remove all entries."""
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        """Return the number of entries, expired ones included."""
+        return len(self._data)
+
+
+class SQLiteCacheStore:
+    """JSON values in a SQLite table, shared by every worker process on the host.
+
+    The database runs in WAL mode so readers in one process do not block a
+    writer in another. Each thread gets its own connection. Expired rows are
+    purged when the store opens and every `purge_every` writes.
+    """
+
+    def __init__(self, path: str, table: str = "cache", purge_every: int = CACHE_PURGE_EVERY_WRITES):
+        """Open the SQLite table at path, creating it if needed."""
+        self.path = path
+        self.table = table
+        self.purge_every = purge_every
+        self._writes = 0
+        self._local = threading.local()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = self._connect()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            f"CREATE TABLE IF NOT EXISTS {table} ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, stored_at REAL NOT NULL, expires_at REAL NOT NULL)"
+        )
+        conn.execute(f"CREATE INDEX IF NOT EXISTS {table}_expires ON {table} (expires_at)")
+        conn.commit()
+        self.purge_expired()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5.0)
+            self._local.conn = conn
+        return conn
+
+    def get(self, key: str) -> Optional[Tuple[Any, float, float]]:
+        """Read an unexpired entry.
+
+        Returns:
+            Optional[tuple]: (value, stored_at, expires_at), or None
+        """
+        row = self._connect().execute(
+            f"SELECT value, stored_at, expires_at FROM {self.table} WHERE key = ? AND expires_at > ?",
+            (key, time.time()),
+        ).fetchone()
+        if row is None:
+            return None
+        return json.loads(row[0]), row[1], row[2]
+
+    def set(self, key: str, value: Any, stored_at: float, expires_at: float):
+        """Store a serialized value with its storage and expiry times."""
+        conn = self._connect()
+        conn.execute(
+            f"INSERT OR REPLACE INTO {self.table} (key, value, stored_at, expires_at) VALUES (?, ?, ?, ?)",
+            (key, json.dumps(value, default=str), stored_at, expires_at),
+        )
+        conn.commit()
+        self._writes += 1
+        if self.purge_every > 0 and self._writes % self.purge_every == 0:
+            self.purge_expired()
+
+    def items(self) -> List[Tuple[str, Any, float, float]]:
+        """Read every unexpired entry.
+
+        Returns:
+            List[tuple]: (key, value, stored_at, expires_at) per entry
+        """
+        rows = self._connect().execute(
+            f"SELECT key, value, stored_at, expires_at FROM {self.table} WHERE expires_at > ?",
+            (time.time(),),
+        ).fetchall()
+        return [(key, json.loads(value), stored_at, expires_at) for key, value, stored_at, expires_at in rows]
+
+    def purge_expired(self) -> int:
+        """Delete expired rows.
+
+        Returns:
+            int: Rows deleted
+        """
+        conn = self._connect()
+        deleted = conn.execute(f"DELETE FROM {self.table} WHERE expires_at <= ?", (time.time(),)).rowcount
+        conn.commit()
+        return deleted
+
+
+class ResponseCache:
+    """In-memory LRU in front of an optional shared SQLite store.
+
+    Values must be JSON serializable when a store is configured. Store
+    reads and writes run in a worker thread so the event loop never blocks
+    on disk.
+    """
+
+    def __init__(self, max_entries: int = 1024, store: Optional[SQLiteCacheStore] = None):
+        """Create a cache backed by memory and, optionally, a persistent store."""
+        self.memory = TTLCache(max_entries)
+        self.store = store
+        self.hits = 0
+        self.misses = 0
+
+    async def get(self, key: str, max_age: Optional[float] = None) -> Any:
+        """Look up a key in memory, then in the shared store.
+
+        Args:
+            key: Cache key
+            max_age: Optional maximum age in seconds
+
+        Returns:
+            The cached value, or `MISS`
+        """
+        value = self.memory.get(key, max_age)
+        if value is MISS and self.store is not None:
+            try:
+                row = await asyncio.to_thread(self.store.get, key)
+            except Exception as e:
+                log_event("cache", f"Error reading cache store {self.store.path}: {e}", logging.WARNING)
+                row = None
+            if row is not None:
+                stored_value, stored_at, expires_at = row
+                if max_age is None or time.time() - stored_at <= max_age:
+                    self.memory.set(key, stored_value, expires_at - stored_at, stored_at=stored_at)
+                    value = stored_value
+        if value is MISS:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    async def set(self, key: str, value: Any, ttl: float):
+        """Store a value in memory and in the persistent store; a non-positive TTL is not cached."""
+        if ttl <= 0:
+            return
+        stored_at = time.time()
+        self.memory.set(key, value, ttl, stored_at=stored_at)
+        if self.store is not None:
+            try:
+                await asyncio.to_thread(self.store.set, key, value, stored_at, stored_at + ttl)
+            except Exception as e:
+                log_event("cache", f"Error writing cache store {self.store.path}: {e}", logging.WARNING)
+
+    @property
+    def hit_rate(self) -> float:
+        """Fraction of lookups served from the cache."""
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+
+def open_cache_store(env_var: str, table: str) -> Optional[SQLiteCacheStore]:
+    """Open the shared SQLite store named by an environment variable, if any.
+
+    Args:
+        env_var: Environment variable holding the database path
+        table: Table to keep this cache's entries in
+
+    Returns:
+        Optional[SQLiteCacheStore]: The store, or None when the variable is unset
+    """
+    path = os.getenv(env_var)
+    if not path:
+        return None
+    try:
+        return SQLiteCacheStore(path, table=table)
+    except Exception as e:
+        log_event("cache", f"Error opening cache store {path}: {e}", logging.WARNING)
+        return None
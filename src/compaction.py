@@ -0,0 +1,147 @@
+"""Compaction of old tool results in the agent context."""
+
+import json
+import os
+from typing import Any, List, Optional
+
+from langchain_core.messages import AIMessage, ToolMessage
+from langchain_core.messages.utils import count_tokens_approximately
+
+##########################
+# Tool History Compaction
+##########################
+AGENT_CONTEXT_TOKEN_CEILING = int(os.getenv("AGENT_CONTEXT_TOKEN_CEILING", "24000"))
+DIGEST_MAX_CHARS = int(os.getenv("TOOL_DIGEST_MAX_CHARS", "1200"))
+CHARS_PER_TOKEN = 4
+MAX_LIST_ITEMS = 5
+
+
+def content_text(content: Any) -> str:
+    """Plain text of message content, joining the text of content blocks."""
+    if isinstance(content, str):
+        return content
+    if isinstance(content, list):
+        parts = []
+        for block in content:
+            if isinstance(block, dict):
+                parts.append(str(block.get("text", "")))
+            else:
+                parts.append(str(block))
+        return "\n".join(parts)
+    return str(content)
+
+
+def _flatten(value: Any, path: str, lines: List[str], max_chars: int, used: List[int]):
+    if used[0] >= max_chars:
+        return
+    if isinstance(value, dict):
+        for key, child in value.items():
+            _flatten(child, f"{path}.{key}" if path else str(key), lines, max_chars, used)
+        return
+    if isinstance(value, list):
+        numeric = all(isinstance(v, (int, float)) and not isinstance(v, bool) for v in value)
+        if value and numeric and len(value) <= MAX_LIST_ITEMS:
+            line = f"{path}: {value}"
+        elif value and numeric:
+            line = f"{path}: {len(value)} numbers, first={value[0]}, last={value[-1]}, min={min(value)}, max={max(value)}"
+        elif not value:
+            line = f"{path}: []"
+        else:
+            if len(value) > MAX_LIST_ITEMS:
+                lines.append(f"{path}: {len(value)} items, first {MAX_LIST_ITEMS} and last shown")
+                used[0] += len(lines[-1])
+                shown = list(enumerate(value[:MAX_LIST_ITEMS])) + [(len(value) - 1, value[-1])]
+            else:
+                shown = list(enumerate(value))
+            for i, child in shown:
+                _flatten(child, f"{path}[{i}]", lines, max_chars, used)
+            return
+    else:
+        text = str(value)
+        if len(text) > 200:
+            text = text[:200] + "..."
+        line = f"{path}: {text}" if path else text
+    lines.append(line)
+    used[0] += len(line) + 1
+
+
+def digest_tool_output(content: Any, max_chars: int = DIGEST_MAX_CHARS) -> str:
+    """Build a compact digest of a tool result.
+
+    JSON payloads are flattened to `path: value` lines, with numeric series
+    reduced to count/first/last/min/max and long lists sampled. Plain text
+    keeps its head.
+
+    Args:
+        content: Tool message content
+        max_chars: Size limit of the digest
+
+    Returns:
+        str: The digest
+    """
+    text = content_text(content)
+    try:
+        data = json.loads(text)
+    except (json.JSONDecodeError, TypeError, ValueError):
+        data = None
+
+    if isinstance(data, (dict, list)):
+        lines: List[str] = []
+        _flatten(data, "", lines, max_chars, [0])
+        body = "\n".join(lines)
+    else:
+        body = text
+    if len(body) > max_chars:
+        body = body[:max_chars] + "..."
+    return f"[compacted tool result, {len(text)} chars originally]\n{body}"
+
+
+def _compact_message(message: ToolMessage, max_chars: int) -> ToolMessage:
+    return message.model_copy(update={
+        "content": digest_tool_output(message.content, max_chars),
+        "additional_kwargs": {**message.additional_kwargs, "compacted": True},
+    })
+
+
+def compact_tool_history(messages: list, token_ceiling: Optional[int] = AGENT_CONTEXT_TOKEN_CEILING) -> int:
+    """Compact tool results the model has already consumed, in place.
+
+    Tool messages before the latest tool-calling round are replaced by
+    digests. The latest round stays verbatim unless the history is still
+    above `token_ceiling`, in which case its largest results are digested
+    too, sharing whatever room is left under the ceiling.
+
+    Args:
+        messages: Agent message history
+        token_ceiling: Approximate prompt token ceiling, or None
+
+    Returns:
+        int: Approximate number of prompt tokens saved
+    """
+    last_round = None
+    for i in range(len(messages) - 1, -1, -1):
+        if isinstance(messages[i], AIMessage) and messages[i].tool_calls:
+            last_round = i
+            break
+    if last_round is None:
+        return 0
+
+    before = count_tokens_approximately(messages)
+    for i in range(last_round):
+        message = messages[i]
+        if isinstance(message, ToolMessage) and not message.additional_kwargs.get("compacted"):
+            if len(content_text(message.content)) > DIGEST_MAX_CHARS:
+                messages[i] = _compact_message(message, DIGEST_MAX_CHARS)
+
+    if token_ceiling is not None and count_tokens_approximately(messages) > token_ceiling:
+        latest = [i for i in range(last_round + 1, len(messages)) if isinstance(messages[i], ToolMessage)]
+        others = count_tokens_approximately([m for i, m in enumerate(messages) if i not in latest])
+        room_chars = max(0, token_ceiling - others) * CHARS_PER_TOKEN
+        share = max(DIGEST_MAX_CHARS, room_chars // max(1, len(latest)))
+        for i in sorted(latest, key=lambda i: len(content_text(messages[i].content)), reverse=True):
+            if len(content_text(messages[i].content)) > share:
+                messages[i] = _compact_message(messages[i], share)
+            if count_tokens_approximately(messages) <= token_ceiling:
+                break
+
+    return max(0, before - count_tokens_approximately(messages))
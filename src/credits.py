@@ -0,0 +1,221 @@
+"""Heurist credit accounting for paid MCP tools."""
+
+import json
+import logging
+import os
+import re
+import threading
+import uuid
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from langchain_core.runnables import RunnableConfig
+from langchain_core.tools import ToolException
+
+from src.metrics import log_event, metrics
+from src.singleflight import tool_server
+
+##########################
+# Heurist Credit Accounting
+##########################
+# (category, tool name pattern, credits per call) for Heurist tools; first match wins, others are free.
+# Mirrors the "Tools Description by Category" section of the Heurist prompt.
+DEFAULT_CREDIT_COSTS: List[Tuple[str, str, float]] = [
+    ("twitter", r"twitter|tweet|elfa", 1),
+    ("trading", r"coingecko", 1),
+    ("kol", r"kol|mind", 1),
+    ("prediction", r"allora|predict", 1),
+    ("blockchain_intelligence", r"arkham", 1),
+]
+PAID_SERVERS = {"heurist_mcp"}
+CREDIT_BUDGET_PER_REQUEST = os.getenv("CREDIT_BUDGET_PER_REQUEST", "10")
+CREDIT_LEDGER_MAX_REQUESTS = 10000
+
+
+class CreditBudgetExceeded(ToolException):
+    """A paid tool call rejected because the request's credit budget is spent."""
+
+    def __init__(self, tool: str, cost: float, spent: float, budget: float):
+        """Build the error and its JSON payload for the agent."""
+        self.payload = {
+            "error": "credit_budget_exceeded",
+            "tool": tool,
+            "cost": cost,
+            "spent": spent,
+            "budget": budget,
+            "remaining": max(0.0, budget - spent),
+            "hint": "Not executed. Use free tools or answer from the data you already have; "
+                    "repeating an earlier call with the same arguments is free while it is cached.",
+        }
+        super().__init__(json.dumps(self.payload))
+
+
+class CreditCosts:
+    """Credits per call of each tool; `overrides` maps tool names or categories to a cost."""
+
+    def __init__(self, rules: List[Tuple[str, str, float]] = DEFAULT_CREDIT_COSTS, overrides: Optional[dict] = None):
+        """Compile the cost rules; overrides map tool names to fixed costs."""
+        self.rules = [(category, re.compile(pattern, re.IGNORECASE), cost) for category, pattern, cost in rules]
+        self.overrides = dict(overrides or {})
+
+    def resolve(self, tool) -> Tuple[str, float]:
+        """Category and cost of a tool.
+
+        Returns:
+            Tuple[str, float]: (category, credits per call); tools of unpaid servers cost 0
+        """
+        if tool_server(tool) not in PAID_SERVERS:
+            return "free", 0.0
+        category, cost = "free", 0.0
+        for rule_category, pattern, rule_cost in self.rules:
+            if pattern.search(tool.name):
+                category, cost = rule_category, rule_cost
+                break
+        if tool.name in self.overrides:
+            cost = float(self.overrides[tool.name])
+        elif category in self.overrides:
+            cost = float(self.overrides[category])
+        return category, cost
+
+
+def _env_overrides() -> dict:
+    raw = os.getenv("TOOL_CREDIT_COSTS")
+    if not raw:
+        return {}
+    try:
+        return json.loads(raw)
+    except json.JSONDecodeError as e:
+        log_event("credits", f"Ignoring invalid TOOL_CREDIT_COSTS: {e}", logging.WARNING)
+        return {}
+
+
+def request_budget(config: RunnableConfig) -> Optional[float]:
+    """Credit budget of a request: `configurable.credit_budget`, else CREDIT_BUDGET_PER_REQUEST; None for unlimited."""
+    value = (config or {}).get("configurable", {}).get("credit_budget")
+    if value is None:
+        value = CREDIT_BUDGET_PER_REQUEST
+    return float(value) if value not in (None, "") else None
+
+
+def _scopes(config: RunnableConfig) -> Tuple[str, str, str]:
+    configurable = (config or {}).get("configurable", {})
+    return (
+        str(configurable.get("request_id") or "unscoped"),
+        str(configurable.get("thread_id") or "unscoped"),
+        str(configurable.get("tenant_id") or "default"),
+    )
+
+
+class CreditLedger:
+    """Credit spend per request, thread and tenant.
+
+    A paid upstream call reserves its cost before it starts and is refunded
+    if it fails. Only the caller starting the upstream request pays;
+    identical concurrent calls joining it are free. A call that would take
+    the request over its budget is rejected with `CreditBudgetExceeded`.
+    Calls served from a cache never reach the ledger, so they are free.
+    """
+
+    def __init__(self, costs: CreditCosts):
+        """Create an empty ledger charging by the given costs."""
+        self.costs = costs
+        self.requests: OrderedDict[str, float] = OrderedDict()
+        self.threads: Dict[str, float] = {}
+        self.tenants: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def spent(self, config: RunnableConfig) -> float:
+        """Credits spent so far by the request of `config`."""
+        return self.requests.get(_scopes(config)[0], 0.0)
+
+    def remaining(self, config: RunnableConfig) -> Optional[float]:
+        """Credits left in the request's budget, None without one."""
+        budget = request_budget(config)
+        return None if budget is None else max(0.0, budget - self.spent(config))
+
+    def _add(self, scopes: Tuple[str, str, str], amount: float):
+        request_id, thread_id, tenant_id = scopes
+        self.requests[request_id] = self.requests.get(request_id, 0.0) + amount
+        self.requests.move_to_end(request_id)
+        while len(self.requests) > CREDIT_LEDGER_MAX_REQUESTS:
+            self.requests.popitem(last=False)
+        self.threads[thread_id] = self.threads.get(thread_id, 0.0) + amount
+        self.tenants[tenant_id] = self.tenants.get(tenant_id, 0.0) + amount
+
+    def reserve(self, tool, config: RunnableConfig) -> float:
+        """Reserve a tool call's cost against the request budget.
+
+        Returns:
+            float: Credits reserved (0 for free tools)
+
+        Raises:
+            CreditBudgetExceeded: When the call would exceed the budget
+        """
+        category, cost = self.costs.resolve(tool)
+        if cost <= 0:
+            return 0.0
+        scopes = _scopes(config)
+        budget = request_budget(config)
+        with self._lock:
+            spent = self.requests.get(scopes[0], 0.0)
+            if budget is not None and spent + cost > budget:
+                metrics.incr("credits.rejected", tenant=scopes[2], category=category)
+                raise CreditBudgetExceeded(tool.name, cost, spent, budget)
+            self._add(scopes, cost)
+        metrics.incr("credits.spent", cost, tenant=scopes[2], category=category)
+        return cost
+
+    def refund(self, tool, config: RunnableConfig, amount: float):
+        """Give back credits charged for a call that failed."""
+        if amount <= 0:
+            return
+        scopes = _scopes(config)
+        with self._lock:
+            self._add(scopes, -amount)
+        metrics.incr("credits.spent", -amount, tenant=scopes[2], category=self.costs.resolve(tool)[0])
+
+    async def settle(self, tool, config: RunnableConfig, reserved: float, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """Run the upstream call a reservation was made for, refunding it only if the call fails.
+
+        Meant to run inside the shared single-flight task: a caller cancelled
+        while waiting (e.g. by its agent time budget) does not stop the call,
+        which is still billed, so cancellation is never refunded.
+
+        Args:
+            tool: The tool being called
+            config: RunnableConfig the reservation was charged to
+            reserved: Credits reserved by `reserve`
+            fn: Zero-argument coroutine factory doing the call
+
+        Returns:
+            The call's result
+        """
+        try:
+            return await fn()
+        except Exception:
+            self.refund(tool, config, reserved)
+            raise
+
+    def snapshot(self) -> dict:
+        """Return the credits spent per thread and per tenant."""
+        with self._lock:
+            return {"threads": dict(self.threads), "tenants": dict(self.tenants)}
+
+
+credit_ledger = CreditLedger(CreditCosts(overrides=_env_overrides()))
+
+
+def with_credit_cost(tool):
+    """Copy of a paid tool with its cost prefixed to the description, so the model can plan around it."""
+    _, cost = credit_ledger.costs.resolve(tool)
+    if cost <= 0:
+        return tool
+    return tool.model_copy(update={"description": f"[Paid: {cost:g} credit/call] {tool.description}"})
+
+
+def with_request_id(config: RunnableConfig) -> RunnableConfig:
+    """Config whose `configurable.request_id` is set, generating one if the caller gave none."""
+    configurable = (config or {}).get("configurable", {})
+    if configurable.get("request_id"):
+        return config
+    return {**(config or {}), "configurable": {**configurable, "request_id": uuid.uuid4().hex}}
@@ -0,0 +1,327 @@
+"""Near-duplicate detection for search results and tool outputs."""
+
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+from src.cache import CACHE_DIR, SQLiteCacheStore
+from src.metrics import log_event, metrics
+
+##########################
+# Near-duplicate Detection
+##########################
+SIMHASH_BITS = 64
+# Eight 8-bit bands: fingerprints up to 7 bits apart share at least one band exactly
+SIMHASH_BANDS = 8
+SIMHASH_MAX_DISTANCE = min(SIMHASH_BANDS - 1, int(os.getenv("DEDUP_MAX_DISTANCE", "4")))
+DEDUP_MIN_TOKENS = 5
+DEDUP_TTL_SECONDS = float(os.getenv("DEDUP_TTL_SECONDS", str(3 * 24 * 3600)))
+DEDUP_MAX_ENTRIES = int(os.getenv("DEDUP_MAX_ENTRIES", "50000"))
+DEDUP_DB = os.getenv("DEDUP_DB", os.path.join(CACHE_DIR, "dedup.db"))
+
+# Fields that carry an item's text and its origin in news / social tool outputs
+TEXT_FIELDS = ("title", "headline", "text", "full_text", "content", "description", "summary", "body")
+SOURCE_FIELDS = ("url", "link", "source", "source_name", "author", "username", "screen_name")
+
+_TOKEN = re.compile(r"[a-z0-9$]+")
+_BAND_MASK = (1 << (SIMHASH_BITS // SIMHASH_BANDS)) - 1
+
+
+def _tokens(text: str) -> List[str]:
+    text = re.sub(r"https?://\S+|@\w+|#", " ", text.lower())
+    return _TOKEN.findall(text)
+
+
+def simhash(text: str) -> Optional[int]:
+    """64-bit SimHash of a text, weighted by term frequency.
+
+    Word features keep syndicated copies with small edits (a changed
+    headline word, an added sentence) within a few bits of each other.
+
+    Args:
+        text: Headline, article snippet or tweet
+
+    Returns:
+        Optional[int]: The fingerprint, or None when the text is too short to fingerprint reliably
+    """
+    tokens = _tokens(text)
+    if len(tokens) < DEDUP_MIN_TOKENS:
+        return None
+    counts: Dict[str, int] = {}
+    for token in tokens:
+        counts[token] = counts.get(token, 0) + 1
+    weights = [0] * SIMHASH_BITS
+    for token, count in counts.items():
+        h = int.from_bytes(hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest(), "big")
+        for bit in range(SIMHASH_BITS):
+            weights[bit] += count if (h >> bit) & 1 else -count
+    return sum(1 << bit for bit, weight in enumerate(weights) if weight > 0)
+
+
+def _bands(fingerprint: int) -> List[Tuple[int, int]]:
+    width = SIMHASH_BITS // SIMHASH_BANDS
+    return [(band, (fingerprint >> (band * width)) & _BAND_MASK) for band in range(SIMHASH_BANDS)]
+
+
+class NearDuplicateIndex:
+    """LSH index of SimHash fingerprints.
+
+    Fingerprints are bucketed by each of their 8-bit bands, so a lookup only
+    compares against fingerprints sharing a band instead of scanning the
+    index. Every fingerprint expires after `ttl` seconds, so old stories
+    stop suppressing fresh ones. With a `store`, fingerprints outlive the
+    process: the unexpired ones are reloaded from the store on first use and
+    new fingerprints are written through.
+    """
+
+    def __init__(self, max_distance: int = SIMHASH_MAX_DISTANCE, max_entries: int = DEDUP_MAX_ENTRIES,
+                 store: Optional[SQLiteCacheStore] = None, ttl: float = DEDUP_TTL_SECONDS):
+        """Create an index, persisted to store when given."""
+        self.max_distance = max_distance
+        self.max_entries = max_entries
+        self.store = store
+        self.ttl = ttl
+        # fingerprint -> (record, expires_at)
+        self._records: OrderedDict[int, Tuple[dict, float]] = OrderedDict()
+        self._buckets: Dict[Tuple[int, int], Set[int]] = {}
+        self._loaded = store is None
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        """Return the number of indexed records."""
+        return len(self._records)
+
+    def _load(self):
+        self._loaded = True
+        try:
+            rows = self.store.items()
+        except Exception as e:
+            log_event("dedup", f"Error loading dedup index from {self.store.path}: {e}", logging.WARNING)
+            return
+        for key, record, _, expires_at in sorted(rows, key=lambda row: row[2]):
+            self._insert(int(key, 16), record, expires_at)
+
+    def _remove(self, fingerprint: int):
+        self._records.pop(fingerprint, None)
+        for band in _bands(fingerprint):
+            bucket = self._buckets.get(band)
+            if bucket is not None:
+                bucket.discard(fingerprint)
+                if not bucket:
+                    del self._buckets[band]
+
+    def _insert(self, fingerprint: int, record: dict, expires_at: float):
+        if fingerprint in self._records and self._records[fingerprint][1] > time.time():
+            return
+        self._remove(fingerprint)
+        self._records[fingerprint] = (record, expires_at)
+        for band in _bands(fingerprint):
+            self._buckets.setdefault(band, set()).add(fingerprint)
+        while len(self._records) > self.max_entries:
+            self._remove(next(iter(self._records)))
+
+    def match(self, fingerprint: int) -> Optional[Tuple[int, dict]]:
+        """Closest indexed fingerprint within `max_distance` bits.
+
+        Returns:
+            Optional[Tuple[int, dict]]: (fingerprint, record), or None
+        """
+        with self._lock:
+            if not self._loaded:
+                self._load()
+            now = time.time()
+            best, expired = None, set()
+            for band in _bands(fingerprint):
+                for candidate in self._buckets.get(band, ()):
+                    if self._records[candidate][1] <= now:
+                        expired.add(candidate)
+                        continue
+                    distance = (candidate ^ fingerprint).bit_count()
+                    if distance <= self.max_distance and (best is None or distance < best[0]):
+                        best = (distance, candidate)
+            for candidate in expired:
+                self._remove(candidate)
+            if best is None:
+                return None
+            return best[1], self._records[best[1]][0]
+
+    def add(self, fingerprint: int, record: dict):
+        """Index a record under its fingerprint."""
+        now = time.time()
+        with self._lock:
+            if not self._loaded:
+                self._load()
+            self._insert(fingerprint, record, now + self.ttl)
+        if self.store is not None:
+            try:
+                self.store.set(f"{fingerprint:016x}", record, now, now + self.ttl)
+            except Exception as e:
+                log_event("dedup", f"Error writing dedup index {self.store.path}: {e}", logging.WARNING)
+
+
+def _open_store() -> Optional[SQLiteCacheStore]:
+    if not DEDUP_DB:
+        return None
+    try:
+        return SQLiteCacheStore(DEDUP_DB, table="fingerprints")
+    except Exception as e:
+        log_event("dedup", f"Error opening dedup index {DEDUP_DB}: {e}", logging.WARNING)
+        return None
+
+
+_story_index: Optional[NearDuplicateIndex] = None
+
+
+def get_story_index() -> NearDuplicateIndex:
+    """Return the process-wide story fingerprint index, persisted to DEDUP_DB."""
+    global _story_index
+    if _story_index is None:
+        _story_index = NearDuplicateIndex(store=_open_store())
+    return _story_index
+
+
+def cluster_items(items: List[Any], text_of: Callable[[Any], str], source_of: Callable[[Any], str],
+                  source: str) -> List[dict]:
+    """Collapse near-duplicate items into one representative each.
+
+    The first item of a cluster is its representative. Representatives are
+    checked against the persistent story index, so a story already seen in
+    an earlier request is recognised and carries the time it was first seen.
+
+    Args:
+        items: Items in their original order
+        text_of: Text to fingerprint for an item
+        source_of: Origin of an item (URL, outlet or account)
+        source: Metric label, e.g. "tavily"
+
+    Returns:
+        List[dict]: One entry per cluster with "item", "sources" and "first_seen"
+    """
+    batch = NearDuplicateIndex()
+    clusters: List[dict] = []
+    by_fingerprint: Dict[int, dict] = {}
+    for item in items:
+        fingerprint = simhash(text_of(item))
+        hit = batch.match(fingerprint) if fingerprint is not None else None
+        if hit is not None:
+            cluster = by_fingerprint[hit[0]]
+            origin = source_of(item)
+            if origin and origin not in cluster["sources"]:
+                cluster["sources"].append(origin)
+            cluster["duplicates"] += 1
+            continue
+        origin = source_of(item)
+        cluster = {"item": item, "sources": [origin] if origin else [], "duplicates": 0,
+                   "fingerprint": fingerprint, "first_seen": None}
+        clusters.append(cluster)
+        if fingerprint is not None:
+            batch.add(fingerprint, {})
+            by_fingerprint[fingerprint] = cluster
+
+    index = get_story_index()
+    for cluster in clusters:
+        fingerprint = cluster.pop("fingerprint")
+        if fingerprint is None:
+            continue
+        known = index.match(fingerprint)
+        if known is not None:
+            cluster["first_seen"] = known[1].get("first_seen")
+            metrics.incr("dedup.seen_before", source=source)
+        else:
+            index.add(fingerprint, {"first_seen": time.strftime("%Y-%m-%d %H:%M UTC", time.gmtime()),
+                                    "text": text_of(cluster["item"])[:200]})
+
+    collapsed = len(items) - len(clusters)
+    metrics.incr("dedup.items", len(items), source=source)
+    if collapsed:
+        metrics.incr("dedup.collapsed", collapsed, source=source)
+    return clusters
+
+
+def dedup_search_results(results: List[dict]) -> List[dict]:
+    """Collapse syndicated copies of the same story in Tavily results.
+
+    Args:
+        results: URL-unique search results
+
+    Returns:
+        List[dict]: Representatives, with "also_reported_by" URLs and "first_seen" when known
+    """
+    clusters = cluster_items(
+        results,
+        text_of=lambda r: f"{r.get('title', '')}. {r.get('content', '')}",
+        source_of=lambda r: r.get("url", ""),
+        source="tavily",
+    )
+    deduped = []
+    for cluster in clusters:
+        result = dict(cluster["item"])
+        result["also_reported_by"] = cluster["sources"][1:]
+        result["first_seen"] = cluster["first_seen"]
+        deduped.append(result)
+    return deduped
+
+
+def _item_text(item: dict) -> str:
+    return " ".join(str(item[f]) for f in TEXT_FIELDS if isinstance(item.get(f), str))
+
+
+def _item_source(item: dict) -> str:
+    for field in SOURCE_FIELDS:
+        value = item.get(field)
+        if isinstance(value, str) and value:
+            return value
+        if isinstance(value, dict) and isinstance(value.get("name"), str):
+            return value["name"]
+    return ""
+
+
+def _dedup_json(value: Any, source: str) -> Any:
+    if isinstance(value, dict):
+        return {key: _dedup_json(child, source) for key, child in value.items()}
+    if not isinstance(value, list):
+        return value
+    value = [_dedup_json(child, source) for child in value]
+    if len(value) < 2 or not all(isinstance(item, dict) and _item_text(item) for item in value):
+        return value
+    deduped = []
+    for cluster in cluster_items(value, _item_text, _item_source, source):
+        item = dict(cluster["item"])
+        if cluster["duplicates"]:
+            item["duplicate_count"] = cluster["duplicates"]
+            if len(cluster["sources"]) > 1:
+                item["also_reported_by"] = cluster["sources"][1:]
+        if cluster["first_seen"]:
+            item["first_seen"] = cluster["first_seen"]
+        deduped.append(item)
+    return deduped
+
+
+def dedup_tool_output(content: Any, source: str) -> Any:
+    """Collapse near-duplicate news items or tweets in a JSON tool result.
+
+    Every list of items with text fields is clustered. Non-JSON results are
+    returned unchanged.
+
+    Args:
+        content: Tool result content
+        source: Metric label, e.g. the tool's server
+
+    Returns:
+        The result with duplicates collapsed, as JSON text when it was parsed
+    """
+    if not isinstance(content, str):
+        return content
+    try:
+        data = json.loads(content)
+    except (json.JSONDecodeError, ValueError):
+        return content
+    if not isinstance(data, (dict, list)):
+        return content
+    return json.dumps(_dedup_json(data, source), ensure_ascii=False)
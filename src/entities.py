@@ -0,0 +1,420 @@
+"""Index of known crypto assets, protocols and chains for entity lookup."""
+
+import bisect
+import difflib
+import json
+import logging
+import os
+import re
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from src.metrics import log_event, metrics
+
+##########################
+# Entity Index
+##########################
+ENTITY_SNAPSHOT = os.getenv("ENTITY_SNAPSHOT", os.path.join(os.path.dirname(__file__), "data", "entities.json"))
+ENTITY_REFRESH_SECONDS = float(os.getenv("ENTITY_REFRESH_SECONDS", "300"))
+ENTITY_FUZZY_CUTOFF = float(os.getenv("ENTITY_FUZZY_CUTOFF", "0.85"))
+ENTITY_INJECTION = os.getenv("ENTITY_INJECTION", "true").lower() == "true"
+
+# Tickers and names that are everyday English words only resolve with their exact case (LINK, Base)
+COMMON_WORD_SYMBOLS = {"LINK", "NEAR", "TON", "OP", "BASE", "GAS", "ONE", "SKY"}
+MIN_FUZZY_LENGTH = 5
+MIN_ADDRESS_PREFIX = 10
+MAX_NGRAM = 3
+
+_WORD = re.compile(r"\$?[A-Za-z0-9][A-Za-z0-9\-]*")
+_EVM_ADDRESS = re.compile(r"^0x[0-9a-fA-F]{8,40}$")
+
+
+@dataclass(frozen=True)
+class Entity:
+    """One token, protocol or chain with the identifiers tools expect."""
+    id: str
+    name: str
+    symbol: Optional[str] = None
+    kind: str = "token"
+    coingecko_id: Optional[str] = None
+    aliases: Tuple[str, ...] = ()
+    chains: Tuple[str, ...] = ()
+    contracts: Tuple[Tuple[str, str], ...] = ()
+    flipside_protocol: Optional[str] = None
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "Entity":
+        """Build an entity from its snapshot representation."""
+        return cls(
+            id=data["id"],
+            name=data["name"],
+            symbol=data.get("symbol"),
+            kind=data.get("kind", "token"),
+            coingecko_id=data.get("coingecko_id"),
+            aliases=tuple(data.get("aliases") or ()),
+            chains=tuple(data.get("chains") or ()),
+            contracts=tuple(sorted((data.get("contracts") or {}).items())),
+            flipside_protocol=data.get("flipside_protocol"),
+        )
+
+    def describe(self) -> str:
+        """One-line summary of the entity's identifiers for prompts."""
+        parts = [f"{self.name} ({self.symbol})" if self.symbol else self.name, self.kind]
+        if self.coingecko_id:
+            parts.append(f"CoinGecko id `{self.coingecko_id}`")
+        if self.chains:
+            parts.append(f"chains: {', '.join(self.chains)}")
+        if self.contracts:
+            parts.append("contracts: " + ", ".join(f"{chain} `{address}`" for chain, address in self.contracts))
+        if self.flipside_protocol:
+            parts.append(f"Flipside protocol `{self.flipside_protocol}`")
+        return "; ".join(parts)
+
+
+def _trigrams(key: str) -> Set[str]:
+    padded = f"  {key} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class EntityIndex:
+    """In-process index of known crypto entities.
+
+    Lowercase names, aliases, symbols and EVM contract addresses are kept in
+    one sorted array, so exact and prefix lookups are a bisect away; a
+    trigram index narrows fuzzy matching to a handful of candidates. Names
+    and tickers that are common English words and non-EVM addresses only
+    match with their exact case.
+
+    The index is bulk-loaded from a JSON snapshot (`ENTITY_SNAPSHOT`) and
+    refreshed incrementally: when the file changes, only added, changed and
+    removed entities are re-indexed.
+    """
+
+    def __init__(self, path: Optional[str] = ENTITY_SNAPSHOT, refresh_seconds: float = ENTITY_REFRESH_SECONDS):
+        """Create an index loading the snapshot at path on first use."""
+        self.path = path
+        self.refresh_seconds = refresh_seconds
+        self.version: Optional[str] = None
+        self._entities: Dict[str, Entity] = {}
+        self._keys: List[str] = []
+        self._owners: Dict[str, Set[str]] = {}
+        self._exact_case: Dict[str, Set[str]] = {}
+        self._trigram_keys: Dict[str, Set[str]] = {}
+        self._mtime: Optional[float] = None
+        self._checked_at = 0.0
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        """Return the number of indexed entities."""
+        return len(self._entities)
+
+    ##########################
+    # Loading and refresh
+    ##########################
+    def maybe_refresh(self, force: bool = False) -> int:
+        """Reload the snapshot if it changed since the last load.
+
+        The file is stat'ed at most once per `refresh_seconds`.
+
+        Returns:
+            int: Number of entities added, changed or removed
+        """
+        if not self.path:
+            return 0
+        now = time.monotonic()
+        if not force and self._mtime is not None and now - self._checked_at < self.refresh_seconds:
+            return 0
+        with self._lock:
+            self._checked_at = now
+            try:
+                mtime = os.path.getmtime(self.path)
+            except OSError as e:
+                if self._mtime is None:
+                    log_event("entities", f"Entity snapshot unavailable at {self.path}: {e}", logging.WARNING)
+                    self._mtime = 0.0
+                return 0
+            if not force and mtime == self._mtime:
+                return 0
+            try:
+                with open(self.path, encoding="utf-8") as f:
+                    snapshot = json.load(f)
+            except (OSError, ValueError) as e:
+                log_event("entities", f"Failed to read entity snapshot {self.path}: {e}", logging.WARNING)
+                return 0
+            self._mtime = mtime
+            self.version = snapshot.get("version")
+            changed = self.replace_all(snapshot.get("entities", []))
+            if changed:
+                log_event("entities", f"Entity index loaded {len(self)} entities from {self.path} ({changed} changed)", logging.DEBUG)
+            return changed
+
+    def replace_all(self, records: Iterable[dict]) -> int:
+        """Sync the index with a full snapshot, re-indexing only what changed.
+
+        Returns:
+            int: Number of entities added, changed or removed
+        """
+        incoming = {}
+        for record in records:
+            try:
+                entity = Entity.from_dict(record)
+            except (KeyError, TypeError) as e:
+                log_event("entities", f"Skipping malformed entity record {record!r}: {e}", logging.WARNING)
+                continue
+            incoming[entity.id] = entity
+        with self._lock:
+            removed = [entity_id for entity_id in self._entities if entity_id not in incoming]
+            for entity_id in removed:
+                self._unindex(self._entities.pop(entity_id))
+            return len(removed) + self.upsert(incoming.values())
+
+    def upsert(self, entities: Iterable[Entity]) -> int:
+        """Add or update entities in place.
+
+        Returns:
+            int: Number of entities added or changed
+        """
+        changed = 0
+        with self._lock:
+            for entity in entities:
+                current = self._entities.get(entity.id)
+                if current == entity:
+                    continue
+                if current is not None:
+                    self._unindex(current)
+                self._entities[entity.id] = entity
+                self._index(entity)
+                changed += 1
+        if changed:
+            metrics.set_gauge("entities.size", len(self._entities))
+        return changed
+
+    def _entity_keys(self, entity: Entity) -> Tuple[Set[str], Set[str]]:
+        keys, exact_case = set(), set()
+        for term in (entity.name, *entity.aliases):
+            if term.upper() in COMMON_WORD_SYMBOLS:
+                exact_case.add(term)
+            else:
+                keys.add(term.lower())
+        if entity.symbol:
+            if entity.symbol.upper() in COMMON_WORD_SYMBOLS:
+                exact_case.add(entity.symbol.upper())
+            else:
+                keys.add(entity.symbol.lower())
+        for _, address in entity.contracts:
+            if address.startswith("0x"):
+                keys.add(address.lower())
+            else:
+                exact_case.add(address)
+        return keys, exact_case
+
+    def _index(self, entity: Entity):
+        keys, exact_case = self._entity_keys(entity)
+        for key in keys:
+            owners = self._owners.get(key)
+            if owners is None:
+                owners = self._owners[key] = set()
+                bisect.insort(self._keys, key)
+                if not key.startswith("0x"):
+                    for gram in _trigrams(key):
+                        self._trigram_keys.setdefault(gram, set()).add(key)
+            owners.add(entity.id)
+        for key in exact_case:
+            self._exact_case.setdefault(key, set()).add(entity.id)
+
+    def _unindex(self, entity: Entity):
+        keys, exact_case = self._entity_keys(entity)
+        for key in keys:
+            owners = self._owners.get(key)
+            if owners is None:
+                continue
+            owners.discard(entity.id)
+            if not owners:
+                del self._owners[key]
+                del self._keys[bisect.bisect_left(self._keys, key)]
+                for gram in _trigrams(key):
+                    grams = self._trigram_keys.get(gram)
+                    if grams is not None:
+                        grams.discard(key)
+                        if not grams:
+                            del self._trigram_keys[gram]
+        for key in exact_case:
+            owners = self._exact_case.get(key)
+            if owners is not None:
+                owners.discard(entity.id)
+                if not owners:
+                    del self._exact_case[key]
+
+    ##########################
+    # Lookups
+    ##########################
+    def _owned(self, key: str, table: Dict[str, Set[str]]) -> List[Entity]:
+        return [self._entities[entity_id] for entity_id in sorted(table.get(key, ()))]
+
+    def lookup(self, term: str) -> List[Entity]:
+        """Exact match on a name, alias, symbol or contract address."""
+        self.maybe_refresh()
+        term = term.strip().lstrip("$")
+        with self._lock:
+            return self._owned(term.lower(), self._owners) or self._owned(term, self._exact_case) \
+                or self._owned(term.upper(), self._exact_case)
+
+    def prefix(self, prefix: str, limit: int = 10) -> List[str]:
+        """Indexed keys starting with `prefix`, in sorted order.
+
+        Args:
+            prefix: Lowercase-insensitive key prefix
+            limit: Maximum number of keys
+
+        Returns:
+            List[str]: Matching keys
+        """
+        self.maybe_refresh()
+        prefix = prefix.lower()
+        with self._lock:
+            start = bisect.bisect_left(self._keys, prefix)
+            matches = []
+            for key in self._keys[start:]:
+                if not key.startswith(prefix) or len(matches) >= limit:
+                    break
+                matches.append(key)
+            return matches
+
+    def fuzzy(self, term: str, limit: int = 3, cutoff: float = ENTITY_FUZZY_CUTOFF) -> List[Tuple[Entity, float]]:
+        """Closest entities to a possibly misspelled name.
+
+        Candidates sharing the most trigrams with the term are scored with
+        difflib's similarity ratio.
+
+        Args:
+            term: Name as written by the user
+            limit: Maximum number of entities
+            cutoff: Minimum similarity in [0, 1]
+
+        Returns:
+            List[Tuple[Entity, float]]: Entities with their similarity, best first
+        """
+        self.maybe_refresh()
+        term = term.lower()
+        with self._lock:
+            shared: Dict[str, int] = {}
+            for gram in _trigrams(term):
+                for key in self._trigram_keys.get(gram, ()):
+                    shared[key] = shared.get(key, 0) + 1
+            candidates = sorted(shared, key=shared.get, reverse=True)[:20]
+            scored = []
+            for key in candidates:
+                ratio = difflib.SequenceMatcher(None, term, key).ratio()
+                if ratio >= cutoff:
+                    scored.append((ratio, key))
+            best: Dict[str, Tuple[Entity, float]] = {}
+            for ratio, key in sorted(scored, reverse=True):
+                for entity in self._owned(key, self._owners):
+                    best.setdefault(entity.id, (entity, round(ratio, 3)))
+            return list(best.values())[:limit]
+
+    def _address_prefix(self, word: str) -> List[Entity]:
+        keys = self.prefix(word, limit=2)
+        # Shortened addresses only count when they are unambiguous
+        return self._owned(keys[0], self._owners) if len(keys) == 1 else []
+
+    def resolve(self, text: str, fuzzy: bool = True) -> List[Entity]:
+        """Find the known entities mentioned in free text.
+
+        Multi-word names are tried before single words; contract addresses,
+        shortened EVM addresses and, optionally, misspelled names of at
+        least MIN_FUZZY_LENGTH letters are recognised as well.
+
+        Args:
+            text: Question or task text
+            fuzzy: Whether unmatched words are fuzzy-matched
+
+        Returns:
+            List[Entity]: Entities in order of first mention
+        """
+        self.maybe_refresh()
+        words = [w.lstrip("$") for w in _WORD.findall(text or "")]
+        found: Dict[str, Tuple[int, Entity]] = {}
+        used = [False] * len(words)
+        with self._lock:
+            for size in range(MAX_NGRAM, 0, -1):
+                for i in range(len(words) - size + 1):
+                    if any(used[i:i + size]):
+                        continue
+                    phrase = " ".join(words[i:i + size])
+                    matches = self._owned(phrase.lower(), self._owners)
+                    if not matches and size == 1:
+                        word = words[i]
+                        matches = self._owned(word, self._exact_case)
+                        if not matches and _EVM_ADDRESS.match(word) and len(word) >= MIN_ADDRESS_PREFIX:
+                            matches = self._address_prefix(word)
+                        if not matches and fuzzy and word.isalpha() and len(word) >= MIN_FUZZY_LENGTH:
+                            matches = [entity for entity, _ in self.fuzzy(word, limit=1)]
+                            if matches:
+                                metrics.incr("entities.fuzzy_matches")
+                    if matches:
+                        for j in range(i, i + size):
+                            used[j] = True
+                        for entity in matches:
+                            found.setdefault(entity.id, (i, entity))
+        entities = [entity for _, entity in sorted(found.values(), key=lambda item: item[0])]
+        metrics.incr("entities.resolved", len(entities))
+        return entities
+
+    def is_known(self, term: str) -> bool:
+        """Whether a single term names a known entity exactly."""
+        return bool(self.lookup(term))
+
+
+def format_resolved_entities(entities: List[Entity]) -> str:
+    """Render resolved entities as a prompt block.
+
+    Args:
+        entities: Entities to list
+
+    Returns:
+        str: `<Resolved Entities>` block, empty when there are none
+    """
+    if not entities:
+        return ""
+    lines = [
+        "<Resolved Entities>",
+        "These identifiers come from the local entity index. Use them directly as tool arguments and do not "
+        "call discovery tools (e.g. `find_relevant_metrics`, `protocol_lookup`, token or id search) just to look them up.",
+    ]
+    lines.extend(f"- {entity.describe()}" for entity in entities)
+    lines.append("</Resolved Entities>")
+    return "\n".join(lines)
+
+
+def with_resolved_entities(text: str, source: Optional[str] = None) -> str:
+    """Append the `<Resolved Entities>` block for the entities in `source` to `text`.
+
+    Args:
+        text: Prompt text to extend
+        source: Text to resolve entities from, defaults to `text`
+
+    Returns:
+        str: The prompt, unchanged when injection is disabled or nothing resolved
+    """
+    if not ENTITY_INJECTION:
+        return text
+    block = format_resolved_entities(get_entity_index().resolve(text if source is None else source))
+    if not block:
+        return text
+    metrics.incr("entities.injected")
+    return f"{text}\n\n{block}"
+
+
+_entity_index: Optional[EntityIndex] = None
+
+
+def get_entity_index() -> EntityIndex:
+    """Return the process-wide entity index, loading the snapshot on first use."""
+    global _entity_index
+    if _entity_index is None:
+        _entity_index = EntityIndex()
+        _entity_index.maybe_refresh(force=True)
+    return _entity_index
@@ -0,0 +1,260 @@
+"""Pooled, long-lived MCP sessions shared across requests."""
+
+import asyncio
+import logging
+import os
+from contextlib import asynccontextmanager
+from typing import Dict, List, Optional
+
+from langchain_core.tools import BaseTool
+from langchain_mcp_adapters.client import MultiServerMCPClient
+from langchain_mcp_adapters.tools import convert_mcp_tool_to_langchain_tool
+
+from src.metrics import log_event
+from src.ratelimit import get_rate_limiter
+
+##########################
+# Pooled MCP Sessions
+##########################
+MCP_KEEPALIVE_SECONDS = float(os.getenv("MCP_KEEPALIVE_SECONDS", "30"))
+MCP_CONNECT_TIMEOUT_SECONDS = float(os.getenv("MCP_CONNECT_TIMEOUT_SECONDS", "20"))
+MCP_RECONNECT_DELAY_SECONDS = float(os.getenv("MCP_RECONNECT_DELAY_SECONDS", "1"))
+MCP_MAX_RECONNECT_DELAY_SECONDS = 30.0
+
+# Errors raised by the MCP client when the underlying SSE stream has gone away
+_DROPPED_SESSION_ERRORS = (ConnectionError, EOFError, BrokenPipeError)
+_DROPPED_SESSION_MARKERS = ("closedresource", "brokenresource", "endofstream", "connection closed", "connection reset")
+
+
+class PooledMCPSession:
+    """A long-lived SSE session to one MCP server.
+
+    The session is opened by a background task that owns the connection for
+    its whole life (the MCP client requires enter/exit from the same task),
+    pings the server every `keepalive_interval` seconds and reconnects with
+    backoff whenever the stream drops. Callers borrow the live session, at
+    most `max_concurrency` at a time. That cap is the upper bound of the
+    server's adaptive rate limiter (`src/ratelimit.py`), which paces calls
+    below it; the session enforces it for every call, including the ones
+    that bypass the limiter such as tool listings.
+
+    Instances also act as the `session` for tools built by
+    `convert_mcp_tool_to_langchain_tool`, so tools always route through
+    whichever connection is currently alive.
+    """
+
+    def __init__(self, name: str, url: str, keepalive_interval: float = MCP_KEEPALIVE_SECONDS,
+                 connect_timeout: float = MCP_CONNECT_TIMEOUT_SECONDS, max_concurrency: Optional[int] = None):
+        """Describe a pooled session; it connects on first use."""
+        self.name = name
+        self.url = url
+        self.keepalive_interval = keepalive_interval
+        self.connect_timeout = connect_timeout
+        if max_concurrency is None:
+            max_concurrency = int(get_rate_limiter(name).config.max_concurrency)
+        self.max_concurrency = max(1, max_concurrency)
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._client = MultiServerMCPClient({name: {"transport": "sse", "url": url}})
+        self._session = None
+        self._runner: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._ready: Optional[asyncio.Event] = None
+        self._dropped: Optional[asyncio.Event] = None
+        self._closed = False
+        self.reconnects = 0
+
+    def _ensure_started(self):
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # First use, or the previous event loop is gone (e.g. a new asyncio.run)
+            self._loop = loop
+            self._ready = asyncio.Event()
+            self._dropped = asyncio.Event()
+            self._slots = asyncio.Semaphore(self.max_concurrency)
+            self._session = None
+            self._runner = None
+        if self._runner is None or self._runner.done():
+            self._closed = False
+            self._runner = loop.create_task(self._run(), name=f"mcp-session-{self.name}")
+
+    async def _run(self):
+        delay = MCP_RECONNECT_DELAY_SECONDS
+        while not self._closed:
+            try:
+                async with self._client.session(self.name) as session:
+                    self._session = session
+                    self._dropped.clear()
+                    self._ready.set()
+                    delay = MCP_RECONNECT_DELAY_SECONDS
+                    log_event("mcp_pool", f"MCP session '{self.name}' connected", logging.INFO)
+                    await self._keepalive(session)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                if _cancel_requested():
+                    # anyio may wrap our cancellation in an ExceptionGroup while connecting
+                    raise asyncio.CancelledError() from e
+                log_event("mcp_pool", f"MCP session '{self.name}' dropped: {e}", logging.WARNING)
+            finally:
+                self._session = None
+                self._ready.clear()
+            if self._closed:
+                break
+            self.reconnects += 1
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, MCP_MAX_RECONNECT_DELAY_SECONDS)
+
+    async def _keepalive(self, session):
+        while not self._closed:
+            try:
+                await asyncio.wait_for(self._dropped.wait(), timeout=self.keepalive_interval)
+                return
+            except asyncio.TimeoutError:
+                pass
+            await asyncio.wait_for(session.send_ping(), timeout=self.connect_timeout)
+
+    def mark_dropped(self):
+        """Ask the background task to tear down and reopen the connection."""
+        if self._dropped is not None:
+            self._dropped.set()
+
+    async def get_session(self):
+        """Return the live MCP client session, waiting for a (re)connect if needed.
+
+        Returns:
+            ClientSession: An initialized MCP client session
+        """
+        self._ensure_started()
+        if self._session is None:
+            await asyncio.wait_for(self._ready.wait(), timeout=self.connect_timeout)
+        return self._session
+
+    @asynccontextmanager
+    async def borrow(self):
+        """Borrow the live session, waiting while `max_concurrency` calls are in flight."""
+        self._ensure_started()
+        async with self._slots:
+            yield await self.get_session()
+
+    async def call_tool(self, name: str, arguments: dict, **kwargs):
+        """Call a tool on the shared session, marking it dropped on connection errors."""
+        async with self.borrow() as session:
+            try:
+                return await session.call_tool(name, arguments, **kwargs)
+            except Exception as e:
+                if _is_dropped_session_error(e):
+                    self.mark_dropped()
+                raise
+
+    async def list_tools(self) -> list:
+        """List all tools of the server, following pagination cursors."""
+        tools = []
+        cursor = None
+        async with self.borrow() as session:
+            while True:
+                page = await session.list_tools(cursor=cursor)
+                tools.extend(page.tools)
+                cursor = page.nextCursor
+                if not cursor:
+                    return tools
+
+    async def aclose(self):
+        """Stop the keepalive runner and close the session."""
+        self._closed = True
+        self.mark_dropped()
+        if self._runner is not None and not self._runner.done():
+            self._runner.cancel()
+            try:
+                await self._runner
+            except (asyncio.CancelledError, Exception):
+                pass
+        self._runner = None
+
+
+def _cancel_requested() -> bool:
+    task = asyncio.current_task()
+    cancelling = getattr(task, "cancelling", None)
+    return bool(cancelling and cancelling())
+
+
+def _is_dropped_session_error(error: Exception) -> bool:
+    if isinstance(error, _DROPPED_SESSION_ERRORS):
+        return True
+    text = f"{type(error).__name__} {error}".lower()
+    return any(marker in text for marker in _DROPPED_SESSION_MARKERS)
+
+
+class MCPSessionManager:
+    """Process-wide registry of pooled MCP sessions, one per server name."""
+
+    def __init__(self):
+        """Create an empty pool."""
+        self._sessions: Dict[str, PooledMCPSession] = {}
+
+    def get(self, name: str, url: str) -> PooledMCPSession:
+        """Get the pooled session for a server, creating it on first use.
+
+        Args:
+            name: Server name used as the MCP client connection key
+            url: SSE endpoint of the server
+
+        Returns:
+            PooledMCPSession: The shared session for this server
+        """
+        pooled = self._sessions.get(name)
+        if pooled is None or pooled.url != url:
+            pooled = PooledMCPSession(name, url)
+            self._sessions[name] = pooled
+        return pooled
+
+    async def list_tools(self, name: str, url: str) -> list:
+        """List the server's raw MCP tool definitions over the pooled session.
+
+        Args:
+            name: Server name
+            url: SSE endpoint of the server
+
+        Returns:
+            list: `mcp.types.Tool` definitions, including their input JSON schemas
+        """
+        return await self.get(name, url).list_tools()
+
+    def build_tools(self, name: str, url: str, mcp_tools: list) -> List[BaseTool]:
+        """Convert MCP tool definitions into LangChain tools bound to the pooled session.
+
+        Args:
+            name: Server name
+            url: SSE endpoint of the server
+            mcp_tools: `mcp.types.Tool` definitions, fresh or from a snapshot
+
+        Returns:
+            List[BaseTool]: LangChain tools that call through the pooled session
+        """
+        pooled = self.get(name, url)
+        tools = []
+        for mcp_tool in mcp_tools:
+            lc_tool = convert_mcp_tool_to_langchain_tool(pooled, mcp_tool, server_name=name)
+            lc_tool.metadata = {**(lc_tool.metadata or {}), "mcp_server": name}
+            tools.append(lc_tool)
+        return tools
+
+    async def load_tools(self, name: str, url: str) -> List[BaseTool]:
+        """List the server's tools over the pooled session as LangChain tools."""
+        return self.build_tools(name, url, await self.list_tools(name, url))
+
+    async def aclose(self):
+        """Close every pooled session."""
+        for pooled in self._sessions.values():
+            await pooled.aclose()
+        self._sessions.clear()
+
+
+_mcp_session_manager: Optional[MCPSessionManager] = None
+
+
+def get_mcp_session_manager() -> MCPSessionManager:
+    """Return the process-wide MCP session manager."""
+    global _mcp_session_manager
+    if _mcp_session_manager is None:
+        _mcp_session_manager = MCPSessionManager()
+    return _mcp_session_manager
@@ -0,0 +1,125 @@
+"""Process-wide counters, gauges and histograms, plus diagnostic logging."""
+
+import json
+import logging
+import os
+import threading
+import time
+from typing import Dict, Optional
+
+from src.progress import emit_progress
+
+##########################
+# Process Metrics
+##########################
+# JSON-lines file receiving a snapshot at the end of every run; empty to disable
+METRICS_FILE = os.getenv("METRICS_FILE", "")
+
+logger = logging.getLogger("crypto_research")
+
+
+def _metric_key(name: str, labels: dict) -> str:
+    if not labels:
+        return name
+    label_str = ",".join(f"{k}={labels[k]}" for k in sorted(labels))
+    return f"{name}{{{label_str}}}"
+
+
+class Metrics:
+    """Process-wide counters, gauges and summaries.
+
+    Keys are `name{label=value,...}` strings so a snapshot can be logged or
+    exported as-is.
+    """
+
+    def __init__(self):
+        """Create an empty registry."""
+        self._lock = threading.Lock()
+        self.counters: Dict[str, float] = {}
+        self.gauges: Dict[str, float] = {}
+        self.summaries: Dict[str, Dict[str, float]] = {}
+
+    def incr(self, name: str, value: float = 1, **labels):
+        """Add value to a counter."""
+        key = _metric_key(name, labels)
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def set_gauge(self, name: str, value: float, **labels):
+        """Set a gauge to value."""
+        with self._lock:
+            self.gauges[_metric_key(name, labels)] = value
+
+    def observe(self, name: str, value: float, **labels):
+        """Record an observation in a count/sum/max summary."""
+        key = _metric_key(name, labels)
+        with self._lock:
+            summary = self.summaries.setdefault(key, {"count": 0, "sum": 0.0, "max": value})
+            summary["count"] += 1
+            summary["sum"] += value
+            summary["max"] = max(summary["max"], value)
+
+    def snapshot(self) -> dict:
+        """Return a copy of every metric recorded so far."""
+        with self._lock:
+            return {
+                "counters": dict(self.counters),
+                "gauges": dict(self.gauges),
+                "summaries": {k: dict(v) for k, v in self.summaries.items()},
+            }
+
+    def reset(self):
+        """Clear all metrics."""
+        with self._lock:
+            self.counters.clear()
+            self.gauges.clear()
+            self.summaries.clear()
+
+
+metrics = Metrics()
+
+
+def report_metrics(thread_id: Optional[str] = None) -> dict:
+    """Export the metrics snapshot at the end of a run.
+
+    The snapshot is sent as a `{"agent": "metrics", "event": "snapshot"}`
+    progress event and, when METRICS_FILE is set, appended to it as one
+    JSON line. Counters are cumulative for the process, so rates come from
+    the difference between two snapshots.
+
+    Args:
+        thread_id: Thread the run belonged to, recorded with the snapshot
+
+    Returns:
+        dict: The snapshot
+    """
+    snapshot = metrics.snapshot()
+    emit_progress("metrics", "snapshot", thread_id=thread_id, **snapshot)
+    if METRICS_FILE:
+        line = json.dumps({"ts": time.time(), "thread_id": thread_id, **snapshot}, default=str)
+        try:
+            with open(METRICS_FILE, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+        except OSError:
+            metrics.incr("metrics.export_errors")
+    return snapshot
+
+
+def log_event(source: str, message: str, level: int = logging.INFO, **fields):
+    """Report a diagnostic message.
+
+    The message goes out as a `{"agent": source, "event": "log"}` progress
+    event (a no-op outside a graph run), is counted as `log.events` and is
+    passed to the `crypto_research` logger, so warnings still reach stderr
+    when nothing is streaming.
+
+    Args:
+        source: Module or agent reporting, e.g. "sql_cache" or "heurist"
+        message: Human-readable message
+        level: `logging` level
+        **fields: Structured details added to the progress event
+    """
+    level_name = logging.getLevelName(level).lower()
+    metrics.incr("log.events", source=source, level=level_name)
+    emit_progress(source, "log", level=level_name, message=message, **fields)
+    logger.log(level, "%s: %s", source, message)
@@ -1,333 +1,284 @@
-from langchain_core.messages import HumanMessage, SystemMessage, AIMessage, ToolMessage, get_buffer_string, filter_messages
-from langchain_core.runnables import RunnableConfig
-from langgraph.graph import START, END, StateGraph
-from langgraph.types import Command
+"""Orchestrator graph: clarification, routing, research and summary."""
+
 import asyncio
+import logging
+import os
+import time
 from typing import Literal
 
+from langchain_core.messages import (
+    AIMessage,
+    HumanMessage,
+    SystemMessage,
+    get_buffer_string,
+    message_chunk_to_message,
+)
+from langchain_core.runnables import RunnableConfig
+from langgraph.constants import TAG_NOSTREAM
+from langgraph.graph import END, START, StateGraph
+from langgraph.types import Command
+
+from src.compaction import content_text
+from src.credits import credit_ledger, with_request_id
+from src.entities import with_resolved_entities
+from src.metrics import log_event, metrics, report_metrics
+from src.preclassify import classify_query, preclassify_enabled, preclassify_stats
+from src.progress import emit_progress
+from src.prompt import (
+    clarify_with_user_instructions,
+    flipside_mcp_system_prompt,
+    heurist_mcp_system_prompt,
+    summary_system_prompt,
+    supervisor_system_prompt,
+    tavily_mcp_system_prompt,
+)
+from src.reasoning import (
+    ReasoningStreamFilter,
+    keep_reasoning,
+    reasoning_trace,
+    strip_reasoning,
+)
+from src.resilience import get_circuit_breaker
 from src.state import (
     ClarifyWithUser,
-    InputState,
     DelegateAgent,
-    SupervisorState,
-    HeuristAgentState,
     FlipsideAgentState,
+    HeuristAgentState,
+    InputState,
+    SupervisorState,
     TavilyAgentState,
 )
+from src.summarize import (
+    digest_source,
+    fallback_digest,
+    format_missing_sources,
+    format_subtasks,
+    format_worker_outputs,
+    merge_subtask_results,
+    research_deadline,
+)
+from src.tool_agent import ToolAgent
 from src.utils import (
-    configurable_model,
-    summary_model,
-    max_structured_output_retries,
     allow_clarification,
-    load_heurist_mcp,
-    load_flipside_mcp,
-    retry_mcp_tool_call,
+    coalesced_tool_call,
+    flipside_tool_call,
     get_current_date_time,
+    get_model,
+    get_structured_model,
+    load_flipside_mcp,
+    load_heurist_tools,
     load_tavily_search,
-)
-from src.prompt import (
-    clarify_with_user_instructions,
-    supervisor_system_prompt,
-    heurist_mcp_system_prompt,
-    flipside_mcp_system_prompt,
-    tavily_mcp_system_prompt,
-    summary_system_prompt
+    processed_mcp_tool_call,
 )
 
 current_datetime = get_current_date_time()
+# Upstream server behind each research source, for circuit breaker checks
+SOURCE_SERVERS = {"heurist": "heurist_mcp", "flipside": "flipside_mcp", "tavily": "tavily"}
+# Sub-task workers running at once across all sources and requests, and sub-tasks kept per source
+RESEARCH_MAX_WORKERS = int(os.getenv("RESEARCH_MAX_WORKERS", "6"))
+RESEARCH_MAX_SUBTASKS = int(os.getenv("RESEARCH_MAX_SUBTASKS", "4"))
+_worker_semaphores = {}
+
+def _worker_semaphore() -> asyncio.Semaphore:
+    # One semaphore per event loop bounds sub-task workers across concurrent runs
+    loop_id = id(asyncio.get_running_loop())
+    if loop_id not in _worker_semaphores:
+        _worker_semaphores[loop_id] = asyncio.Semaphore(RESEARCH_MAX_WORKERS)
+    return _worker_semaphores[loop_id]
+
+def start_research(verification: str, question: str = "") -> Command[Literal["supervisor"]]:
+    """Hand the verified request to the supervisor, resetting per-run state."""
+    return Command(
+        goto="supervisor", 
+        update={
+            "supervisor_messages": {
+                "type": "override",
+                "value": [
+                    SystemMessage(content=supervisor_system_prompt.format(current_datetime=current_datetime, max_subtasks=RESEARCH_MAX_SUBTASKS)),
+                    HumanMessage(content=with_resolved_entities(verification, f"{question}\n{verification}"))
+                ]
+            },
+            # Traces only cover the current research turn, so they do not pile up across a thread
+            "reasoning_traces": {"type": "override", "value": []}
+        }
+    )
 
 async def clarify_with_user(state: SupervisorState, config: RunnableConfig) -> Command[Literal["supervisor", "__end__"]]:
-    if not allow_clarification:
-        return Command(
-            goto="supervisor", 
-            update={"supervisor_messages": {"type": "override",
-                    "value": [
-                        SystemMessage(content=supervisor_system_prompt.format(current_datetime=current_datetime)),
-                        HumanMessage(content=response.verification)
-                    ]
-                }})
-    
+    """Ask a clarifying question if needed, otherwise start the research."""
     messages = state["messages"]
     
-    clarify_model = configurable_model.with_structured_output(ClarifyWithUser).with_retry(stop_after_attempt=max_structured_output_retries)
+    # Local fast path: clearly scoped first-turn questions (or every question when
+    # clarification is disabled) skip the clarify LLM round trip
+    if not allow_clarification or (preclassify_enabled(config) and len(messages) == 1):
+        started = time.monotonic()
+        classification = classify_query(str(messages[-1].content))
+        log_event("clarify", f"preclassify: ambiguity={classification.ambiguity} entities={classification.entities} window={classification.time_window}", logging.DEBUG)
+        if not allow_clarification or classification.is_clear():
+            preclassify_stats.record_fast_path(time.monotonic() - started)
+            return start_research(classification.verification(), classification.question)
+    
+    started = time.monotonic()
+    clarify_model = get_structured_model("clarify", ClarifyWithUser, config)
     response = await clarify_model.ainvoke([HumanMessage(content=clarify_with_user_instructions.format(messages=get_buffer_string(messages), current_datetime=current_datetime))])
+    preclassify_stats.record_llm(time.monotonic() - started)
     
-    print(f"\nresponse clarify_user: \n{response}")
+    log_event("clarify", f"response clarify_user: \n{response}", logging.DEBUG)
     if response.need_clarification:
         return Command(
             goto=END, 
             update={"messages": [AIMessage(content=response.question)]})
     else:
-        return Command(
-            goto="supervisor", 
-            update={
-                "supervisor_messages": {
-                    "type": "override",
-                    "value": [
-                        SystemMessage(content=supervisor_system_prompt.format(current_datetime=current_datetime)),
-                        HumanMessage(content=response.verification)
-                    ]
-                }
-            }
-        )
+        return start_research(response.verification, get_buffer_string(messages))
 
 
 async def supervisor(state:SupervisorState, config: RunnableConfig) -> Command[Literal["heurist_agent", "flipside_agent", "tavily_agent", "__end__"]]:
+    """Delegate sub-tasks to the research agents, or finish when there is nothing to do."""
     supervisor_message = state.get("supervisor_messages", [])
     if isinstance(supervisor_message, str):
         supervisor_message = [HumanMessage(content=supervisor_message)]
-    print(f"\ninput received supervisor: \n{supervisor_message}")
+    log_event("supervisor", f"input received supervisor: \n{supervisor_message}", logging.DEBUG)
     
-    supervisor_model = configurable_model.with_structured_output(DelegateAgent)
+    supervisor_model = get_structured_model("route", DelegateAgent, config)
 
     response = await supervisor_model.ainvoke(supervisor_message)
-    print(f"\nresponse task supervisor: \n{response.heurist_queries} \n{response.flipside_queries} \n{response.tavily_queries}")
+    log_event("supervisor", f"response task supervisor: \n{response.heurist_queries} \n{response.flipside_queries} \n{response.tavily_queries}", logging.DEBUG)
     
     #skip if all None
     if not response.heurist_queries and not response.flipside_queries and not response.tavily_queries:
         return Command(goto="__end__")
 
-    # print(response)
-    coros = []
-    if response.heurist_queries:
-        heurist_call = heurist_subgraph.ainvoke({
-            "heurist_queries": [
-                SystemMessage(content=heurist_mcp_system_prompt.format(current_datetime=current_datetime)),
-                HumanMessage(content=response.heurist_queries)
-            ],
-        }, config)
-        coros.append(heurist_call)
-    if response.flipside_queries:
-        flipside_call = flipside_subgraph.ainvoke({
-            "flipside_queries": [
-                SystemMessage(content=flipside_mcp_system_prompt.format(current_datetime=current_datetime)),
-                HumanMessage(content=response.flipside_queries)
-            ]
-        }, config)
-        coros.append(flipside_call)
-    if response.tavily_queries:
-        tavily_call = tavily_subgraph.ainvoke({
-            "tavily_queries": [
-                SystemMessage(content=tavily_mcp_system_prompt.format(current_datetime=current_datetime)),
-                HumanMessage(content=response.tavily_queries)
-            ]
-        }, config)
-        coros.append(tavily_call)
+    for source in ("heurist", "flipside", "tavily"):
+        subtasks = getattr(response, f"{source}_queries")
+        if len(subtasks) > RESEARCH_MAX_SUBTASKS:
+            log_event("supervisor", f"{source}: keeping {RESEARCH_MAX_SUBTASKS} of {len(subtasks)} sub-tasks", logging.INFO)
+            setattr(response, f"{source}_queries", subtasks[:RESEARCH_MAX_SUBTASKS])
 
-    results = await asyncio.gather(*coros)
-    
-    heurist_results = []
-    flipside_results = []
-    tavily_results = []
-    for result in results:
-        if "heurist_results" in result:
-            heurist_results.append(result["heurist_results"])
-        if "flipside_results" in result:
-            flipside_results.append(result["flipside_results"])
-        if "tavily_results" in result:
-            tavily_results.append(result["tavily_results"])
-
-    return Command(
-        goto="__end__",
-        update={
-            "heurist_queries": response.heurist_queries,
-            "heurist_results": heurist_results,
-            "flipside_queries": response.flipside_queries,
-            "flipside_results": flipside_results,
-            "tavily_queries": response.tavily_queries,
-            "tavily_results": tavily_results
-        }
-    )
+    # Paid tool calls of all agents are charged to this request's credit budget
+    config = with_request_id(config)
+    # Each sub-task runs as its own worker; a source is merged and digested the moment
+    # all its workers finish, so the summary only merges short digests
+    started = time.monotonic()
+    jobs = [
+        ("heurist", heurist_tool_agent, heurist_subgraph, response.heurist_queries),
+        ("flipside", flipside_tool_agent, flipside_subgraph, response.flipside_queries),
+        ("tavily", tavily_tool_agent, tavily_subgraph, response.tavily_queries),
+    ]
+    jobs = [job for job in jobs if job[3]]
+    # {source: {sub-task index: worker result}} of the workers that answered
+    finished = {source: {} for source, *_ in jobs}
 
-async def heurist_agent(state: HeuristAgentState, config: RunnableConfig) -> Command[Literal["__end__"]]:
-    query = state.get("heurist_queries", [])
-    messages = query if isinstance(query, list) else [HumanMessage(content=query)]
-    
-    # Load only heurist MCP tools
-    tools = await load_heurist_mcp(config)
-    # print("MCP QUERY IN FUNCTION:", query)
-    if not query:
-        return Command(
-            goto="__end__", 
-            update={
-                "heurist_queries": [HumanMessage(content="No MCP messages provided")],
-                "heurist_results": ["No MCP messages provided"]
-                }
-            )
-    
-    HeuristAgent_model = configurable_model.bind_tools(tools)
-    while True:
-        response = await HeuristAgent_model.ainvoke(messages, config)
-        
-        if response.tool_calls:
-            tool_calls = response.tool_calls
-            tasks = []
-            for call in tool_calls:
-                tool = next((t for t in tools if t.name==call['name']), None)
-                if tool:
-                    tasks.append(retry_mcp_tool_call(tool, call["args"]))
-        
-            results = await asyncio.gather(*tasks, return_exceptions=True)
+    async def run_subtask(source, agent, subgraph, i, task):
+        async with _worker_semaphore():
+            result = await subgraph.ainvoke({agent.queries_key: agent.initial_messages(task)}, config)
+        finished[source][i] = result
+        return result
 
-            tool_messages = []
-            for call, result in zip(tool_calls, results):
-                if isinstance(result, Exception):
-                    # If the tool call failed after retries, create an error message
-                    error_content = f"Tool call failed after retries: {str(result)}"
-                    tool_messages.append(ToolMessage(
-                        name=call["name"],
-                        tool_call_id=call["id"],
-                        content=error_content
-                    ))
-                else:
-                    tool_messages.append(ToolMessage(
-                        name=call["name"],
-                        tool_call_id=call["id"],
-                        content=result
-                    ))
-            messages.append(response)
-            messages.extend(tool_messages)
-        else:
-            break
-    
-    return Command(
-        goto="__end__",
-        update={
-            "heurist_queries": query,
-            "heurist_results": response.content
+    async def research(source, agent, subgraph, subtasks):
+        breaker = get_circuit_breaker(SOURCE_SERVERS[source])
+        if not breaker.available():
+            # Fail fast instead of letting the agent spend its rounds on a server that is down
+            return source, None, None, f"{breaker.server} unavailable after repeated failures"
+        metrics.observe("research.subtasks", len(subtasks), source=source)
+        outcomes = await asyncio.gather(
+            *(run_subtask(source, agent, subgraph, i, task) for i, task in enumerate(subtasks)),
+            return_exceptions=True,
+        )
+        errors = [e for e in outcomes if isinstance(e, BaseException)]
+        for e in errors:
+            log_event("supervisor", f"{source} agent failed: {e}", logging.WARNING)
+        if len(errors) == len(subtasks):
+            return source, None, None, f"agent failed: {errors[0]}"
+        answers = {i: r.get(agent.results_key) for i, r in finished[source].items()}
+        result = {
+            agent.results_key: merge_subtask_results(subtasks, answers, "agent failed"),
+            "reasoning_traces": [t for _, r in sorted(finished[source].items()) for t in r.get("reasoning_traces") or []],
         }
-    )
-heurist_builder = StateGraph(HeuristAgentState)
-heurist_builder.add_node("heurist_agent", heurist_agent)
-heurist_builder.set_entry_point("heurist_agent")
-heurist_builder.add_edge("heurist_agent", END)
-heurist_subgraph = heurist_builder.compile()
+        digest = await digest_source(source, format_subtasks(subtasks), result[agent.results_key], config, started)
+        log_event("supervisor", f"{source} digest of {len(subtasks)} sub-task(s) ready after {digest['ready_after_s']}s", logging.INFO)
+        emit_progress("supervisor", "digest_ready", source=source, ready_after_s=digest["ready_after_s"])
+        return source, result, digest, None
 
-async def flipside_agent(state: FlipsideAgentState, config: RunnableConfig) -> Command[Literal["__end__"]]:
-    query = state.get("flipside_queries", [])
-    messages = query if isinstance(query, list) else [HumanMessage(content=query)]
-    
-    # Load only flipside MCP tools
-    tools = await load_flipside_mcp(config)
-    # print("MCP QUERY IN FUNCTION:", query)
-    if not query:
-        return Command(
-            goto="__end__", 
-            update={
-                "flipside_queries": [HumanMessage(content="No MCP messages provided")],
-                "flipside_results": ["No MCP messages provided"]
-                }
-            )
-    
-    FlipsideAgent_model = configurable_model.bind_tools(tools)
-    while True:
-        response = await FlipsideAgent_model.ainvoke(messages, config)
-        
-        if response.tool_calls:
-            tool_calls = response.tool_calls
-            tasks = []
-            for call in tool_calls:
-                tool = next((t for t in tools if t.name==call['name']), None)
-                if tool:
-                    tasks.append(retry_mcp_tool_call(tool, call["args"]))
-        
-            results = await asyncio.gather(*tasks, return_exceptions=True)
+    results = {"heurist": [], "flipside": [], "tavily": []}
+    source_digests = []
+    missing_sources = []
+    reasoning_traces = []
+    tasks = [asyncio.ensure_future(research(*job)) for job in jobs]
+    deadline = research_deadline(config)
+    try:
+        for next_done in asyncio.as_completed(tasks, timeout=deadline):
+            source, result, digest, error = await next_done
+            if error:
+                missing_sources.append({"source": source, "reason": error})
+                continue
+            reasoning_traces.extend(result.get("reasoning_traces") or [])
+            results[source].append(result[f"{source}_results"])
+            source_digests.append(digest)
+    except asyncio.TimeoutError:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        done = {d["source"] for d in source_digests} | {m["source"] for m in missing_sources}
+        for source, agent, _, subtasks in jobs:
+            if source in done:
+                continue
+            if finished[source]:
+                # Some workers answered but the source was not merged and digested in time
+                answers = {i: r.get(agent.results_key) for i, r in finished[source].items()}
+                merged = merge_subtask_results(subtasks, answers, f"no result within the {deadline:g}s research deadline")
+                results[source].append(merged)
+                source_digests.append(fallback_digest(source, format_subtasks(subtasks), merged, started))
+            else:
+                missing_sources.append({"source": source, "reason": f"no result within the {deadline:g}s research deadline"})
+                emit_progress("supervisor", "source_missing", source=source)
+                metrics.incr("research.missing_sources", source=source)
+        log_event("supervisor", f"research deadline of {deadline:g}s reached, missing: {[m['source'] for m in missing_sources]}", logging.WARNING)
+    log_event("supervisor", f"credits spent: {credit_ledger.spent(config):g} (remaining: {credit_ledger.remaining(config)})", logging.INFO)
 
-            tool_messages = []
-            for call, result in zip(tool_calls, results):
-                if isinstance(result, Exception):
-                    # If the tool call failed after retries, create an error message
-                    error_content = f"Tool call failed after retries: {str(result)}"
-                    tool_messages.append(ToolMessage(
-                        name=call["name"],
-                        tool_call_id=call["id"],
-                        content=error_content
-                    ))
-                else:
-                    tool_messages.append(ToolMessage(
-                        name=call["name"],
-                        tool_call_id=call["id"],
-                        content=result
-                    ))
-            messages.append(response)
-            messages.extend(tool_messages)
-        else:
-            break
-    
     return Command(
         goto="__end__",
         update={
-            "flipside_queries": query,
-            "flipside_results": response.content
+            "heurist_queries": response.heurist_queries,
+            "heurist_results": results["heurist"],
+            "flipside_queries": response.flipside_queries,
+            "flipside_results": results["flipside"],
+            "tavily_queries": response.tavily_queries,
+            "tavily_results": results["tavily"],
+            "source_digests": source_digests,
+            "missing_sources": missing_sources,
+            "reasoning_traces": reasoning_traces
         }
     )
-flipside_builder = StateGraph(FlipsideAgentState)
-flipside_builder.add_node("flipside_agent", flipside_agent)
-flipside_builder.set_entry_point("flipside_agent")
-flipside_subgraph = flipside_builder.compile()
 
-async def tavily_agent(state: TavilyAgentState, config: RunnableConfig) -> Command[Literal["__end__"]]:
-    query = state.get("tavily_queries", [])
-    messages = query if isinstance(query, list) else [HumanMessage(content=query)]
-    
-    # Load Tavily search tool
-    tools = await load_tavily_search(config)
-    if not query:
-        return Command(
-            goto="__end__", 
-            update={
-                "tavily_queries": [HumanMessage(content="No messages provided")],
-                "tavily_results": ["No messages provided"]
-                }
-            )
-    
-    tavily_model = configurable_model.bind_tools(tools)
-    while True:
-        response = await tavily_model.ainvoke(messages, config)
-        
-        if response.tool_calls:
-            tool_calls = response.tool_calls
-            tasks = []
-            for call in tool_calls:
-                tool = next((t for t in tools if t.name==call['name']), None)
-                if tool:
-                    tasks.append(tool.ainvoke(call["args"]))
-        
-            results = await asyncio.gather(*tasks, return_exceptions=True)
-            
-            tool_messages = []
-            for call, result in zip(tool_calls, results):
-                if isinstance(result, Exception):
-                    # If the tool call failed, create an error message
-                    error_content = f"Search failed: {str(result)}"
-                    tool_messages.append(ToolMessage(
-                        name=call["name"],
-                        tool_call_id=call["id"],
-                        content=error_content
-                    ))
-                else:
-                    tool_messages.append(ToolMessage(
-                        name=call["name"],
-                        tool_call_id=call["id"],
-                        content=result
-                    ))
-            messages.append(response)
-            messages.extend(tool_messages)
-        else:
-            break
-    
-    return Command(
-        goto="__end__",
-        update={
-            "tavily_queries": query,
-            "tavily_results": response.content
-        }
-    )
+heurist_tool_agent = ToolAgent(
+    name="heurist",
+    load_tools=load_heurist_tools,
+    system_prompt=heurist_mcp_system_prompt,
+    call_tool=processed_mcp_tool_call,
+    label="Heurist MCP",
+)
+heurist_agent = heurist_tool_agent.node
+heurist_subgraph = heurist_tool_agent.build_subgraph(HeuristAgentState)
 
-tavily_builder = StateGraph(TavilyAgentState)
-tavily_builder.add_node("tavily_agent", tavily_agent)
-tavily_builder.set_entry_point("tavily_agent")
-tavily_subgraph = tavily_builder.compile()
+flipside_tool_agent = ToolAgent(
+    name="flipside",
+    load_tools=load_flipside_mcp,
+    system_prompt=flipside_mcp_system_prompt,
+    call_tool=flipside_tool_call,
+    label="Flipside MCP",
+)
+flipside_agent = flipside_tool_agent.node
+flipside_subgraph = flipside_tool_agent.build_subgraph(FlipsideAgentState)
+
+tavily_tool_agent = ToolAgent(
+    name="tavily",
+    load_tools=load_tavily_search,
+    system_prompt=tavily_mcp_system_prompt,
+    call_tool=lambda tool, args, config: coalesced_tool_call(tool, args),
+    label="Tavily search",
+    error_prefix="Search failed",
+)
+tavily_agent = tavily_tool_agent.node
+tavily_subgraph = tavily_tool_agent.build_subgraph(TavilyAgentState)
 
 supervisor_builder = StateGraph(SupervisorState)
 supervisor_builder.add_node("supervisor", supervisor)
@@ -339,20 +290,27 @@ supervisor_builder.add_edge("supervisor", END)
 supervisor_subgraph = supervisor_builder.compile()
 
 async def summary_agent(state: SupervisorState, config: RunnableConfig): 
+    """Write the final report from the research results."""
     heurist_state = state.get("heurist_results", [])
     flipside_state = state.get("flipside_results", [])
     tavily_state = state.get("tavily_results", [])
+    source_digests = state.get("source_digests") or []
+    missing_sources = state.get("missing_sources") or []
+    thread_id = (config or {}).get("configurable", {}).get("thread_id")
     cleared_state = {
         "heurist_results": {"type": "override", "value": []}, 
         "flipside_results": {"type": "override", "value": []},
-        "tavily_results": {"type": "override", "value": []}
+        "tavily_results": {"type": "override", "value": []},
+        "source_digests": {"type": "override", "value": []},
+        "missing_sources": {"type": "override", "value": []}
     }
     
     heurist_results = heurist_state if isinstance(heurist_state, list) else [HumanMessage(content=heurist_state)]
     flipside_results = flipside_state if isinstance(flipside_state, list) else [HumanMessage(content=flipside_state)]
     tavily_results = tavily_state if isinstance(tavily_state, list) else [HumanMessage(content=tavily_state)]
     
-    if not heurist_results and not flipside_results and not tavily_results:
+    if not source_digests and not heurist_results and not flipside_results and not tavily_results:
+        report_metrics(thread_id)
         return Command(
             goto=END, 
             update={
@@ -362,18 +320,53 @@ async def summary_agent(state: SupervisorState, config: RunnableConfig):
             )
 
     summary_prompt = summary_system_prompt.format(
-        heurist_results=heurist_results,
-        flipside_results=flipside_results,
-        tavily_results=tavily_results
+        worker_outputs=format_worker_outputs(source_digests, {
+            "heurist": heurist_results,
+            "flipside": flipside_results,
+            "tavily": tavily_results
+        }),
+        missing_sources=format_missing_sources(missing_sources)
     )
+    # Stream the report: answer tokens go out as `custom` progress events (reasoning removed). The model
+    # runs tagged nostream so its raw chunks, reasoning included, stay out of the `messages` stream mode,
+    # which gets the stripped report once the node returns.
+    summary_config = {**(config or {}), "tags": [*(config or {}).get("tags", []), TAG_NOSTREAM]}
+    started = time.monotonic()
+    emit_progress("summary", "start", sources=[d["source"] for d in source_digests])
     try:
-        summary = await summary_model.ainvoke([HumanMessage(content=summary_prompt)])
-        return {
+        stream_filter = ReasoningStreamFilter()
+        first_token = None
+        chunks = None
+        async for chunk in get_model("summary", config).astream([HumanMessage(content=summary_prompt)], summary_config):
+            chunks = chunk if chunks is None else chunks + chunk
+            text, reset = stream_filter.feed(content_text(chunk.content))
+            if reset:
+                emit_progress("summary", "reset")
+            if text:
+                if first_token is None:
+                    first_token = time.monotonic() - started
+                    metrics.observe("summary.ttft_seconds", first_token)
+                emit_progress("summary", "token", text=text)
+        tail = stream_filter.flush()
+        if tail:
+            emit_progress("summary", "token", text=tail)
+        if chunks is None:
+            raise ValueError("summary model returned an empty stream")
+        summary, reasoning = strip_reasoning(message_chunk_to_message(chunks), "summary")
+        metrics.observe("summary.seconds", time.monotonic() - started)
+        emit_progress("summary", "finish", ok=True, seconds=round(time.monotonic() - started, 2))
+        update = {
             "final_answer": summary.content,
             "messages": [summary],
             **cleared_state
         }
+        if keep_reasoning(config):
+            update["reasoning_traces"] = reasoning_trace("summary", reasoning)
+        report_metrics(thread_id)
+        return update
     except Exception as e:
+        emit_progress("summary", "finish", ok=False, seconds=round(time.monotonic() - started, 2))
+        report_metrics(thread_id)
         return {
             "final_answer": "Error generating final report: Maximum retries exceeded",
             "messages": [AIMessage(content=f"Error generating final report: {e}")],
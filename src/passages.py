@@ -0,0 +1,205 @@
+"""Query-relevant passage extraction from raw web page content."""
+
+import asyncio
+import math
+import os
+import re
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+from src.metrics import metrics
+
+##########################
+# Passage Extraction
+##########################
+PASSAGE_TOKEN_BUDGET = int(os.getenv("TAVILY_PASSAGE_TOKENS", "300"))
+PASSAGE_TARGET_CHARS = int(os.getenv("TAVILY_PASSAGE_CHARS", "500"))
+PASSAGE_WORKERS = int(os.getenv("PASSAGE_WORKERS", "2"))
+CHARS_PER_TOKEN = 4
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "for", "from", "has", "have", "how", "in", "is", "it", "its",
+    "of", "on", "or", "that", "the", "this", "to", "was", "were", "what", "when", "which", "who", "why", "will",
+    "with", "about", "after", "over", "into", "than", "then", "there", "their", "they", "we", "you", "your", "our",
+}
+
+_TAG = re.compile(r"<(script|style)[^>]*>.*?</\1>|<[^>]+>", re.DOTALL | re.IGNORECASE)
+_MD_IMAGE = re.compile(r"!\[[^\]]*\]\([^)]*\)")
+_MD_LINK = re.compile(r"\[([^\]]*)\]\([^)]*\)")
+_BARE_URL = re.compile(r"https?://\S+")
+_ENTITY = re.compile(r"&(nbsp|amp|lt|gt|quot|#39);")
+_ENTITIES = {"nbsp": " ", "amp": "&", "lt": "<", "gt": ">", "quot": '"', "#39": "'"}
+_SENTENCE = re.compile(r"(?<=[.!?])\s+(?=[A-Z0-9\"'(])")
+_TERM = re.compile(r"[a-z0-9][a-z0-9$%.\-]*[a-z0-9%]|[a-z0-9]")
+
+_executor: Optional[ThreadPoolExecutor] = None
+
+
+def clean_raw_content(text: str) -> str:
+    """Strip markup and navigation boilerplate from scraped page content.
+
+    HTML tags, images, link targets and bare URLs are removed. Runs of three
+    or more short lines without sentence punctuation (menus, footers,
+    breadcrumbs) are dropped.
+
+    Args:
+        text: Raw page content from Tavily
+
+    Returns:
+        str: Cleaned text with paragraphs separated by blank lines
+    """
+    text = _TAG.sub(" ", text or "")
+    text = _MD_IMAGE.sub("", text)
+    text = _MD_LINK.sub(r"\1", text)
+    text = _BARE_URL.sub("", text)
+    text = _ENTITY.sub(lambda m: _ENTITIES[m.group(1)], text)
+
+    lines = [re.sub(r"[ \t]+", " ", line).strip(" #*|-") for line in text.splitlines()]
+    kept, run = [], []
+
+    def is_nav(line: str) -> bool:
+        return 0 < len(line.split()) <= 4 and not re.search(r"[.!?:]$", line) and not re.search(r"\d", line)
+
+    for line in lines + [""]:
+        if is_nav(line):
+            run.append(line)
+            continue
+        if 0 < len(run) < 3:
+            kept.extend(run)
+        run = []
+        kept.append(line)
+    return re.sub(r"\n{3,}", "\n\n", "\n".join(kept)).strip()
+
+
+def split_passages(text: str, target_chars: int = PASSAGE_TARGET_CHARS) -> List[str]:
+    """Split cleaned text into passages of roughly `target_chars`.
+
+    Short paragraphs are merged with their neighbours and long ones are cut
+    at sentence boundaries.
+
+    Args:
+        text: Cleaned page text
+        target_chars: Preferred passage size
+
+    Returns:
+        List[str]: Passages in document order
+    """
+    units = []
+    for paragraph in re.split(r"\n\s*\n", text):
+        paragraph = " ".join(paragraph.split())
+        if not paragraph:
+            continue
+        if len(paragraph) <= target_chars:
+            units.append(paragraph)
+        else:
+            units.extend(s for s in _SENTENCE.split(paragraph) if s)
+
+    passages, current = [], ""
+    for unit in units:
+        if current and len(current) + len(unit) + 1 > target_chars:
+            passages.append(current)
+            current = ""
+        current = f"{current} {unit}".strip()
+    if current:
+        passages.append(current)
+    return passages
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase terms without stopwords; keeps tickers, numbers and percentages whole."""
+    return [t for t in _TERM.findall(text.lower()) if t not in STOPWORDS]
+
+
+class PassageIndex:
+    """BM25 index over the passages of one batch of search results.
+
+    Passages are tokenized and the document frequencies and average length
+    are computed once, so each result is ranked against its own query
+    without re-tokenizing the corpus.
+    """
+
+    def __init__(self, passages: List[List[str]]):
+        """Index the passages of each document for BM25 scoring."""
+        self.passages = passages
+        self.tokens = [[Counter(tokenize(p)) for p in doc] for doc in passages]
+        self.lengths = [[sum(tf.values()) for tf in doc] for doc in self.tokens]
+        total = sum(len(doc) for doc in passages)
+        self.avgdl = sum(sum(doc) for doc in self.lengths) / max(1, total)
+        df: Counter = Counter()
+        for doc in self.tokens:
+            for tf in doc:
+                df.update(tf.keys())
+        self.idf: Dict[str, float] = {
+            term: math.log(1 + (total - n + 0.5) / (n + 0.5)) for term, n in df.items()
+        }
+
+    def scores(self, doc: int, query: str) -> List[float]:
+        """BM25 score of each passage of a document against the query."""
+        terms = set(tokenize(query))
+        scored = []
+        for tf, length in zip(self.tokens[doc], self.lengths[doc]):
+            norm = BM25_K1 * (1 - BM25_B + BM25_B * length / max(1e-9, self.avgdl))
+            scored.append(sum(
+                self.idf.get(t, 0.0) * tf[t] * (BM25_K1 + 1) / (tf[t] + norm)
+                for t in terms if t in tf
+            ))
+        return scored
+
+    def top_passages(self, doc: int, query: str, token_budget: int) -> str:
+        """Best passages of one result within a token budget, in document order.
+
+        Args:
+            doc: Result position in the batch
+            query: The query that returned the result
+            token_budget: Approximate tokens to keep
+
+        Returns:
+            str: Selected passages joined with " ... "
+        """
+        passages = self.passages[doc]
+        if not passages:
+            return ""
+        scores = self.scores(doc, query)
+        budget = token_budget * CHARS_PER_TOKEN
+        ranked = sorted(range(len(passages)), key=lambda i: (-scores[i], i))
+        chosen, used = [], 0
+        for i in ranked:
+            if used and used + len(passages[i]) > budget:
+                continue
+            chosen.append(i)
+            used += len(passages[i])
+            if used >= budget:
+                break
+        text = " ... ".join(passages[i] for i in sorted(chosen))
+        return text[:budget] + "..." if len(text) > budget else text
+
+
+def extract_passages(results: List[dict], token_budget: int = PASSAGE_TOKEN_BUDGET) -> List[str]:
+    """Pick the passages of each result's raw content most relevant to its query.
+
+    Args:
+        results: Search results with "raw_content" and the originating "query"
+        token_budget: Approximate tokens to keep per result
+
+    Returns:
+        List[str]: Extracted text per result, empty when it has no raw content
+    """
+    passages = [split_passages(clean_raw_content(r.get("raw_content") or "")) for r in results]
+    index = PassageIndex(passages)
+    extracted = [index.top_passages(i, r.get("query", ""), token_budget) for i, r in enumerate(results)]
+    raw_chars = sum(len(r.get("raw_content") or "") for r in results)
+    if raw_chars:
+        metrics.observe("passages.kept_ratio", sum(len(e) for e in extracted) / raw_chars)
+    return extracted
+
+
+async def extract_passages_async(results: List[dict], token_budget: int = PASSAGE_TOKEN_BUDGET) -> List[str]:
+    """Run `extract_passages` in the passage thread pool so cleanup never blocks the event loop."""
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=PASSAGE_WORKERS, thread_name_prefix="passages")
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor, extract_passages, results, token_budget)
@@ -0,0 +1,156 @@
+"""Local pre-classifier that skips the clarify LLM for clear questions."""
+
+import logging
+import os
+import re
+from dataclasses import dataclass, field
+from typing import List, Optional, Tuple
+
+from langchain_core.runnables import RunnableConfig
+
+from src.entities import get_entity_index
+from src.metrics import log_event, metrics
+
+##########################
+# Local Query Pre-classifier
+##########################
+PRECLASSIFY = os.getenv("PRECLASSIFY", "true").lower() == "true"
+# Questions scoring strictly below this skip the clarify LLM; a tie counts as ambiguous, so scope and
+# time window without an intent (0.35, e.g. "Should I invest in the market now") still get clarified
+PRECLASSIFY_THRESHOLD = float(os.getenv("PRECLASSIFY_THRESHOLD", "0.35"))
+
+# Words that scope a question to the whole market rather than one asset
+MARKET_SCOPE = {"market", "top", "highest", "biggest", "largest", "trending", "gainers", "losers",
+                "cryptocurrencies", "cryptos", "coins", "tokens", "memecoins", "altcoins", "defi", "crypto"}
+
+INTENTS = {
+    "price performance": ["price", "perform", "performance", "gain", "gains", "pump", "dump", "moved", "rally", "chart", "ath"],
+    "trading activity": ["volume", "liquidity", "trading", "market cap", "mcap", "open interest", "funding"],
+    "news": ["news", "announcement", "headline", "update", "updates", "happening"],
+    "social sentiment": ["sentiment", "saying", "twitter", " x ", "tweets", "influencer", "kol", "community"],
+    "on-chain health": ["tvl", "users", "active", "retention", "on-chain", "onchain", "health", "healthy", "revenue", "fees", "growth", "wallet"],
+    "outlook": ["prediction", "predict", "forecast", "outlook", "projection", "projections", "future", "analysis"],
+}
+
+# Domain acronyms that are not ambiguous on their own
+KNOWN_ACRONYMS = {"USD", "USDT", "USDC", "TVL", "DEX", "CEX", "NFT", "KOL", "AI", "DAU", "MAU", "ETF", "ATH",
+                  "ATL", "APY", "APR", "L1", "L2", "OI", "RSI", "MACD", "VWAP", "SQL", "DEFI", "X", "I", "UTC"}
+
+_TIME_WINDOW = re.compile(
+    r"\b(?:last|past|previous|over the last|over the past)\s+(\d+|a|an|one|few)?\s*"
+    r"(minutes?|mins?|hours?|hrs?|h|days?|d|weeks?|w|months?|years?)\b"
+    r"|\b(\d+)\s*(h|d|w|m)\b"
+    r"|\b(today|yesterday|tonight|this week|this month|this year|ytd|24 ?hours?|right now|now|currently)\b",
+    re.IGNORECASE,
+)
+_WORD = re.compile(r"\$?[A-Za-z][A-Za-z0-9\-]*")
+
+
+@dataclass
+class QueryClassification:
+    """Result of classifying a user question locally."""
+    question: str
+    entities: List[Tuple[str, str]] = field(default_factory=list)
+    market_wide: bool = False
+    time_window: Optional[str] = None
+    intents: List[str] = field(default_factory=list)
+    unknown_terms: List[str] = field(default_factory=list)
+    ambiguity: float = 1.0
+
+    def is_clear(self, threshold: float = PRECLASSIFY_THRESHOLD) -> bool:
+        """Whether the question is clear enough to skip the clarify LLM."""
+        # Strict: a score equal to the threshold is ambiguous
+        return self.ambiguity < threshold
+
+    def verification(self) -> str:
+        """Verification message handed to the supervisor in place of the clarify LLM's."""
+        scope = ", ".join(f"{name} ({ticker})" for name, ticker in self.entities) or "the overall crypto market"
+        parts = [f'I have enough information to start the research on: "{self.question.strip()}"',
+                 f"- Scope: {scope}"]
+        if self.time_window:
+            parts.append(f"- Time window: {self.time_window}")
+        if self.intents:
+            parts.append(f"- Focus: {', '.join(self.intents)}")
+        parts.append("I will now begin the research.")
+        return "\n".join(parts)
+
+
+def classify_query(question: str) -> QueryClassification:
+    """Resolve entities, time window and intent of a question and score its ambiguity.
+
+    Args:
+        question: The user's question
+
+    Returns:
+        QueryClassification: Classification with an ambiguity score in [0, 1]
+    """
+    result = QueryClassification(question=question)
+    lowered = f" {question.lower()} "
+    words = [w.lstrip("$") for w in _WORD.findall(question)]
+
+    index = get_entity_index()
+    result.entities = [(entity.name, entity.symbol or entity.name) for entity in index.resolve(question)]
+    result.market_wide = any(w.lower() in MARKET_SCOPE for w in words)
+
+    window = _TIME_WINDOW.search(question)
+    if window:
+        result.time_window = window.group(0).strip()
+    result.intents = [intent for intent, keywords in INTENTS.items() if any(k in lowered for k in keywords)]
+
+    for w in words:
+        if w.isupper() and 2 <= len(w) <= 6 and w not in KNOWN_ACRONYMS and not index.is_known(w):
+            result.unknown_terms.append(w)
+
+    score = 1.0
+    if result.entities or result.market_wide:
+        score -= 0.45
+    if result.intents:
+        score -= 0.3
+    if result.time_window:
+        score -= 0.2
+    score += 0.3 * len(result.unknown_terms)
+    if len(words) < 4:
+        score += 0.2
+    result.ambiguity = round(min(1.0, max(0.0, score)), 2)
+    return result
+
+
+def preclassify_enabled(config: RunnableConfig) -> bool:
+    """Whether the local fast path runs before the clarify LLM (`configurable.preclassify`)."""
+    value = (config or {}).get("configurable", {}).get("preclassify")
+    return PRECLASSIFY if value is None else bool(value)
+
+
+class PreclassifyStats:
+    """Decision counts and an estimate of the latency the fast path saves."""
+
+    def __init__(self, default_llm_seconds: float = 4.0, alpha: float = 0.2):
+        """Start with a default clarify LLM latency, smoothed with alpha."""
+        self.llm_seconds = default_llm_seconds
+        self.alpha = alpha
+        self.fast_path = 0
+        self.llm_path = 0
+
+    def record_llm(self, seconds: float):
+        """Record a clarify LLM call and update its average latency."""
+        self.llm_path += 1
+        self.llm_seconds = (1 - self.alpha) * self.llm_seconds + self.alpha * seconds
+        metrics.incr("preclassify.decisions", path="llm")
+        metrics.observe("preclassify.llm_seconds", seconds)
+
+    def record_fast_path(self, seconds: float):
+        """Record a fast-path decision and the latency it saved."""
+        self.fast_path += 1
+        saved = max(0.0, self.llm_seconds - seconds)
+        metrics.incr("preclassify.decisions", path="fast")
+        metrics.incr("preclassify.latency_saved_seconds", saved)
+        log_event("clarify", f"clarify fast path taken ({self.fast_path}/{self.fast_path + self.llm_path} turns), saved ~{saved:.2f}s", logging.DEBUG)
+
+    @property
+    def fast_path_rate(self) -> float:
+        """Fraction of questions that took the fast path."""
+        total = self.fast_path + self.llm_path
+        return self.fast_path / total if total else 0.0
+
+
+preclassify_stats = PreclassifyStats()
@@ -0,0 +1,27 @@
+"""Progress events streamed to callers through the custom stream mode."""
+
+import time
+
+from langgraph.config import get_stream_writer
+
+##########################
+# Progress Events
+##########################
+
+
+def emit_progress(agent: str, event: str, **fields):
+    """Send a progress event to LangGraph's `custom` stream mode.
+
+    Events look like `{"agent": "heurist", "event": "tool_call", "ts": ..., "tool": ...}`.
+    Outside a graph run (e.g. when an agent is called directly) this is a no-op.
+
+    Args:
+        agent: Agent or node the event belongs to
+        event: Event name, e.g. "start", "tool_call", "tool_result", "finish", "token"
+        **fields: Event payload
+    """
+    try:
+        writer = get_stream_writer()
+    except RuntimeError:
+        return
+    writer({"agent": agent, "event": event, "ts": time.time(), **fields})
@@ -1,3 +1,5 @@
+"""Prompts of the orchestrator and tool agents."""
+
 #prompt uhuy
 clarify_with_user_instructions="""
 These are the messages that have been exchanged so far from the user messages:
@@ -123,6 +125,12 @@ Your focus is to intelligently delegate tasks to the most appropriate agents wit
 - Ensure each agent uses only the tools relevant to their part of the analysis
 - Coordinate different perspectives without forcing irrelevant tool usage
 
+**Sub-tasks** (each agent input is a list):
+- Give each agent a list of independent sub-tasks; each sub-task runs as its own worker in parallel, so split multi-asset and comparative questions into one sub-task per asset, protocol or chain
+- Example: "compare Aave, Compound and Morpho lending activity" becomes three flipside sub-tasks, one per protocol, each naming the same metrics and time window so the results can be compared
+- Every sub-task must be self-contained: workers do not see each other's tasks or results
+- Use a single sub-task when the question is about one subject, at most {max_subtasks} per agent, and an empty list for agents that are not needed
+
 </Agent-Specific Guidelines>
 
 <Important Guidelines>
@@ -134,6 +142,7 @@ Your focus is to intelligently delegate tasks to the most appropriate agents wit
 - **Don't force all tools** - only use tools that will provide meaningful insights
 - **Provide specific, focused instructions** to agents about which tools to use
 - Do not give task to "flipside_agent" with SQL Query input, give the task only text input.
+- If the message includes a <Resolved Entities> block, refer to those entities by their listed names and tickers in the agent tasks. The agents receive the same identifiers, so do not ask them to look up tickers, CoinGecko ids, contracts or protocol slugs for these entities.
 </Important Guidelines>  
 """
 
@@ -180,6 +189,7 @@ You may use more than one tool within MCP if necessary to answer the supervisor'
 - Prediction = "1 credit/use", a tool for predicting the price of Ethereum (ETH) or Bitcoin (BTC) with confidence intervals using the Allora price prediction API.
 - Wallet Analysis = "Free", a tool for analyzing crypto wallet activities on the Ethereum, Solana, and Base networks using the Cryptopond API.
 - Blockchain Intelligence = "1 credit/use", a tool for analyzing blockchain data using Arkham Intelligence.
+- Market Analytics = "Free", the local `market_analytics` tool computing returns over any window, volatility, max drawdown, VWAP, RSI and MACD, and ranking top movers.
 </Tools Description by Category>
 
 <Helpful Tips>
@@ -189,6 +199,8 @@ You may use more than one tool within MCP if necessary to answer the supervisor'
 4. Avoid generating answers without data sources; always use tools within MCP.
 5. Save all the tools you use into structured output, for example:
    - Tools used: 'Token Analysis: GMGN', 'Twitter: Elfa', 'Prediction: Allora'
+6. Price series in Trading results arrive as digests (change, volatility, drawdown, RSI, MACD) with a `series_id`. Never compute returns or indicators from prices yourself: call `market_analytics` with the `series_id` values, e.g. for a different return window or to compare assets.
+7. Paid tools are marked "[Paid: N credit/call]" and draw from a per-request credit budget; repeating an earlier call with the same arguments is free while it is cached. Plan paid calls before making them. A result with `"error": "credit_budget_exceeded"` means the call was not executed: continue with free tools or the data you already have instead of retrying it.
 </Helpful Tips>
 
 <Critical Reminders>  
@@ -241,6 +253,7 @@ Current Date and Time: {current_datetime}
 - Select tools that are appropriate for the task. If multiple tools have the same function, choose the best tool or the tool with different parameters to address the task.
 - Tool calling is resource-intensive, so ensure you use tools that address the task. Avoid calling tools with the same parameters and functionality.
 - Do not call tools that are not listed in the MCP tool list.
+- `run_public_sql_query` results are cached. To filter or aggregate a result you already have, wrap the earlier SQL unchanged as a subquery (e.g. `SELECT chain, SUM(active_users) FROM (<earlier SQL>) t GROUP BY chain`). Follow-ups that only select columns, filter with =, <>, <, >, BETWEEN, IN or IS NULL against literals, and use COUNT/SUM/MIN/MAX with GROUP BY/HAVING are answered locally without a new Flipside query; anything else (arithmetic, LIKE, ORDER BY, LIMIT, other functions) runs on Flipside as usual.
 </Tool Calling Guidelines>
 
 <Instruction>
@@ -365,14 +378,36 @@ You may use multiple search queries if necessary to answer the supervisor's task
 <Critical Reminders>
 """
 
+budget_exhausted_prompt = """Your research budget for this task is exhausted ({reason}). Do not call any more tools.
+Using only the data already collected in this conversation, write your final answer to the assigned task now.
+Clearly state which parts of the task could not be covered with the data collected.
+"""
+
+source_digest_prompt = """Condense the findings of the {source} research agent below into a digest for the final report writer.
+
+<Assigned Task>
+{task}
+</Assigned Task>
+
+<Agent Findings>
+{findings}
+</Agent Findings>
+
+<Digest Rules>
+- Keep every number, percentage, price, date, time window, named entity, quote and source URL exactly as written.
+- Keep critical judgements, risks and red flags, and note which parts of the task the agent could not cover.
+- Drop narration, tool names, repetition and generic filler.
+- Use short bullet points grouped by theme, at most about {max_words} words in total.
+- Do not add information that is not in the findings.
+</Digest Rules>
+"""
+
 summary_system_prompt = """Based on research and findings from the worker agents, create a comprehensive, well-structured, and critically engaging article that preserves **all valuable information** from the worker agents, integrating it into a single cohesive narrative for a general audience interested in market research and analysis.
 
 <Worker-Agents Output>
-{heurist_results}
-{flipside_results}
-{tavily_results}
+{worker_outputs}
 </Worker-Agents Output>
-
+{missing_sources}
 <Core Principle>
 You must NOT add, invent, or remove factual information.
 Preserve all specific metrics, data points, quotes, and context from the worker agents.
@@ -0,0 +1,187 @@
+"""Adaptive per-server rate limiting for upstream calls."""
+
+import asyncio
+import json
+import logging
+import os
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Deque, Dict, Optional
+
+from src.metrics import log_event, metrics
+
+##########################
+# Adaptive Rate Limiting
+##########################
+# Upper bound of the adaptive concurrency window per server
+MAX_CONCURRENCY = int(os.getenv("MCP_MAX_CONCURRENCY", "8"))
+DEFAULT_RATE_LIMITS = {
+    "heurist_mcp": {"rps": 5, "burst": 10},
+    "flipside_mcp": {"rps": 2, "burst": 4, "max_concurrency": 4},
+    "tavily": {"rps": 5, "burst": 10},
+}
+# Latency above this multiple of the server's baseline counts as congestion
+LATENCY_TOLERANCE = float(os.getenv("RATE_LIMIT_LATENCY_TOLERANCE", "3"))
+# Error kinds (see resilience.classify_error) that shrink the concurrency window
+THROTTLE_KINDS = {"rate_limited", "timeout", "server"}
+
+
+@dataclass
+class RateLimitConfig:
+    """Requests per second (0 for no rate limit), bucket size and concurrency window bounds."""
+    rps: float = float(os.getenv("RATE_LIMIT_RPS", "5"))
+    burst: float = float(os.getenv("RATE_LIMIT_BURST", "10"))
+    initial_concurrency: float = 4
+    min_concurrency: float = 1
+    max_concurrency: float = MAX_CONCURRENCY
+
+
+class AdaptiveLimiter:
+    """Token bucket plus AIMD concurrency window for one upstream server.
+
+    A call waits for a free slot in the window, then for a token. The
+    window grows by one slot per window of successful calls (additive
+    increase) and halves on 429s, timeouts and 5xx, at most once per
+    typical call latency (multiplicative decrease). Calls much slower than
+    the server's baseline latency shrink it gently. A Retry-After pauses
+    the bucket for that long. Shared by every request and agent in the
+    process.
+    """
+
+    def __init__(self, server: str, config: RateLimitConfig):
+        """Create a limiter for a server with its configured bounds."""
+        self.server = server
+        self.config = config
+        self.limit = min(config.max_concurrency, max(config.min_concurrency, config.initial_concurrency))
+        self.in_flight = 0
+        self.tokens = config.burst
+        self.refilled_at = time.monotonic()
+        self.paused_until = 0.0
+        self.baseline: Optional[float] = None
+        self.latency: Optional[float] = None
+        self.decreased_at = 0.0
+        self._waiters: Deque[asyncio.Future] = deque()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._publish()
+
+    def _publish(self):
+        metrics.set_gauge("ratelimit.limit", round(self.limit, 2), server=self.server)
+        metrics.set_gauge("ratelimit.in_flight", self.in_flight, server=self.server)
+
+    def _ensure_loop(self):
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # Waiters and slots of a previous event loop (e.g. an earlier asyncio.run) are gone
+            self._loop = loop
+            self._waiters.clear()
+            self.in_flight = 0
+
+    def _take_token(self) -> float:
+        """Take a token, or return how long to wait for one."""
+        now = time.monotonic()
+        if now < self.paused_until:
+            return self.paused_until - now
+        if self.config.rps <= 0:
+            return 0.0
+        self.tokens = min(self.config.burst, self.tokens + (now - self.refilled_at) * self.config.rps)
+        self.refilled_at = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.config.rps
+
+    def _wake(self):
+        # Hand free slots to waiters in arrival order
+        while self._waiters and self.in_flight < int(self.limit):
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                self.in_flight += 1
+                waiter.set_result(None)
+
+    async def acquire(self) -> float:
+        """Wait for a concurrency slot and a token.
+
+        Returns:
+            float: Seconds spent queueing
+        """
+        self._ensure_loop()
+        started = time.monotonic()
+        if self.in_flight < int(self.limit) and not self._waiters:
+            self.in_flight += 1
+        else:
+            waiter = self._loop.create_future()
+            self._waiters.append(waiter)
+            try:
+                await waiter
+            except asyncio.CancelledError:
+                if waiter.done() and not waiter.cancelled():
+                    # The slot was handed over just before the cancellation: pass it on
+                    self.in_flight -= 1
+                    self._wake()
+                raise
+        try:
+            while (wait := self._take_token()) > 0:
+                await asyncio.sleep(wait)
+        except asyncio.CancelledError:
+            self.in_flight -= 1
+            self._wake()
+            raise
+        waited = time.monotonic() - started
+        metrics.observe("ratelimit.wait_seconds", waited, server=self.server)
+        self._publish()
+        return waited
+
+    def release(self, latency: float, error_kind: Optional[str] = None, retry_after: Optional[float] = None):
+        """Return a slot and adapt the window to the call's outcome.
+
+        Args:
+            latency: Seconds the upstream call took, excluding queueing
+            error_kind: `classify_error` kind of a failed call, None on success
+            retry_after: Delay the server asked for, if any
+        """
+        self.in_flight = max(0, self.in_flight - 1)
+        now = time.monotonic()
+        metrics.observe("upstream.latency_seconds", latency, server=self.server)
+        if error_kind is None:
+            self.latency = latency if self.latency is None else 0.8 * self.latency + 0.2 * latency
+            # Baseline follows drops at once and rises slowly, so congestion stands out against it
+            self.baseline = latency if self.baseline is None else min(latency, self.baseline + 0.05 * (latency - self.baseline))
+            if latency > LATENCY_TOLERANCE * max(self.baseline, 0.05) and now - self.decreased_at > self.latency:
+                self.limit = max(self.config.min_concurrency, self.limit * 0.9)
+                self.decreased_at = now
+            else:
+                self.limit = min(self.config.max_concurrency, self.limit + 1 / self.limit)
+        elif error_kind in THROTTLE_KINDS:
+            if now - self.decreased_at > (self.latency or 1.0):
+                self.limit = max(self.config.min_concurrency, self.limit / 2)
+                self.decreased_at = now
+                metrics.incr("ratelimit.decreases", server=self.server, kind=error_kind)
+            if retry_after:
+                self.paused_until = max(self.paused_until, now + retry_after)
+        self._publish()
+        self._wake()
+
+
+def _load_configs() -> Dict[str, RateLimitConfig]:
+    configs = {name: dict(values) for name, values in DEFAULT_RATE_LIMITS.items()}
+    raw = os.getenv("RATE_LIMITS")
+    if raw:
+        try:
+            for name, values in json.loads(raw).items():
+                configs.setdefault(name, {}).update(values)
+        except (json.JSONDecodeError, AttributeError, TypeError) as e:
+            log_event("ratelimit", f"Ignoring invalid RATE_LIMITS: {e}", logging.WARNING)
+    return {name: RateLimitConfig(**values) for name, values in configs.items()}
+
+
+_configs = _load_configs()
+_limiters: Dict[str, AdaptiveLimiter] = {}
+
+
+def get_rate_limiter(server: str) -> AdaptiveLimiter:
+    """Return the process-wide limiter of an upstream server, configured from RATE_LIMITS."""
+    limiter = _limiters.get(server)
+    if limiter is None:
+        limiter = _limiters[server] = AdaptiveLimiter(server, _configs.get(server, RateLimitConfig()))
+    return limiter
@@ -0,0 +1,163 @@
+"""Handling of <think> reasoning traces in model output."""
+
+import os
+import re
+from typing import Any, Tuple
+
+from langchain_core.messages import AIMessage
+from langchain_core.runnables import RunnableConfig
+
+from src.metrics import metrics
+
+##########################
+# Reasoning Trace Handling
+##########################
+KEEP_REASONING = os.getenv("KEEP_REASONING", "false").lower() == "true"
+CHARS_PER_TOKEN = 4
+
+_THINK_BLOCK = re.compile(r"<think>(.*?)</think>", re.DOTALL | re.IGNORECASE)
+_THINK_OPEN = re.compile(r"<think>", re.IGNORECASE)
+_THINK_CLOSE = re.compile(r"</think>", re.IGNORECASE)
+
+
+def split_reasoning(text: Any) -> Tuple[str, str]:
+    """Separate DeepSeek-R1 style `<think>` reasoning from the answer.
+
+    Handles complete blocks, a missing opening tag (R1 distills often start
+    straight into the trace and only emit `</think>`) and an unterminated
+    block at the end of a truncated output.
+
+    Args:
+        text: Model output content
+
+    Returns:
+        Tuple[str, str]: (answer, reasoning)
+    """
+    if not isinstance(text, str):
+        text = "" if text is None else str(text)
+    reasoning = []
+
+    close = _THINK_CLOSE.search(text)
+    open_ = _THINK_OPEN.search(text)
+    if close and (open_ is None or close.start() < open_.start()):
+        reasoning.append(text[:close.start()])
+        text = text[close.end():]
+
+    reasoning.extend(_THINK_BLOCK.findall(text))
+    text = _THINK_BLOCK.sub("", text)
+
+    open_ = _THINK_OPEN.search(text)
+    if open_:
+        reasoning.append(text[open_.end():])
+        text = text[:open_.start()]
+
+    return text.strip(), "\n".join(r.strip() for r in reasoning if r.strip())
+
+
+def strip_reasoning(message: AIMessage, source: str) -> Tuple[AIMessage, str]:
+    """Remove reasoning from an AI message and record its size.
+
+    Reasoning returned by the provider in `additional_kwargs["reasoning_content"]`
+    is dropped as well.
+
+    Args:
+        message: AI message from a reasoning model
+        source: Metric label, e.g. the agent name
+
+    Returns:
+        Tuple[AIMessage, str]: (message with only the answer, reasoning text)
+    """
+    answer, reasoning = split_reasoning(message.content)
+    additional_kwargs = dict(message.additional_kwargs)
+    provider_reasoning = additional_kwargs.pop("reasoning_content", None)
+    if provider_reasoning:
+        reasoning = "\n".join(r for r in (str(provider_reasoning).strip(), reasoning) if r)
+    if reasoning:
+        metrics.incr("reasoning.stripped_tokens", len(reasoning) // CHARS_PER_TOKEN, source=source)
+        metrics.observe("reasoning.tokens", len(reasoning) // CHARS_PER_TOKEN, source=source)
+    return message.model_copy(update={"content": answer, "additional_kwargs": additional_kwargs}), reasoning
+
+
+def keep_reasoning(config: RunnableConfig) -> bool:
+    """Whether reasoning traces go to the `reasoning_traces` side channel (`configurable.keep_reasoning`)."""
+    value = (config or {}).get("configurable", {}).get("keep_reasoning")
+    return KEEP_REASONING if value is None else bool(value)
+
+
+def reasoning_trace(source: str, reasoning: str) -> list:
+    """Side-channel entry for one stripped trace, empty when there is none."""
+    return [{"source": source, "reasoning": reasoning}] if reasoning else []
+
+
+class ReasoningStreamFilter:
+    """Drop `<think>` reasoning from streamed text, chunk by chunk.
+
+    Partial tags split across chunks are held back until they can be told
+    apart from answer text. A closing tag without an opening one means the
+    text streamed so far was reasoning; `feed` then reports a reset so the
+    caller can tell clients to discard it (`split_reasoning` still cleans up
+    the final message).
+    """
+
+    OPEN, CLOSE = "<think>", "</think>"
+
+    def __init__(self):
+        """Start outside any reasoning block."""
+        self.buffer = ""
+        self.in_reasoning = False
+        self.emitted = False
+
+    def _held_back(self) -> int:
+        """Index from which the buffer may be the start of a tag."""
+        start = self.buffer.rfind("<", max(0, len(self.buffer) - len(self.CLOSE)))
+        if start != -1:
+            tail = self.buffer[start:].lower()
+            if self.OPEN.startswith(tail) or self.CLOSE.startswith(tail):
+                return start
+        return len(self.buffer)
+
+    def feed(self, text: str) -> Tuple[str, bool]:
+        """Add a chunk of streamed text.
+
+        Args:
+            text: Next chunk of model output
+
+        Returns:
+            Tuple[str, bool]: (answer text that can be emitted, whether earlier emitted text was reasoning)
+        """
+        self.buffer += text
+        output, reset = "", False
+        while True:
+            lowered = self.buffer.lower()
+            close = lowered.find(self.CLOSE)
+            if self.in_reasoning:
+                if close == -1:
+                    self.buffer = self.buffer[self._held_back():]
+                    break
+                self.buffer = self.buffer[close + len(self.CLOSE):]
+                self.in_reasoning = False
+                continue
+            open_ = lowered.find(self.OPEN)
+            if close != -1 and (open_ == -1 or close < open_):
+                reset = reset or self.emitted or bool(output)
+                output, self.emitted = "", False
+                self.buffer = self.buffer[close + len(self.CLOSE):]
+                continue
+            if open_ != -1:
+                output += self.buffer[:open_]
+                self.buffer = self.buffer[open_ + len(self.OPEN):]
+                self.in_reasoning = True
+                continue
+            cut = self._held_back()
+            output += self.buffer[:cut]
+            self.buffer = self.buffer[cut:]
+            break
+        if not self.emitted:
+            output = output.lstrip()
+        self.emitted = self.emitted or bool(output)
+        return output, reset
+
+    def flush(self) -> str:
+        """Answer text still held back once the stream has ended."""
+        text, self.buffer = ("" if self.in_reasoning else self.buffer), ""
+        return text
@@ -0,0 +1,317 @@
+"""Retries with backoff and circuit breakers for upstream calls."""
+
+import asyncio
+import json
+import logging
+import os
+import random
+import re
+import time
+from email.utils import parsedate_to_datetime
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from src.metrics import log_event, metrics
+from src.ratelimit import get_rate_limiter
+
+##########################
+# Retries and Circuit Breakers
+##########################
+RETRY_MAX_ATTEMPTS = int(os.getenv("RETRY_MAX_ATTEMPTS", "3"))
+RETRY_BASE_DELAY_SECONDS = float(os.getenv("RETRY_BASE_DELAY_SECONDS", "0.5"))
+RETRY_MAX_DELAY_SECONDS = float(os.getenv("RETRY_MAX_DELAY_SECONDS", "10"))
+# A Retry-After longer than this fails the call instead of stalling the request
+RETRY_MAX_WAIT_SECONDS = float(os.getenv("RETRY_MAX_WAIT_SECONDS", "30"))
+# Heurist occasionally answers with spurious 400s that succeed on a second try
+BAD_REQUEST_RETRIES = int(os.getenv("BAD_REQUEST_RETRIES", "1"))
+CALL_TIMEOUT_SECONDS = float(os.getenv("CALL_TIMEOUT_SECONDS", "60"))
+DEFAULT_CALL_TIMEOUTS = {"flipside_mcp": 180.0}
+BREAKER_FAILURE_THRESHOLD = int(os.getenv("BREAKER_FAILURE_THRESHOLD", "5"))
+BREAKER_COOLDOWN_SECONDS = float(os.getenv("BREAKER_COOLDOWN_SECONDS", "30"))
+BREAKER_MAX_COOLDOWN_SECONDS = float(os.getenv("BREAKER_MAX_COOLDOWN_SECONDS", "300"))
+
+# Error kinds that are retried, and those that count towards opening a server's breaker
+RETRYABLE_KINDS = {"timeout", "rate_limited", "server", "connection"}
+BREAKER_KINDS = {"timeout", "server", "connection"}
+
+_STATUS_IN_TEXT = re.compile(r"\b(?:status(?: code)?|http|error|code)\b\W{0,3}([45]\d\d)\b", re.IGNORECASE)
+_RETRY_AFTER_IN_TEXT = re.compile(r"retry[- ]after\W{0,3}(\d+(?:\.\d+)?)", re.IGNORECASE)
+_TEXT_MARKERS = [
+    ("rate_limited", ("too many requests", "rate limit", "ratelimit", "usage limit")),
+    ("timeout", ("timed out", "timeout", "deadline exceeded")),
+    ("server", ("internal server error", "bad gateway", "service unavailable", "gateway timeout", "overloaded")),
+    ("connection", ("connection reset", "connection refused", "connection closed", "closedresource",
+                    "brokenresource", "endofstream", "remote protocol error")),
+    ("bad_request", ("bad request", "invalid request", "client error")),
+]
+
+
+class CircuitOpenError(Exception):
+    """Raised without calling upstream while a server's circuit breaker is open."""
+
+    def __init__(self, server: str, retry_in: float):
+        """Build the error message shown to the agent."""
+        super().__init__(
+            f"{server} is unavailable after repeated failures; skipping the call "
+            f"(next attempt in {retry_in:.0f}s). Continue without this source."
+        )
+        self.server = server
+        self.retry_in = retry_in
+
+
+def _status_code(error: BaseException) -> Optional[int]:
+    response = getattr(error, "response", None)
+    for value in (getattr(response, "status_code", None), getattr(error, "status_code", None),
+                  getattr(error, "status", None)):
+        if isinstance(value, int):
+            return value
+    match = _STATUS_IN_TEXT.search(str(error))
+    return int(match.group(1)) if match else None
+
+
+def classify_error(error: BaseException) -> str:
+    """Classify an upstream error for retry and breaker decisions.
+
+    Returns:
+        str: "timeout", "rate_limited", "server", "connection", "bad_request",
+        "client" (other 4xx, not retried) or "unknown"
+    """
+    name = type(error).__name__
+    if isinstance(error, CircuitOpenError):
+        return "circuit_open"
+    if isinstance(error, (asyncio.TimeoutError, TimeoutError)) or name in ("TimeoutError", "TimeoutException",
+                                                                          "ReadTimeout", "ConnectTimeout"):
+        return "timeout"
+    if name == "UsageLimitExceededError" or name == "TavilyKeylessLimitError":
+        return "rate_limited"
+    if name in ("InvalidAPIKeyError", "ForbiddenError", "MissingAPIKeyError", "ValidationError"):
+        return "client"
+    if name == "BadRequestError":
+        return "bad_request"
+    status = _status_code(error)
+    if status is not None:
+        if status == 429:
+            return "rate_limited"
+        if status in (408, 425):
+            return "timeout"
+        if status >= 500:
+            return "server"
+        return "bad_request" if status == 400 else "client"
+    if isinstance(error, (ConnectionError, EOFError)) or name in ("ConnectError", "RemoteProtocolError",
+                                                                  "ReadError", "WriteError"):
+        return "connection"
+    text = f"{name} {error}".lower()
+    for kind, markers in _TEXT_MARKERS:
+        if any(marker in text for marker in markers):
+            return kind
+    return "unknown"
+
+
+def retry_after_seconds(error: BaseException) -> Optional[float]:
+    """Delay requested by the server (Retry-After header or message), if any."""
+    value = getattr(error, "retry_after_seconds", None)
+    if isinstance(value, (int, float)):
+        return float(value)
+    headers = getattr(getattr(error, "response", None), "headers", None)
+    header = headers.get("retry-after") if headers is not None else None
+    if header:
+        try:
+            return max(0.0, float(header))
+        except ValueError:
+            try:
+                return max(0.0, parsedate_to_datetime(header).timestamp() - time.time())
+            except (TypeError, ValueError):
+                pass
+    match = _RETRY_AFTER_IN_TEXT.search(str(error))
+    return float(match.group(1)) if match else None
+
+
+def backoff_delay(attempt: int, base: float = RETRY_BASE_DELAY_SECONDS, cap: float = RETRY_MAX_DELAY_SECONDS) -> float:
+    """Exponential backoff with full jitter for the given retry attempt (0-based)."""
+    return random.uniform(base / 2, min(cap, base * 2 ** attempt))
+
+
+class CircuitBreaker:
+    """Per-server circuit breaker.
+
+    After `failure_threshold` consecutive timeouts, 5xx or connection
+    errors the breaker opens and calls fail fast with `CircuitOpenError`.
+    Once the cooldown has passed a single probe call is let through
+    (half-open): success closes the breaker, failure reopens it with a
+    doubled cooldown.
+    """
+
+    CLOSED, HALF_OPEN, OPEN = "closed", "half_open", "open"
+    _GAUGE = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+    def __init__(self, server: str, failure_threshold: int = BREAKER_FAILURE_THRESHOLD,
+                 cooldown: float = BREAKER_COOLDOWN_SECONDS, max_cooldown: float = BREAKER_MAX_COOLDOWN_SECONDS):
+        """Create a closed breaker for a server."""
+        self.server = server
+        self.failure_threshold = failure_threshold
+        self.base_cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self.cooldown = cooldown
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probing = False
+        self._set_state(self.CLOSED)
+
+    def _set_state(self, state: str):
+        if state != self.state:
+            log_event("resilience", f"Circuit breaker for {self.server}: {self.state} -> {state}", logging.WARNING)
+        self.state = state
+        metrics.set_gauge("breaker.state", self._GAUGE[state], server=self.server)
+
+    def retry_in(self) -> float:
+        """Seconds until an open breaker lets a probe through."""
+        return max(0.0, self.opened_at + self.cooldown - time.monotonic())
+
+    def available(self) -> bool:
+        """Whether a call would currently be let through."""
+        return self.state == self.CLOSED or (self.retry_in() == 0 and not self._probing)
+
+    def before_call(self) -> bool:
+        """Admit or reject a call.
+
+        Returns:
+            bool: True when the call is the half-open probe
+
+        Raises:
+            CircuitOpenError: While the breaker is open, or a probe is already in flight
+        """
+        if self.state == self.CLOSED:
+            return False
+        if self.retry_in() > 0 or self._probing:
+            metrics.incr("breaker.rejected", server=self.server)
+            raise CircuitOpenError(self.server, self.retry_in())
+        self._set_state(self.HALF_OPEN)
+        self._probing = True
+        return True
+
+    def record_success(self, probe: bool = False):
+        """Record a successful call, closing the breaker."""
+        if probe:
+            self._probing = False
+        self.failures = 0
+        if self.state != self.CLOSED:
+            self.cooldown = self.base_cooldown
+            self._set_state(self.CLOSED)
+
+    def record_failure(self, kind: str, probe: bool = False):
+        """Record a failed call, opening the breaker once failures reach the threshold."""
+        if probe:
+            self._probing = False
+        if kind not in BREAKER_KINDS:
+            if probe:
+                # The server answered, so it is reachable again
+                self.record_success()
+            return
+        self.failures += 1
+        if probe or self.failures >= self.failure_threshold:
+            if probe:
+                self.cooldown = min(self.max_cooldown, self.cooldown * 2)
+            self.opened_at = time.monotonic()
+            metrics.incr("breaker.opened", server=self.server)
+            self._set_state(self.OPEN)
+
+    def release_probe(self):
+        """Give back an unfinished probe (e.g. the call was cancelled)."""
+        if self._probing:
+            self._probing = False
+            if self.state == self.HALF_OPEN:
+                self._set_state(self.OPEN)
+
+
+def _load_timeouts() -> Dict[str, float]:
+    timeouts = dict(DEFAULT_CALL_TIMEOUTS)
+    raw = os.getenv("CALL_TIMEOUTS")
+    if raw:
+        try:
+            timeouts.update({k: float(v) for k, v in json.loads(raw).items()})
+        except (json.JSONDecodeError, AttributeError, TypeError, ValueError) as e:
+            log_event("resilience", f"Ignoring invalid CALL_TIMEOUTS: {e}", logging.WARNING)
+    return timeouts
+
+
+_call_timeouts = _load_timeouts()
+_breakers: Dict[str, CircuitBreaker] = {}
+
+
+def get_circuit_breaker(server: str) -> CircuitBreaker:
+    """Return the process-wide circuit breaker of an upstream server."""
+    breaker = _breakers.get(server)
+    if breaker is None:
+        breaker = _breakers[server] = CircuitBreaker(server)
+    return breaker
+
+
+def call_timeout(server: str) -> float:
+    """Per-attempt timeout for a server: CALL_TIMEOUTS entry, else CALL_TIMEOUT_SECONDS."""
+    return _call_timeouts.get(server, CALL_TIMEOUT_SECONDS)
+
+
+async def resilient_call(server: str, fn: Callable[[], Awaitable[Any]], max_attempts: int = RETRY_MAX_ATTEMPTS) -> Any:
+    """Run an upstream call with timeouts, retries and the server's circuit breaker.
+
+    Every attempt first waits for the server's adaptive rate limiter, whose
+    queueing time is not counted against the timeout.
+
+    Timeouts, 429s, 5xx and connection errors are retried with exponential
+    backoff and jitter, waiting at least the server's Retry-After. Spurious
+    400s are retried BAD_REQUEST_RETRIES times; other client errors are not
+    retried.
+
+    Args:
+        server: Upstream name, e.g. "flipside_mcp" or "tavily"
+        fn: Zero-argument coroutine factory doing one attempt
+        max_attempts: Attempts including the first
+
+    Returns:
+        The call's result
+
+    Raises:
+        CircuitOpenError: When the server's breaker is open
+        Exception: The last error once retries are exhausted or the error is not retryable
+    """
+    breaker = get_circuit_breaker(server)
+    limiter = get_rate_limiter(server)
+    timeout = call_timeout(server)
+    bad_requests = 0
+    for attempt in range(max_attempts):
+        probe = breaker.before_call()
+        try:
+            await limiter.acquire()
+        except asyncio.CancelledError:
+            breaker.release_probe()
+            raise
+        started = time.monotonic()
+        try:
+            result = await asyncio.wait_for(fn(), timeout=timeout) if timeout > 0 else await fn()
+        except asyncio.CancelledError:
+            limiter.release(time.monotonic() - started, "cancelled")
+            breaker.release_probe()
+            raise
+        except Exception as e:
+            kind = classify_error(e)
+            limiter.release(time.monotonic() - started, kind, retry_after_seconds(e))
+            breaker.record_failure(kind, probe)
+            metrics.incr("upstream.errors", server=server, kind=kind)
+            if kind == "bad_request":
+                bad_requests += 1
+            retryable = kind in RETRYABLE_KINDS or (kind == "bad_request" and bad_requests <= BAD_REQUEST_RETRIES)
+            if not retryable or attempt + 1 >= max_attempts or breaker.state == breaker.OPEN:
+                raise
+            delay = backoff_delay(attempt)
+            requested = retry_after_seconds(e)
+            if requested is not None:
+                if requested > RETRY_MAX_WAIT_SECONDS:
+                    raise
+                delay = max(delay, requested)
+            log_event("resilience", f"{server} call failed ({kind}: {str(e) or type(e).__name__}); retry {attempt + 1}/{max_attempts - 1} in {delay:.1f}s", logging.INFO)
+            metrics.incr("upstream.retries", server=server, kind=kind)
+            await asyncio.sleep(delay)
+            continue
+        limiter.release(time.monotonic() - started)
+        breaker.record_success(probe)
+        return result
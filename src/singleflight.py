@@ -0,0 +1,86 @@
+"""Single-flight deduplication of identical in-flight tool calls."""
+
+import asyncio
+import json
+from typing import Any, Awaitable, Callable, Dict
+
+from src.metrics import metrics
+
+##########################
+# Single-flight Tool Calls
+##########################
+
+
+def canonical_call_key(server: str, tool_name: str, args: Any) -> str:
+    """Build a canonical key for a tool call.
+
+    Args:
+        server: Upstream server the tool belongs to
+        tool_name: Tool name
+        args: Tool arguments
+
+    Returns:
+        str: JSON key that is identical for equal arguments regardless of key order
+    """
+    return json.dumps([server, tool_name, args], sort_keys=True, separators=(",", ":"), default=str)
+
+
+def tool_server(tool) -> str:
+    """Return the upstream server name a tool was tagged with, or "local"."""
+    return (getattr(tool, "metadata", None) or {}).get("mcp_server", "local")
+
+
+def tool_call_key(tool, args: Any) -> str:
+    """Key identifying a tool call by server, tool name and canonical arguments."""
+    return canonical_call_key(tool_server(tool), tool.name, args)
+
+
+class SingleFlight:
+    """Coalesce identical concurrent calls into one upstream request.
+
+    The first caller for a key starts the work as a task; callers arriving
+    while it is in flight await the same task and receive the same result
+    or exception. A caller being cancelled does not cancel the shared work.
+    """
+
+    def __init__(self, name: str):
+        """Create a group with no calls in flight."""
+        self.name = name
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self.calls = 0
+        self.coalesced = 0
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]], **labels) -> Any:
+        """Run `fn` once per key among concurrent callers.
+
+        Args:
+            key: Canonical call key
+            fn: Zero-argument coroutine factory performing the upstream call
+            **labels: Metric labels, e.g. server and tool name
+
+        Returns:
+            The shared result of `fn`
+        """
+        self.calls += 1
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._inflight[key] = task
+            task.add_done_callback(lambda _t, key=key: self._inflight.pop(key, None))
+            metrics.incr("singleflight.leaders", flight=self.name, **labels)
+        else:
+            self.coalesced += 1
+            metrics.incr("singleflight.coalesced", flight=self.name, **labels)
+        return await asyncio.shield(task)
+
+    def joins(self, key: str) -> bool:
+        """Tell whether a call for `key` would join an in-flight call instead of starting one."""
+        return key in self._inflight
+
+    @property
+    def inflight(self) -> int:
+        """Number of calls currently in flight."""
+        return len(self._inflight)
+
+
+tool_call_flight = SingleFlight("tool_calls")
@@ -0,0 +1,863 @@
+"""Flipside SQL result cache and local engine for follow-up queries."""
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+from langchain_core.runnables import RunnableConfig
+
+from src.cache import CACHE_DIR
+from src.metrics import log_event, metrics
+from src.tool_cache import resolve_max_staleness, tool_result_cache
+
+##########################
+# Flipside SQL Result Cache
+##########################
+SQL_TOOL_NAME = "run_public_sql_query"
+SQL_CACHE_DIR = os.getenv("SQL_CACHE_DIR", os.path.join(CACHE_DIR, "sql"))
+SQL_CACHE_MAX_BYTES = int(os.getenv("SQL_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+# Upper bound on sqlite VM steps for a local follow-up query, checked every 10k steps
+SQL_LOCAL_MAX_STEPS = int(os.getenv("SQL_LOCAL_MAX_STEPS", "50000000"))
+SQL_ARG_NAMES = ("query", "sql", "sql_query", "statement")
+# Response fields and tool arguments telling whether a result holds every row of its query
+TRUNCATION_FIELDS = ("truncated", "is_truncated", "has_more", "hasMore", "next_page", "nextPage")
+TOTAL_ROW_FIELDS = ("total_rows", "totalRows", "row_count", "rowCount", "rows_count")
+PAGE_ARGS = ("page", "page_number", "pageNumber")
+LIMIT_ARGS = ("limit", "page_size", "pageSize", "max_rows", "maxRows")
+
+_TOKENS = re.compile(r"'(?:[^']|'')*'|\"(?:[^\"]|\"\")*\"|--[^\n]*|/\*.*?\*/|\s+|[^'\"\s]+", re.DOTALL)
+# Expressions whose value depends on the current day; resolved to the day bucket in cache keys
+_RELATIVE_DATE = re.compile(
+    r"\b(current_date|current_timestamp|current_time|localtimestamp|sysdate|getdate)\b( ?\( ?\))?|\bnow ?\( ?\)"
+)
+_HEX_LITERAL = re.compile(r"^'0x[0-9a-fA-F]+'$")
+
+
+def normalize_sql(sql: str, now: Optional[float] = None) -> str:
+    """Canonical form of a SQL query for cache keys.
+
+    Comments are removed, whitespace is collapsed and everything outside
+    string literals and quoted identifiers is lowercased (hex address
+    literals are lowercased too). Relative date expressions such as
+    `CURRENT_DATE` or `GETDATE()` are replaced by today's date, so the same
+    "last 7 days" query shares one entry for the whole day.
+
+    Args:
+        sql: SQL text
+        now: Unix time defining the day bucket, default the current time
+
+    Returns:
+        str: Normalized SQL
+    """
+    parts, code = [], []
+
+    def flush():
+        # Code between literals: lowercase, resolve relative dates, no spaces around punctuation
+        text = re.sub(r"\s+", " ", "".join(code).lower())
+        text = _RELATIVE_DATE.sub(f"'{_day_bucket(now)}'", text)
+        parts.append(re.sub(r" ?([(),=<>+*/-]) ?", r"\1", text))
+        code.clear()
+
+    for token in _TOKENS.findall(sql or ""):
+        if token.startswith("--") or token.startswith("/*"):
+            code.append(" ")
+        elif token[0] in "'\"":
+            flush()
+            parts.append(token.lower() if _HEX_LITERAL.match(token) else token)
+        else:
+            code.append(token)
+    flush()
+    return "".join(parts).strip().rstrip(";").strip()
+
+
+def _day_bucket(now: Optional[float]) -> str:
+    return datetime.fromtimestamp(time.time() if now is None else now, tz=timezone.utc).strftime("%Y-%m-%d")
+
+
+def sql_cache_key(sql: str, options: Optional[dict] = None, now: Optional[float] = None) -> str:
+    """Build the cache key of a query: its normalized SQL plus the other tool arguments.
+
+    Args:
+        sql: SQL text
+        options: Remaining tool arguments (page, limit, timeout, ...), see `sql_argument`
+        now: Unix time defining the day bucket, default the current time
+
+    Returns:
+        str: Hex digest
+    """
+    payload = json.dumps([normalize_sql(sql, now), options or {}], sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def sql_argument(args: Any) -> Tuple[Optional[str], dict]:
+    """Split a tool call's arguments into its SQL text and the remaining arguments.
+
+    Returns:
+        Tuple[Optional[str], dict]: The SQL (None if there is none) and the other arguments
+    """
+    if not isinstance(args, dict):
+        return None, {}
+    for name in SQL_ARG_NAMES:
+        if isinstance(args.get(name), str):
+            return args[name], {k: v for k, v in args.items() if k != name}
+    return None, {}
+
+
+##########################
+# Columnar results
+##########################
+@dataclass
+class ResultTable:
+    """A query result as named columns; `nulls` marks missing values per column."""
+    columns: List[str]
+    data: Dict[str, np.ndarray]
+    nulls: Dict[str, np.ndarray]
+
+    def __len__(self) -> int:
+        """Return the number of rows."""
+        return len(self.data[self.columns[0]]) if self.columns else 0
+
+    def rows(self) -> List[list]:
+        """Return the rows as lists, with nulls restored as None."""
+        values = []
+        for column in self.columns:
+            col = self.data[column].tolist()
+            nulls = self.nulls[column]
+            values.append([None if nulls[i] else v for i, v in enumerate(col)])
+        return [list(row) for row in zip(*values)]
+
+    def to_json(self) -> str:
+        """Serialize the table as a tool result."""
+        return json.dumps({"columns": self.columns, "rows": self.rows(), "row_count": len(self)}, ensure_ascii=False,
+                          default=str)
+
+    @classmethod
+    def from_rows(cls, columns: List[str], rows: List[list]) -> "ResultTable":
+        """Build a columnar table from result rows."""
+        data, nulls = {}, {}
+        for i, column in enumerate(columns):
+            values = [row[i] if i < len(row) else None for row in rows]
+            mask = np.array([v is None for v in values], dtype=bool)
+            present = [v for v in values if v is not None]
+            numbers = all(isinstance(v, (int, float)) and not isinstance(v, bool) for v in present)
+            integers = [v for v in present if isinstance(v, int)]
+            if present and numbers and len(integers) == len(present) and not mask.any() \
+                    and all(-2 ** 63 <= v < 2 ** 63 for v in integers):
+                array = np.array(values, dtype=np.int64)
+            elif numbers and all(abs(v) <= 2 ** 53 for v in integers):
+                array = np.array([np.nan if v is None else v for v in values], dtype=np.float64)
+            else:
+                # Text, and integers too large for an exact int64/float64 (raw token amounts)
+                array = np.array(["" if v is None else v if isinstance(v, str) else json.dumps(v) for v in values],
+                                 dtype=str)
+            data[column], nulls[column] = array, mask
+        return cls(columns=list(columns), data=data, nulls=nulls)
+
+
+def parse_result(result: Any) -> Optional[ResultTable]:
+    """Read a SQL tool result into columns.
+
+    Accepts `{"columns": [...], "rows": [[...]]}` (also `columnNames` /
+    `column_names`), lists of records, and objects wrapping records under
+    `records`, `rows`, `data` or `results`.
+
+    Returns:
+        Optional[ResultTable]: The table, or None for results in another shape
+    """
+    if isinstance(result, str):
+        try:
+            result = json.loads(result)
+        except (json.JSONDecodeError, ValueError):
+            return None
+    if isinstance(result, dict):
+        columns = next((result[k] for k in ("columns", "columnNames", "column_names") if isinstance(result.get(k), list)), None)
+        rows = next((result[k] for k in ("rows", "records", "data", "results") if isinstance(result.get(k), list)), None)
+        if columns is not None and rows is not None and all(isinstance(r, list) for r in rows):
+            return ResultTable.from_rows([str(c) for c in columns], rows)
+        result = rows
+    if isinstance(result, list) and result and all(isinstance(r, dict) for r in result):
+        columns = list(dict.fromkeys(k for r in result for k in r))
+        return ResultTable.from_rows(columns, [[r.get(c) for c in columns] for r in result])
+    return None
+
+
+def is_complete(result: Any, table: ResultTable, options: dict) -> bool:
+    """Tell whether a parsed result holds every row of its query.
+
+    A result is partial when the response flags truncation or more pages,
+    reports a total row count above the rows it holds, asks for a page
+    after the first, or fills a row limit given in the tool arguments.
+
+    Args:
+        result: Raw tool result
+        table: The parsed table
+        options: Tool arguments other than the SQL
+
+    Returns:
+        bool: False when the table may be missing rows
+    """
+    if isinstance(result, str):
+        try:
+            result = json.loads(result)
+        except (json.JSONDecodeError, ValueError):
+            return False
+    if isinstance(result, dict):
+        if any(result.get(k) for k in TRUNCATION_FIELDS):
+            return False
+        total = next((result[k] for k in TOTAL_ROW_FIELDS if isinstance(result.get(k), int)), None)
+        if total is not None and total > len(table):
+            return False
+    page = next((options[k] for k in PAGE_ARGS if isinstance(options.get(k), int)), None)
+    if page is not None and page > 1:
+        return False
+    limit = next((options[k] for k in LIMIT_ARGS if isinstance(options.get(k), int)), None)
+    return limit is None or len(table) < limit
+
+
+def render_like(table: ResultTable, template: Any) -> str:
+    """Render a table in the shape of an upstream SQL tool response.
+
+    Args:
+        table: The table to render
+        template: An upstream response whose shape to follow
+
+    Returns:
+        str: JSON text shaped like `template`, or `ResultTable.to_json()` for unknown shapes
+    """
+    try:
+        data = json.loads(template) if isinstance(template, str) else template
+    except (json.JSONDecodeError, ValueError):
+        data = None
+    records = [dict(zip(table.columns, row)) for row in table.rows()]
+    if isinstance(data, list):
+        return json.dumps(records, ensure_ascii=False, default=str)
+    if isinstance(data, dict):
+        data = dict(data)
+        columns_key = next((k for k in ("columns", "columnNames", "column_names") if isinstance(data.get(k), list)), None)
+        rows_key = next((k for k in ("rows", "records", "data", "results") if isinstance(data.get(k), list)), None)
+        if rows_key is not None:
+            if columns_key is not None:
+                data[columns_key], data[rows_key] = table.columns, table.rows()
+            else:
+                data[rows_key] = records
+            for key in TOTAL_ROW_FIELDS:
+                if key in data:
+                    data[key] = len(table)
+            for key in TRUNCATION_FIELDS:
+                if key in data:
+                    data[key] = False
+            return json.dumps(data, ensure_ascii=False, default=str)
+    return table.to_json()
+
+
+##########################
+# On-disk store
+##########################
+@dataclass
+class CachedResult:
+    """A stored SQL result: its table, the response as served, and whether it holds every row."""
+    table: ResultTable
+    response: str
+    complete: bool
+
+
+class SQLResultStore:
+    """Compressed columnar store of SQL results, one `.npz` file per query key.
+
+    Each column is a typed NumPy array with a null mask, next to the
+    response text as it was served. Files are touched on every hit and the
+    least recently used are evicted once the directory exceeds `max_bytes`.
+    """
+
+    def __init__(self, directory: str = SQL_CACHE_DIR, max_bytes: int = SQL_CACHE_MAX_BYTES):
+        """Create a store in directory, bounded to max_bytes on disk."""
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._size: Optional[int] = None
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.npz")
+
+    def get(self, key: str, max_age: float) -> Optional[CachedResult]:
+        """Load a result no older than `max_age` seconds.
+
+        Returns:
+            Optional[CachedResult]: The result, or None when absent or too old
+        """
+        path = self._path(key)
+        try:
+            with np.load(path, allow_pickle=False) as npz:
+                meta = json.loads(str(npz["__meta__"]))
+                if time.time() - meta["stored_at"] > max_age or "response" not in meta:
+                    return None
+                value = CachedResult(
+                    table=ResultTable(
+                        columns=meta["columns"],
+                        data={c: npz[f"c{i}"] for i, c in enumerate(meta["columns"])},
+                        nulls={c: npz[f"n{i}"] for i, c in enumerate(meta["columns"])},
+                    ),
+                    response=str(npz["__response__"]),
+                    complete=bool(meta["complete"]),
+                )
+            os.utime(path)
+            return value
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, KeyError) as e:
+            log_event("sql_cache", f"Error reading SQL cache entry {path}: {e}", logging.WARNING)
+            return None
+
+    def set(self, key: str, value: CachedResult):
+        """Store a result table and its metadata."""
+        meta: Dict[str, Any] = {"stored_at": time.time(), "columns": value.table.columns,
+                                "complete": value.complete, "response": True}
+        arrays: Dict[str, np.ndarray] = {}
+        for i, column in enumerate(value.table.columns):
+            arrays[f"c{i}"] = value.table.data[column]
+            arrays[f"n{i}"] = value.table.nulls[column]
+        arrays["__response__"] = np.array(value.response)
+        arrays["__meta__"] = np.array(json.dumps(meta))
+
+        path = self._path(key)
+        tmp = f"{path}.{os.getpid()}.tmp.npz"
+        try:
+            np.savez_compressed(tmp, **arrays)
+            os.replace(tmp, path)
+        except OSError as e:
+            log_event("sql_cache", f"Error writing SQL cache entry {path}: {e}", logging.WARNING)
+            return
+        self._evict(os.path.getsize(path))
+
+    def _evict(self, added: int):
+        with self._lock:
+            if self._size is not None:
+                self._size += added
+                if self._size <= self.max_bytes:
+                    return
+            files = []
+            for entry in os.scandir(self.directory):
+                if entry.name.endswith(".npz") and not entry.name.endswith(".tmp.npz"):
+                    stat = entry.stat()
+                    files.append((stat.st_mtime, stat.st_size, entry.path))
+            self._size = sum(size for _, size, _ in files)
+            # Evict down to 90% so a full cache does not rescan on every write
+            for _, size, path in sorted(files):
+                if self._size <= self.max_bytes * 0.9:
+                    break
+                try:
+                    os.remove(path)
+                    self._size -= size
+                    metrics.incr("sql_cache.evictions")
+                except OSError:
+                    pass
+
+
+##########################
+# Local follow-up queries
+##########################
+def _subqueries(sql: str) -> List[Tuple[int, int]]:
+    """(start, end) offsets of parenthesized SELECT/WITH subqueries, outermost first."""
+    spans, stack = [], []
+    for match in _TOKENS.finditer(sql):
+        token = match.group(0)
+        if token[0] in "'\"" or token.startswith("--") or token.startswith("/*"):
+            continue
+        for offset, char in enumerate(token):
+            if char == "(":
+                stack.append(match.start() + offset)
+            elif char == ")" and stack:
+                start = stack.pop()
+                body = sql[start + 1:match.start() + offset].lstrip().lower()
+                if body.startswith("select") or body.startswith("with"):
+                    spans.append((start, match.start() + offset + 1))
+    return sorted(spans, key=lambda span: (span[0], -span[1]))
+
+
+# Follow-ups run locally only when SQLite is known to answer them exactly like Snowflake: one SELECT
+# of columns and COUNT/SUM/MIN/MAX over a cached result, filtered by comparisons, BETWEEN, IN and
+# IS NULL against literals, with GROUP BY and HAVING. Arithmetic (SQLite divides integers), LIKE
+# (case-insensitive in SQLite), ORDER BY / LIMIT (opposite NULL ordering), joins and every other
+# function go to Flipside.
+LOCAL_AGGREGATES = ("count", "sum", "min", "max")
+_LOCAL_KEYWORDS = {"select", "distinct", "from", "where", "group", "by", "having", "and", "or", "not",
+                   "between", "in", "is", "null", "as"}
+_LOCAL_TOKENS = re.compile(
+    r"\s+|--[^\n]*|/\*.*?\*/"
+    r"|(?P<str>'(?:[^'\\]|'')*')"
+    r"|(?P<ident>\"(?:[^\"]|\"\")+\")"
+    r"|(?P<word>[A-Za-z_][A-Za-z0-9_$]*)"
+    r"|(?P<num>(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?)"
+    r"|(?P<op><=|>=|<>|!=|=|<|>)"
+    r"|(?P<punct>[(),.*-])"
+    r"|(?P<other>.)",
+    re.DOTALL,
+)
+_DATE_PREFIX = re.compile(r"^\d{4}-\d{2}-\d{2}")
+_NUMERIC_TEXT = re.compile(r"^\s*[+-]?(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?\s*$")
+# Shape of text columns SQLite cannot compare like Snowflake (numbers sent as text, mixed date formats)
+_NOT_COMPARABLE = "\0"
+# (type, shape): type is int/float/text for columns and num/str for literals; see `_column_kind`
+Kind = Tuple[str, Optional[str]]
+
+
+class UnsupportedLocalQuery(ValueError):
+    """A follow-up query outside the subset answered locally."""
+
+
+def _shape(text: str) -> str:
+    return re.sub(r"\d", "0", text)
+
+
+def _column_kind(table: ResultTable, column: str) -> Kind:
+    """Comparison type of a cached column.
+
+    Text columns whose values all start with a date carry their common
+    digit shape (e.g. `0000-00-00T00:00:00.000Z`): Snowflake compares them
+    as timestamps, which matches SQLite's text comparison only for literals
+    of that same shape.
+    """
+    values = table.data[column][~table.nulls[column]]
+    if values.dtype.kind in "iu":
+        return "int", None
+    if values.dtype.kind == "f":
+        return ("int" if bool(np.all(np.mod(values, 1) == 0)) else "float"), None
+    texts = [str(v) for v in values]
+    if texts and all(_NUMERIC_TEXT.match(t) for t in texts):
+        return "text", _NOT_COMPARABLE
+    if texts and all(_DATE_PREFIX.match(t) for t in texts):
+        shapes = {_shape(t) for t in texts}
+        return "text", shapes.pop() if len(shapes) == 1 else _NOT_COMPARABLE
+    return "text", None
+
+
+def _comparable(a: Kind, b: Kind) -> bool:
+    if a[0] in ("num", "str") and b[0] in ("num", "str"):
+        return False
+    if a[0] in ("int", "float", "num") and b[0] in ("int", "float", "num"):
+        return True
+    if a[0] == "str":
+        a, b = b, a
+    if a[0] != "text" or b[0] not in ("text", "str"):
+        return False
+    if b[0] == "str":
+        return a[1] is None or a[1] == _shape(b[1])
+    return a[1] == b[1] and a[1] != _NOT_COMPARABLE
+
+
+class _LocalQuery:
+    """Recursive-descent check of a follow-up query against the subset answered locally."""
+
+    def __init__(self, sql: str, tables: Dict[str, Dict[str, Kind]]):
+        self.tables = tables
+        self.tokens: List[Tuple[str, str]] = []
+        self.pos = 0
+        for match in _LOCAL_TOKENS.finditer(sql):
+            group, text = match.lastgroup, match.group(0)
+            if group is None:
+                continue
+            if group == "other":
+                raise UnsupportedLocalQuery(f"unsupported character {text!r}")
+            if group == "str":
+                text = text[1:-1].replace("''", "'")
+            elif group == "ident":
+                text = text[1:-1].replace('""', '"').lower()
+            elif group == "word":
+                text = text.lower()
+            self.tokens.append((group, text))
+
+    def check(self) -> List[Kind]:
+        """Check the whole query; return the kind of each output column."""
+        outputs = self.query()
+        if self.pos != len(self.tokens):
+            raise UnsupportedLocalQuery(f"unsupported clause at {self.peek()[1]!r}")
+        return [kind for _, kind in outputs]
+
+    def peek(self, offset: int = 0) -> Tuple[str, str]:
+        index = self.pos + offset
+        return self.tokens[index] if index < len(self.tokens) else ("end", "")
+
+    def accept(self, *values: str) -> Optional[str]:
+        group, text = self.peek()
+        if group in ("word", "op", "punct") and text in values:
+            self.pos += 1
+            return text
+        return None
+
+    def expect(self, *values: str) -> str:
+        text = self.accept(*values)
+        if text is None:
+            raise UnsupportedLocalQuery(f"expected {' or '.join(values)} at {self.peek()[1]!r}")
+        return text
+
+    def identifier(self) -> str:
+        group, text = self.peek()
+        if group == "ident" or (group == "word" and text not in _LOCAL_KEYWORDS and self.peek(1) != ("punct", "(")):
+            self.pos += 1
+            return text
+        raise UnsupportedLocalQuery(f"unsupported expression at {text!r}")
+
+    def alias(self) -> Optional[str]:
+        if self.accept("as"):
+            return self.identifier()
+        group, text = self.peek()
+        if group == "ident" or (group == "word" and text not in _LOCAL_KEYWORDS):
+            return self.identifier()
+        return None
+
+    def query(self) -> List[Tuple[Optional[str], Kind]]:
+        self.expect("select")
+        self.accept("distinct")
+        items = [self.select_item()]
+        while self.accept(","):
+            items.append(self.select_item())
+        self.expect("from")
+        columns, names = self.source()
+
+        def column(node) -> Tuple[str, Kind]:
+            qualifier, name = node[1], node[2]
+            if (qualifier is not None and qualifier not in names) or name not in columns:
+                raise UnsupportedLocalQuery(f"unknown column {name!r}")
+            return name, columns[name]
+
+        def where_operand(node) -> Kind:
+            if node[0] == "agg":
+                raise UnsupportedLocalQuery("aggregate in WHERE")
+            return column(node)[1]
+
+        if self.accept("where"):
+            self.condition(where_operand)
+        grouped = None
+        if self.accept("group"):
+            self.expect("by")
+            grouped = {column(self.column_node())[0]}
+            while self.accept(","):
+                grouped.add(column(self.column_node())[0])
+        aggregated = grouped is not None or any(node[0] == "agg" for node, _ in items)
+
+        outputs: List[Tuple[Optional[str], Kind]] = []
+        for node, alias in items:
+            if node[0] == "star":
+                if aggregated:
+                    raise UnsupportedLocalQuery("SELECT * with aggregates")
+                outputs.extend(columns.items())
+                continue
+            if node[0] == "col":
+                name, kind = column(node)
+                if aggregated and name not in (grouped or ()):
+                    raise UnsupportedLocalQuery(f"column {name!r} is neither grouped nor aggregated")
+            else:
+                name, kind = None, self.aggregate(node, column)
+            if alias is not None and alias in columns and alias != name:
+                raise UnsupportedLocalQuery(f"alias {alias!r} shadows a column")
+            outputs.append((alias or name, kind))
+
+        aliases = {name: kind for name, kind in outputs if name is not None}
+
+        def having_operand(node) -> Kind:
+            if node[0] == "agg":
+                return self.aggregate(node, column)
+            if node[1] is None and node[2] in aliases and node[2] not in columns:
+                return aliases[node[2]]
+            name, kind = column(node)
+            if name not in (grouped or ()):
+                raise UnsupportedLocalQuery(f"column {name!r} is not grouped")
+            return kind
+
+        if self.accept("having"):
+            self.condition(having_operand)
+        return outputs
+
+    def source(self) -> Tuple[Dict[str, Kind], set]:
+        """Columns and accepted qualifiers of the FROM clause: a cached table or a nested query."""
+        if self.accept("("):
+            outputs = self.query()
+            self.expect(")")
+            columns, names = {name: kind for name, kind in outputs if name is not None}, set()
+        else:
+            name = self.identifier()
+            if name not in self.tables:
+                raise UnsupportedLocalQuery(f"unknown table {name!r}")
+            columns, names = self.tables[name], {name}
+        alias = self.alias()
+        if alias is not None:
+            names.add(alias)
+        return columns, names
+
+    def select_item(self):
+        if self.accept("*"):
+            return ("star",), None
+        node = self.expression_node()
+        return node, self.alias()
+
+    def expression_node(self):
+        group, text = self.peek()
+        if group == "word" and text in LOCAL_AGGREGATES and self.peek(1) == ("punct", "("):
+            self.pos += 2
+            distinct = bool(self.accept("distinct"))
+            argument = None if text == "count" and not distinct and self.accept("*") else self.column_node()
+            self.expect(")")
+            return "agg", text, argument
+        return self.column_node()
+
+    def column_node(self):
+        name = self.identifier()
+        if self.accept("."):
+            return "col", name, self.identifier()
+        return "col", None, name
+
+    def aggregate(self, node, column) -> Kind:
+        function, argument = node[1], node[2]
+        if function == "count":
+            if argument is not None:
+                column(argument)
+            return "int", None
+        kind = column(argument)[1]
+        if function == "sum" and kind[0] not in ("int", "float"):
+            raise UnsupportedLocalQuery("SUM of a non-numeric column")
+        if kind[0] == "text" and kind[1] == _NOT_COMPARABLE:
+            raise UnsupportedLocalQuery(f"{function.upper()} of a column SQLite orders differently")
+        return kind
+
+    def condition(self, operand):
+        self.conjunction(operand)
+        while self.accept("or"):
+            self.conjunction(operand)
+
+    def conjunction(self, operand):
+        self.factor(operand)
+        while self.accept("and"):
+            self.factor(operand)
+
+    def factor(self, operand):
+        if self.accept("not"):
+            self.factor(operand)
+        elif self.accept("("):
+            self.condition(operand)
+            self.expect(")")
+        else:
+            self.predicate(operand)
+
+    def predicate(self, operand):
+        left = self.value(operand)
+        negated = bool(self.accept("not"))
+        if self.accept("between"):
+            low = self.value(operand)
+            self.expect("and")
+            self.compare(left, low, self.value(operand))
+        elif self.accept("in"):
+            self.expect("(")
+            values = [self.value(operand)]
+            while self.accept(","):
+                values.append(self.value(operand))
+            self.expect(")")
+            self.compare(left, *values)
+        elif not negated and self.accept("is"):
+            self.accept("not")
+            self.expect("null")
+        elif not negated and self.accept("=", "<>", "!=", "<", ">", "<=", ">="):
+            self.compare(left, self.value(operand))
+        else:
+            raise UnsupportedLocalQuery(f"unsupported predicate at {self.peek()[1]!r}")
+
+    def value(self, operand) -> Kind:
+        negative = self.accept("-")
+        group, text = self.peek()
+        if group == "num":
+            self.pos += 1
+            return "num", None
+        if negative:
+            raise UnsupportedLocalQuery("unsupported arithmetic")
+        if group == "str":
+            self.pos += 1
+            return "str", text
+        return operand(self.expression_node())
+
+    @staticmethod
+    def compare(left: Kind, *rights: Kind):
+        for right in rights:
+            if not _comparable(left, right):
+                raise UnsupportedLocalQuery(f"SQLite does not compare {left[0]} with {right[0]} like Snowflake")
+
+
+def check_local_sql(sql: str, tables: Dict[str, ResultTable]) -> List[Kind]:
+    """Check that SQLite answers a follow-up query exactly like Snowflake.
+
+    Args:
+        sql: The follow-up, with cached subqueries replaced by the names of `tables`
+        tables: Cached results by name
+
+    Returns:
+        List[Kind]: Kind of each output column
+
+    Raises:
+        UnsupportedLocalQuery: When the query is outside the locally answered subset
+    """
+    schemas = {}
+    for name, table in tables.items():
+        lowered = [c.lower() for c in table.columns]
+        if len(set(lowered)) != len(lowered):
+            raise UnsupportedLocalQuery(f"columns of {name} differ only by case")
+        schemas[name] = {c.lower(): _column_kind(table, c) for c in table.columns}
+    return _LocalQuery(sql, schemas).check()
+
+
+def _column_type(table: ResultTable, column: str) -> str:
+    values = table.data[column]
+    if values.dtype.kind in "iu":
+        # REAL keeps SQLite from integer arithmetic; only integers beyond 2**53 stay exact as INTEGER
+        return "INTEGER" if len(values) and int(np.abs(values).max()) > 2 ** 53 else "REAL"
+    return "REAL" if values.dtype.kind == "f" else "TEXT"
+
+
+def _run_local(sql: str, tables: Dict[str, ResultTable], kinds: List[Kind]) -> ResultTable:
+    connection = sqlite3.connect(":memory:")
+    connection.execute("PRAGMA case_sensitive_like=ON")
+    steps = [0]
+
+    def guard():
+        steps[0] += 10000
+        return steps[0] > SQL_LOCAL_MAX_STEPS
+
+    connection.set_progress_handler(guard, 10000)
+    try:
+        for name, table in tables.items():
+            columns = ", ".join('"' + c.replace('"', '""') + '" ' + _column_type(table, c) for c in table.columns)
+            connection.execute(f"CREATE TABLE {name} ({columns})")
+            connection.executemany(
+                f"INSERT INTO {name} VALUES ({', '.join('?' * len(table.columns))})", table.rows()
+            )
+        cursor = connection.execute(sql)
+        columns = [d[0] for d in cursor.description or []]
+        rows = [list(r) for r in cursor.fetchall()]
+    finally:
+        connection.close()
+    # Integer columns were stored as REAL; give back integers where Snowflake would
+    for i, (kind, _) in enumerate(kinds):
+        if kind == "int":
+            for row in rows:
+                if isinstance(row[i], float) and row[i].is_integer():
+                    row[i] = int(row[i])
+    return ResultTable.from_rows(columns, rows)
+
+
+class SQLResultCache:
+    """Result cache for Flipside `run_public_sql_query` calls.
+
+    Results are keyed by normalized SQL (see `normalize_sql`) together with
+    the other tool arguments, and expire with the tool cache TTL of the
+    "sql" category. Only responses that parse into a table are cached, and
+    hits return the response exactly as Flipside sent it. A query that
+    wraps a cached query as a subquery, e.g. `SELECT chain, SUM(users) FROM
+    (<cached query>) GROUP BY chain`, is answered locally with SQLite over
+    the cached result, but only if that result held every row and the
+    query stays within the subset SQLite answers like Snowflake (see
+    `check_local_sql`); otherwise, or if SQLite cannot run it, it goes to
+    Flipside.
+    """
+
+    def __init__(self, store: SQLResultStore):
+        """Create a cache over a result store."""
+        self.store = store
+
+    def _answer_locally(self, sql: str, options: dict, max_age: float) -> Optional[CachedResult]:
+        tables: Dict[str, ResultTable] = {}
+        template = None
+        pieces, cursor = [], 0
+        for start, end in _subqueries(sql):
+            if start < cursor:
+                continue
+            cached = self.store.get(sql_cache_key(sql[start + 1:end - 1], options), max_age)
+            if cached is None:
+                continue
+            if not cached.complete:
+                # Filters and aggregates over a truncated result would be silently wrong
+                metrics.incr("sql_cache.partial_skips")
+                continue
+            name = f"cached_{len(tables)}"
+            tables[name] = cached.table
+            template = template or cached.response
+            pieces.extend([sql[cursor:start], f"(SELECT * FROM {name})"])
+            cursor = end
+        if not tables:
+            return None
+        pieces.append(sql[cursor:])
+        local_sql = "".join(pieces).strip().rstrip(";")
+        try:
+            kinds = check_local_sql(local_sql, tables)
+        except UnsupportedLocalQuery as e:
+            metrics.incr("sql_cache.unsupported_skips")
+            log_event("sql_cache", f"Local SQL follow-up not supported, querying Flipside: {e}", logging.INFO)
+            return None
+        try:
+            table = _run_local(local_sql, tables, kinds)
+        except sqlite3.Error as e:
+            metrics.incr("sql_cache.local_fallbacks")
+            log_event("sql_cache", f"Local SQL follow-up failed, querying Flipside: {e}", logging.WARNING)
+            return None
+        return CachedResult(table=table, response=render_like(table, template), complete=True)
+
+    async def call(self, tool, args: Any, fetch: Callable[[], Awaitable[Any]], config: RunnableConfig = None) -> Any:
+        """Serve a SQL tool call from the cache, locally, or from Flipside.
+
+        Args:
+            tool: The SQL tool
+            args: Its arguments
+            fetch: Zero-argument coroutine factory running the query upstream
+            config: RunnableConfig with optional `tool_cache_ttls` / `max_staleness` overrides
+
+        Returns:
+            The result, in the shape of Flipside's response
+        """
+        sql, options = sql_argument(args)
+        configurable = (config or {}).get("configurable", {})
+        category, ttl = tool_result_cache.policy.resolve(tool.name, configurable.get("tool_cache_ttls"))
+        if sql is None or ttl <= 0:
+            return await fetch()
+        max_age = resolve_max_staleness(configurable.get("max_staleness"), tool.name, category)
+        max_age = ttl if max_age is None else min(ttl, max_age)
+
+        key = sql_cache_key(sql, options)
+        cached = await asyncio.to_thread(self.store.get, key, max_age)
+        if cached is not None:
+            metrics.incr("sql_cache.hits")
+            return cached.response
+
+        started = time.monotonic()
+        local = await asyncio.to_thread(self._answer_locally, sql, options, max_age)
+        if local is not None:
+            metrics.incr("sql_cache.local_answers")
+            metrics.observe("sql_cache.local_seconds", time.monotonic() - started)
+            await asyncio.to_thread(self.store.set, key, local)
+            return local.response
+
+        metrics.incr("sql_cache.misses")
+        result = await fetch()
+        # Error text, timeouts and rate-limit notices do not parse into a table and are never cached
+        table = parse_result(result) if isinstance(result, str) else None
+        if table is not None:
+            entry = CachedResult(table=table, response=result, complete=is_complete(result, table, options))
+            await asyncio.to_thread(self.store.set, key, entry)
+        return result
+
+
+_sql_result_cache: Optional[SQLResultCache] = None
+
+
+def get_sql_result_cache() -> SQLResultCache:
+    """Return the process-wide SQL result cache stored in SQL_CACHE_DIR."""
+    global _sql_result_cache
+    if _sql_result_cache is None:
+        _sql_result_cache = SQLResultCache(SQLResultStore())
+    return _sql_result_cache
@@ -1,26 +1,41 @@
-from typing import Annotated, Optional
-from langgraph.graph import MessagesState
+"""Graph state schemas and structured outputs of the orchestrator."""
+
+import operator
+from typing import Annotated, List, Optional
+
 from langchain_core.messages import MessageLikeRepresentation
-from pydantic import BaseModel, Field
-from typing import List
-from langchain_core.messages import BaseMessage
+from langgraph.graph import MessagesState
+from pydantic import BaseModel, Field, field_validator
 from typing_extensions import TypedDict
-import operator
+
 
 #state
 class DelegateAgent(BaseModel):
+    """Sub-tasks for each research source."""
     # queries: Optional[WorkerQueries] = None
-    heurist_queries: str = Field(
-        description="The input for MCP call, must be described in high detail."
+    # Each source gets a list of independent sub-tasks, every one run by its own worker in parallel
+    heurist_queries: List[str] = Field(
+        description="Independent inputs for MCP calls, one per asset or aspect, each described in high detail. Empty if not needed."
     )
-    flipside_queries: str = Field(
-        description="The input for db call, must be described in high detail following SQL rule query."
+    flipside_queries: List[str] = Field(
+        description="Independent inputs for db calls, one per asset, protocol or chain, each described in high detail following SQL rule query. Empty if not needed."
     )
-    tavily_queries: str = Field(
-        description="The input for web search, must be described in high detail for comprehensive web research."
+    tavily_queries: List[str] = Field(
+        description="Independent inputs for web search, one per topic, each described in high detail for comprehensive web research. Empty if not needed."
     )
 
+    @field_validator("heurist_queries", "flipside_queries", "tavily_queries", mode="before")
+    @classmethod
+    def _as_task_list(cls, value):
+        # Models still answer with a single string at times
+        if value is None:
+            return []
+        if isinstance(value, str):
+            return [value] if value.strip() else []
+        return [task for task in value if isinstance(task, str) and task.strip()]
+
 class ClarifyWithUser(BaseModel):
+    """Whether to ask the user a clarifying question."""
     need_clarification: bool = Field(
         description="Whether the user needs to be asked a clarifying question.",
     )
@@ -33,34 +48,47 @@ class ClarifyWithUser(BaseModel):
 
 #agent state
 def override_reducer(current_value, new_value):
+    """Append updates, or replace the value with {'type': 'override', 'value': ...}."""
     if isinstance(new_value, dict) and new_value.get("type") == "override":
         return new_value.get("value", new_value)
     else:
         return operator.add(current_value, new_value)
 
 class InputState(MessagesState):
-    """InputState is only 'messages'"""
+    """InputState is only 'messages'."""
 
 class SupervisorState(MessagesState):
+    """State of the orchestrator graph."""
     # supervisor_messages: Annotated[list[MessageLikeRepresentation], operator.add]
     supervisor_messages: Annotated[list[MessageLikeRepresentation], override_reducer]
-    heurist_queries: Optional[str]       
+    heurist_queries: Optional[List[str]]
     heurist_results: Optional[str]
-    flipside_queries: Optional[str]       
+    flipside_queries: Optional[List[str]]
     flipside_results: Optional[str]
-    tavily_queries: Optional[str]
+    tavily_queries: Optional[List[str]]
     tavily_results: Optional[str]
+    # Per-source digests built as each worker finishes, and sources that missed the deadline
+    source_digests: Annotated[list, override_reducer]
+    missing_sources: Annotated[list, override_reducer]
     # Meta
     final_answer: Annotated[Optional[str], override_reducer]
+    # Stripped model reasoning, only kept when `keep_reasoning` is enabled
+    reasoning_traces: Annotated[list, override_reducer]
 
 class HeuristAgentState(TypedDict):
+    """State of the Heurist agent subgraph."""
     heurist_queries: Optional[str]
     heurist_results: Optional[str]
+    reasoning_traces: Optional[list]
 
 class FlipsideAgentState(TypedDict):
+    """State of the Flipside agent subgraph."""
     flipside_queries: Optional[str]
     flipside_results: Optional[str]
+    reasoning_traces: Optional[list]
 
 class TavilyAgentState(TypedDict):
+    """State of the Tavily agent subgraph."""
     tavily_queries: Optional[str]
-    tavily_results: Optional[str]
\ No newline at end of file
+    tavily_results: Optional[str]
+    reasoning_traces: Optional[list]
\ No newline at end of file
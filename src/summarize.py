@@ -0,0 +1,267 @@
+"""Per-source digests of research results for the final summary."""
+
+import asyncio
+import hashlib
+import logging
+import os
+import time
+from typing import Dict, List, Optional
+
+from langchain_core.messages import HumanMessage
+from langchain_core.runnables import RunnableConfig
+
+from src.cache import MISS, ResponseCache, open_cache_store
+from src.compaction import CHARS_PER_TOKEN, content_text
+from src.metrics import log_event, metrics
+from src.prompt import source_digest_prompt
+from src.reasoning import strip_reasoning
+from src.singleflight import SingleFlight
+from src.utils import get_model
+
+##########################
+# Per-source Digests
+##########################
+SOURCE_DIGEST_MAX_WORDS = int(os.getenv("SOURCE_DIGEST_MAX_WORDS", "350"))
+# Results shorter than this reach the summary verbatim, without a digest call
+SOURCE_DIGEST_MIN_CHARS = int(os.getenv("SOURCE_DIGEST_MIN_CHARS", "2000"))
+RESEARCH_DEADLINE_SECONDS = os.getenv("RESEARCH_DEADLINE_SECONDS")
+# Map-reduce: results longer than one chunk are digested chunk by chunk, then reduced
+SUMMARY_CHUNK_TOKENS = int(os.getenv("SUMMARY_CHUNK_TOKENS", "3000"))
+SUMMARY_MAP_CONCURRENCY = int(os.getenv("SUMMARY_MAP_CONCURRENCY", "4"))
+SUMMARY_CACHE_TTL_SECONDS = float(os.getenv("SUMMARY_CACHE_TTL_SECONDS", str(24 * 3600)))
+
+# Digests depend only on their input, so they are cached by content hash
+digest_cache = ResponseCache(
+    max_entries=int(os.getenv("SUMMARY_CACHE_MAX_ENTRIES", "512")),
+    store=open_cache_store("SUMMARY_CACHE_DB", table="digests"),
+)
+digest_flight = SingleFlight("digests")
+_map_semaphores: Dict[int, asyncio.Semaphore] = {}
+
+SOURCE_LABELS = {
+    "heurist": "Heurist (market data, news and social)",
+    "flipside": "Flipside (on-chain analytics)",
+    "tavily": "Tavily (web research)",
+}
+
+
+def research_deadline(config: RunnableConfig) -> Optional[float]:
+    """Seconds after which the report is written with the sources available.
+
+    `configurable.research_deadline_s` overrides RESEARCH_DEADLINE_SECONDS;
+    None (the default) waits for every source.
+    """
+    value = (config or {}).get("configurable", {}).get("research_deadline_s")
+    if value is None:
+        value = RESEARCH_DEADLINE_SECONDS
+    return float(value) if value not in (None, "") else None
+
+
+def source_digest(source: str, task: str, digest: str, started: float, condensed: bool) -> dict:
+    """State entry for one source's digest."""
+    return {
+        "source": source,
+        "task": task,
+        "digest": digest,
+        "condensed": condensed,
+        "ready_after_s": round(time.monotonic() - started, 2),
+    }
+
+
+def fallback_digest(source: str, task: str, result, started: float) -> dict:
+    """Digest made from the head of a raw result, when there is no time or model for a real one."""
+    text = content_text(result or "").strip()
+    limit = SOURCE_DIGEST_MAX_WORDS * 8
+    if len(text) > limit:
+        text = text[:limit] + "..."
+    return source_digest(source, task, text, started, condensed=False)
+
+
+def chunk_text(text: str, max_tokens: int = SUMMARY_CHUNK_TOKENS) -> List[str]:
+    """Split text into chunks of about `max_tokens` tokens.
+
+    Chunks break at paragraph boundaries, then at line boundaries; only a
+    single oversized line is cut mid-line.
+
+    Args:
+        text: Text to split
+        max_tokens: Approximate token size of a chunk
+
+    Returns:
+        List[str]: The chunks, in order
+    """
+    max_chars = max(1, max_tokens * CHARS_PER_TOKEN)
+    pieces = []
+    for paragraph in text.split("\n\n"):
+        if len(paragraph) <= max_chars:
+            pieces.append(paragraph)
+            continue
+        for line in paragraph.split("\n"):
+            pieces.extend(line[i:i + max_chars] for i in range(0, max(1, len(line)), max_chars))
+
+    chunks, current, size = [], [], 0
+    for piece in pieces:
+        if current and size + len(piece) + 2 > max_chars:
+            chunks.append("\n\n".join(current))
+            current, size = [], 0
+        current.append(piece)
+        size += len(piece) + 2
+    if current:
+        chunks.append("\n\n".join(current))
+    return chunks
+
+
+def _map_semaphore() -> asyncio.Semaphore:
+    # One semaphore per event loop bounds chunk digests across concurrent runs
+    loop_id = id(asyncio.get_running_loop())
+    if loop_id not in _map_semaphores:
+        _map_semaphores[loop_id] = asyncio.Semaphore(SUMMARY_MAP_CONCURRENCY)
+    return _map_semaphores[loop_id]
+
+
+async def _digest_text(source: str, task: str, text: str, config: RunnableConfig) -> str:
+    """Digest one piece of text, through the content-hash cache."""
+    key = hashlib.sha256("\x1f".join(
+        [source, task, str(SOURCE_DIGEST_MAX_WORDS), text]
+    ).encode("utf-8")).hexdigest()
+    cached = await digest_cache.get(key)
+    if cached is not MISS:
+        metrics.incr("summary.digest_cache_hits", source=source)
+        return cached
+
+    async def compute():
+        prompt = source_digest_prompt.format(
+            source=SOURCE_LABELS.get(source, source),
+            task=task,
+            findings=text,
+            max_words=SOURCE_DIGEST_MAX_WORDS,
+        )
+        async with _map_semaphore():
+            response = await get_model("digest", config).ainvoke([HumanMessage(content=prompt)], config)
+        response, _ = strip_reasoning(response, "digest")
+        digest = content_text(response.content).strip()
+        if not digest:
+            raise ValueError("empty digest")
+        await digest_cache.set(key, digest, SUMMARY_CACHE_TTL_SECONDS)
+        return digest
+
+    metrics.incr("summary.digest_cache_misses", source=source)
+    return await digest_flight.do(key, compute, source=source)
+
+
+async def digest_source(source: str, task: str, result, config: RunnableConfig, started: float) -> dict:
+    """Condense one worker result into a digest for the final summary.
+
+    Called as soon as the worker finishes, so the digest overlaps with the
+    sources still running and the summary only merges short digests. Long
+    results are map-reduced: chunks of SUMMARY_CHUNK_TOKENS are digested
+    concurrently (at most SUMMARY_MAP_CONCURRENCY at a time) and the chunk
+    digests are digested again until they fit in one chunk. Every digest is
+    cached by content hash.
+
+    Args:
+        source: Worker name, e.g. "heurist"
+        task: Task the supervisor gave the worker
+        result: The worker's final answer
+        config: RunnableConfig of the current run
+        started: `time.monotonic()` when the research started
+
+    Returns:
+        dict: Digest entry with source, task, digest text and timing
+    """
+    text = content_text(result or "").strip()
+    if len(text) <= SOURCE_DIGEST_MIN_CHARS:
+        return source_digest(source, task, text, started, condensed=False)
+
+    digest_started = time.monotonic()
+    digest = text
+    try:
+        while True:
+            chunks = chunk_text(digest)
+            metrics.observe("summary.chunks", len(chunks), source=source)
+            if len(chunks) == 1:
+                digest = await _digest_text(source, task, chunks[0], config)
+                break
+            digests = await asyncio.gather(*(_digest_text(source, task, chunk, config) for chunk in chunks))
+            reduced = "\n\n".join(digests)
+            if len(reduced) >= len(digest):
+                # Digests that do not shrink their input would never converge
+                digest = reduced
+                break
+            digest = reduced
+    except Exception as e:
+        log_event("summary", f"Digest of {source} results failed, passing them through: {e}", logging.WARNING)
+        metrics.incr("summary.digest_failures", source=source)
+        return fallback_digest(source, task, text, started)
+    metrics.observe("summary.digest_seconds", time.monotonic() - digest_started, source=source)
+    metrics.observe("summary.digest_ratio", len(digest) / len(text), source=source)
+    return source_digest(source, task, digest, started, condensed=True)
+
+
+def format_subtasks(tasks: List[str]) -> str:
+    """Format the task line of a source's digest: the task itself, or a bullet list of its sub-tasks."""
+    if len(tasks) == 1:
+        return tasks[0]
+    return "\n".join(f"- {task}" for task in tasks)
+
+
+def merge_subtask_results(tasks: List[str], results: Dict[int, object], missing_reason: str = "no result") -> str:
+    """Merge the answers of one source's sub-task workers into a single result.
+
+    Args:
+        tasks: Sub-tasks given to the source's workers, in order
+        results: {sub-task index: worker answer} of the workers that answered
+        missing_reason: Shown for sub-tasks without an answer
+
+    Returns:
+        str: The answer itself for a single sub-task, else one section per sub-task
+    """
+    if len(tasks) == 1 and 0 in results:
+        return content_text(results[0] or "")
+    sections = []
+    for i, task in enumerate(tasks):
+        answer = content_text(results[i] or "").strip() if i in results else f"({missing_reason})"
+        sections.append(f"#### Sub-task {i + 1}: {task}\n{answer}")
+    return "\n\n".join(sections)
+
+
+def format_worker_outputs(digests: List[dict], raw_results: Optional[Dict[str, list]] = None) -> str:
+    """Lay out the per-source digests for the summary prompt.
+
+    Sources without a digest fall back to their raw results.
+
+    Args:
+        digests: Digest entries from the supervisor
+        raw_results: {source: results} of the worker agents
+
+    Returns:
+        str: One section per source
+    """
+    sections = []
+    covered = set()
+    for entry in digests:
+        covered.add(entry["source"])
+        sections.append(f"### {SOURCE_LABELS.get(entry['source'], entry['source'])}\n{entry['digest']}")
+    for source, results in (raw_results or {}).items():
+        if source not in covered and results:
+            text = "\n\n".join(content_text(getattr(r, "content", r)) for r in results)
+            sections.append(f"### {SOURCE_LABELS.get(source, source)}\n{text}")
+    return "\n\n".join(sections)
+
+
+def format_missing_sources(missing: List[dict]) -> str:
+    """Tell the summary which sources did not make it into the report.
+
+    Args:
+        missing: Entries with "source" and "reason"
+
+    Returns:
+        str: `<Missing Sources>` block, empty when every source arrived
+    """
+    if not missing:
+        return ""
+    lines = ["", "<Missing Sources>",
+             "These sources did not return data in time. Say so briefly in the article and do not speculate about what they would have shown:"]
+    lines.extend(f"- {SOURCE_LABELS.get(m['source'], m['source'])}: {m['reason']}" for m in missing)
+    lines.append("</Missing Sources>")
+    return "\n".join(lines) + "\n"
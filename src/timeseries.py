@@ -0,0 +1,472 @@
+"""On-disk store of market time series fetched from CoinGecko."""
+
+import hashlib
+import json
+import logging
+import math
+import os
+import re
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple, Union
+
+import numpy as np
+
+from src.analytics import series_from_value
+from src.cache import CACHE_DIR
+from src.metrics import log_event, metrics
+
+##########################
+# Market Time Series Store
+##########################
+SERIES_DIR = os.getenv("SERIES_DIR", os.path.join(CACHE_DIR, "series"))
+SERIES_MAX_POINTS = int(os.getenv("SERIES_MAX_POINTS", "200000"))
+# Windows with more missing pieces than this are fetched in one request
+SERIES_MAX_GAPS = 3
+
+# CoinGecko market_chart layout: metric -> response key
+DEFAULT_SERIES_METRICS = {"price": "prices", "volume": "total_volumes", "market_cap": "market_caps"}
+# CoinGecko automatic granularity: windows up to 1 day are 5-minutely, up to 90 days hourly, then daily
+DEFAULT_RESOLUTIONS = [[86400, "5m"], [90 * 86400, "1h"], [None, "1d"]]
+_RESOLUTION_SECONDS = {"m": 60, "h": 3600, "d": 86400}
+# Heurist's CoinGecko market-chart tool ("coingeckotokeninfoagent_get_market_chart" and similar), by name pattern.
+# SERIES_TOOLS entries take precedence; SERIES_DEFAULT_TOOLS=false drops these.
+DEFAULT_SERIES_TOOLS = {
+    r"coingecko\w*(market_chart|price_history|historical_price)": {
+        "asset": ["coingecko_id", "coin_id", "id", "token_id"],
+        "lookback": "days",
+        "currency": "vs_currency",
+    },
+}
+
+
+def resolution_seconds(resolution: str) -> int:
+    """Seconds per step of a resolution such as "5m", "1h" or "1d"."""
+    return int(resolution[:-1] or 1) * _RESOLUTION_SECONDS[resolution[-1]]
+
+
+def infer_resolution(timestamps: np.ndarray) -> str:
+    """Closest standard resolution to the median spacing of a series."""
+    if len(timestamps) < 2:
+        return "1d"
+    step = float(np.median(np.diff(timestamps)))
+    candidates = ["1m", "5m", "15m", "30m", "1h", "4h", "1d"]
+    return min(candidates, key=lambda r: abs(math.log(max(step, 1) / resolution_seconds(r))))
+
+
+def resample(timestamps: np.ndarray, values: np.ndarray, step: float, how: str = "last") -> Tuple[np.ndarray, np.ndarray]:
+    """Downsample a sorted series into buckets of `step` seconds.
+
+    Args:
+        timestamps: Sorted timestamps in seconds
+        values: Values aligned with `timestamps`
+        step: Bucket width in seconds
+        how: "last", "first", "mean", "sum", "max" or "min"
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: Bucket times (the last point's time for "last", else the bucket start) and aggregated values
+    """
+    if len(timestamps) == 0:
+        return timestamps, values
+    buckets = np.floor(timestamps / step).astype(np.int64)
+    starts = np.flatnonzero(np.r_[True, buckets[1:] != buckets[:-1]])
+    ends = np.r_[starts[1:], len(buckets)] - 1
+    if how == "last":
+        aggregated = values[ends]
+    elif how == "first":
+        aggregated = values[starts]
+    elif how == "sum":
+        aggregated = np.add.reduceat(values, starts)
+    elif how == "mean":
+        aggregated = np.add.reduceat(values, starts) / (ends - starts + 1)
+    elif how == "max":
+        aggregated = np.maximum.reduceat(values, starts)
+    elif how == "min":
+        aggregated = np.minimum.reduceat(values, starts)
+    else:
+        raise ValueError(f"Unknown resample aggregation: {how}")
+    labels = timestamps[ends] if how == "last" else buckets[starts].astype(float) * step
+    return labels, aggregated
+
+
+def _merge_ranges(ranges: List[List[float]]) -> List[List[float]]:
+    merged: List[List[float]] = []
+    for start, end in sorted(ranges):
+        if merged and start <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    return merged
+
+
+def missing_ranges(ranges: List[List[float]], start: float, end: float, tolerance: float = 0.0) -> List[List[float]]:
+    """Parts of [start, end] not covered by the fetched ranges.
+
+    Gaps no longer than `tolerance` (e.g. one resolution step at the tail)
+    are ignored.
+    """
+    gaps, cursor = [], start
+    for r_start, r_end in ranges:
+        if r_end <= cursor:
+            continue
+        if r_start >= end:
+            break
+        if r_start > cursor:
+            gaps.append([cursor, r_start])
+        cursor = max(cursor, r_end)
+    if cursor < end:
+        gaps.append([cursor, end])
+    return [g for g in gaps if g[1] - g[0] > tolerance]
+
+
+@dataclass
+class SeriesEntry:
+    """Columnar data of one (asset, metric, resolution): row 0 timestamps, row 1 values."""
+    data: np.ndarray
+    ranges: List[List[float]] = field(default_factory=list)
+    mtime: float = 0.0
+
+
+def _fingerprint(data: np.ndarray) -> list:
+    """Point count and last timestamp of a series, tying its meta file to the data file it was written with."""
+    return [int(data.shape[1]), float(data[0][-1]) if data.shape[1] else None]
+
+
+class TimeSeriesStore:
+    """Local store of market series keyed by (asset, metric, resolution).
+
+    Each series is a (2, n) float64 array sorted by time, saved as a `.npy`
+    file and memory-mapped on load, with a JSON sidecar listing the time
+    ranges fetched so far. Windows already covered are served from the
+    store; only the missing parts are requested upstream. Without a
+    directory the store is in-memory only.
+    """
+
+    def __init__(self, directory: Optional[str] = SERIES_DIR, max_points: int = SERIES_MAX_POINTS):
+        """Create a store persisted to directory, or in memory only when it is None."""
+        self.directory = directory
+        self.max_points = max_points
+        self._entries: Dict[Tuple[str, str, str], SeriesEntry] = {}
+        self._lock = threading.Lock()
+
+    def _paths(self, key: Tuple[str, str, str]) -> Tuple[str, str]:
+        name = hashlib.sha1("|".join(key).encode("utf-8")).hexdigest()[:20]
+        return os.path.join(self.directory, f"{name}.npy"), os.path.join(self.directory, f"{name}.json")
+
+    def _entry(self, key: Tuple[str, str, str]) -> Optional[SeriesEntry]:
+        entry = self._entries.get(key)
+        if not self.directory:
+            return entry
+        data_path, meta_path = self._paths(key)
+        try:
+            mtime = os.path.getmtime(meta_path)
+        except OSError:
+            return entry
+        if entry is not None and entry.mtime >= mtime:
+            return entry
+        # Written by another process (or first use): reload from disk
+        try:
+            with open(meta_path) as f:
+                meta = json.load(f)
+            data = np.load(data_path, mmap_mode="r")
+            ranges = meta["ranges"]
+        except (OSError, ValueError, KeyError) as e:
+            log_event("timeseries", f"Error loading series {key}: {e}", logging.WARNING)
+            return entry
+        if meta.get("data") != _fingerprint(data):
+            # Data and meta of two different writes: the ranges would not describe these points
+            return entry
+        entry = SeriesEntry(data=data, ranges=ranges, mtime=mtime)
+        self._entries[key] = entry
+        return entry
+
+    def ranges(self, key: Tuple[str, str, str]) -> List[List[float]]:
+        """Return the covered time ranges of a series."""
+        with self._lock:
+            entry = self._entry(key)
+            return [list(r) for r in entry.ranges] if entry else []
+
+    def query(self, key: Tuple[str, str, str], start: float, end: float) -> Tuple[np.ndarray, np.ndarray]:
+        """Points of a series with start <= t <= end."""
+        with self._lock:
+            entry = self._entry(key)
+        if entry is None:
+            return np.empty(0), np.empty(0)
+        timestamps = entry.data[0]
+        lo, hi = np.searchsorted(timestamps, start, side="left"), np.searchsorted(timestamps, end, side="right")
+        return np.array(timestamps[lo:hi]), np.array(entry.data[1, lo:hi])
+
+    def write(self, key: Tuple[str, str, str], timestamps: np.ndarray, values: np.ndarray, covered: List[float]):
+        """Merge fetched points into a series and record the covered range.
+
+        Stored points inside the covered window are replaced by the fetched ones.
+
+        Args:
+            key: (asset, metric, resolution)
+            timestamps: Timestamps in seconds
+            values: Values aligned with `timestamps`
+            covered: [start, end] of the fetched window
+        """
+        with self._lock:
+            entry = self._entry(key)
+            data = np.vstack([np.asarray(timestamps, dtype=float), np.asarray(values, dtype=float)])
+            if entry is not None:
+                # Fetched points supersede everything stored inside the fetched window
+                kept = np.asarray(entry.data)
+                kept = kept[:, (kept[0] < covered[0]) | (kept[0] > covered[1])]
+                data = np.hstack([kept, data])
+            data = data[:, np.argsort(data[0], kind="stable")][:, -self.max_points:]
+            ranges = _merge_ranges((entry.ranges if entry else []) + [list(covered)])
+            if len(data[0]) and len(data[0]) == self.max_points:
+                ranges = [[max(s, data[0][0]), e] for s, e in ranges if e > data[0][0]]
+            entry = SeriesEntry(data=data, ranges=ranges, mtime=time.time())
+            self._entries[key] = entry
+            if not self.directory:
+                return
+            data_path, meta_path = self._paths(key)
+            try:
+                # Created on the first write, so a store that is never written leaves no directory
+                os.makedirs(self.directory, exist_ok=True)
+                # Per-process temp names, so concurrent writers never replace each other's half-written files
+                data_tmp, meta_tmp = f"{data_path}.{os.getpid()}.tmp.npy", f"{meta_path}.{os.getpid()}.tmp"
+                np.save(data_tmp, data)
+                os.replace(data_tmp, data_path)
+                with open(meta_tmp, "w") as f:
+                    json.dump({"key": list(key), "ranges": ranges, "data": _fingerprint(data)}, f)
+                os.replace(meta_tmp, meta_path)
+                entry.mtime = os.path.getmtime(meta_path)
+            except OSError as e:
+                log_event("timeseries", f"Error writing series {key}: {e}", logging.WARNING)
+
+
+##########################
+# Tool integration
+##########################
+@dataclass
+class SeriesToolSpec:
+    """How a market-chart tool's arguments map onto store windows.
+
+    Either `lookback` (an argument counting `lookback_unit` seconds back from
+    now, like CoinGecko's `days`) or `start`/`end` (absolute timestamps in
+    `time_unit`) describe the window. `asset` names the argument holding the
+    asset id, or lists candidates; a non-default `currency` argument is part
+    of the asset key.
+    """
+    asset: Union[str, List[str]]
+    currency: Optional[str] = None
+    default_currency: str = "usd"
+    lookback: Optional[str] = None
+    lookback_unit: float = 86400
+    min_lookback: float = 1
+    integer_lookback: bool = True
+    start: Optional[str] = None
+    end: Optional[str] = None
+    time_unit: str = "s"
+    resolution: Optional[str] = None
+    resolutions: List[list] = field(default_factory=lambda: [list(r) for r in DEFAULT_RESOLUTIONS])
+    metrics: Dict[str, str] = field(default_factory=lambda: dict(DEFAULT_SERIES_METRICS))
+    response_time_unit: str = "ms"
+
+    def asset_key(self, args: dict) -> str:
+        """Store asset of a call, e.g. "bitcoin" or "bitcoin:eur"; empty when the call names none."""
+        names = [self.asset] if isinstance(self.asset, str) else self.asset
+        asset = next((str(args[n]).lower() for n in names if args.get(n)), "")
+        currency = str(args.get(self.currency) or self.default_currency).lower() if self.currency else self.default_currency
+        return f"{asset}:{currency}" if asset and currency != self.default_currency else asset
+
+    def window(self, args: dict, now: float) -> Optional[Tuple[float, float]]:
+        """Return the (start, end) window in seconds requested by a tool call."""
+        scale = 1000.0 if self.time_unit == "ms" else 1.0
+        try:
+            if self.lookback:
+                return now - float(args[self.lookback]) * self.lookback_unit, now
+            if self.start and self.end:
+                return float(args[self.start]) / scale, float(args[self.end]) / scale
+        except (KeyError, TypeError, ValueError):
+            return None
+        return None
+
+    def window_args(self, args: dict, start: float, end: float, now: float) -> dict:
+        """Arguments requesting [start, end] instead of the original window."""
+        args = dict(args)
+        if self.lookback:
+            amount = max(self.min_lookback, (now - start) / self.lookback_unit)
+            args[self.lookback] = math.ceil(amount) if self.integer_lookback else round(amount, 4)
+        else:
+            scale = 1000.0 if self.time_unit == "ms" else 1.0
+            args[self.start], args[self.end] = int(start * scale), int(end * scale)
+        return args
+
+    def target_resolution(self, args: dict, start: float, end: float) -> Optional[str]:
+        """Return the resolution the upstream API serves for a window."""
+        if self.resolution:
+            value = args.get(self.resolution)
+            return {"minutely": "5m", "hourly": "1h", "daily": "1d"}.get(value, value) if value else None
+        for max_window, resolution in self.resolutions:
+            if max_window is None or end - start <= max_window:
+                return resolution
+        return None
+
+
+def load_series_tools() -> Dict[str, SeriesToolSpec]:
+    """Parse SERIES_TOOLS, e.g. `{"get_market_chart": {"asset": "coin_id", "lookback": "days"}}`.
+
+    Returns:
+        Dict[str, SeriesToolSpec]: Spec per tool name
+    """
+    raw = os.getenv("SERIES_TOOLS", "")
+    if not raw:
+        return {}
+    try:
+        return {name: SeriesToolSpec(**spec) for name, spec in json.loads(raw).items()}
+    except (json.JSONDecodeError, TypeError, AttributeError) as e:
+        log_event("timeseries", f"Error parsing SERIES_TOOLS: {e}", logging.WARNING)
+        return {}
+
+
+def default_series_tools() -> Dict[str, SeriesToolSpec]:
+    """Return the built-in specs keyed by tool name pattern, unless SERIES_DEFAULT_TOOLS is false."""
+    if os.getenv("SERIES_DEFAULT_TOOLS", "true").lower() in ("0", "false", "no"):
+        return {}
+    return {pattern: SeriesToolSpec(**spec) for pattern, spec in DEFAULT_SERIES_TOOLS.items()}
+
+
+def _parse_response(result: Any, spec: SeriesToolSpec) -> Dict[str, Tuple[np.ndarray, np.ndarray]]:
+    if not isinstance(result, str):
+        return {}
+    try:
+        data = json.loads(result)
+    except (json.JSONDecodeError, ValueError):
+        return {}
+    if not isinstance(data, dict):
+        return {}
+    parsed = {}
+    for metric, response_key in spec.metrics.items():
+        series = series_from_value(data.get(response_key))
+        if series is not None and series.timestamps is not None:
+            order = np.argsort(series.timestamps, kind="stable")
+            parsed[metric] = (series.timestamps[order], series.close[order])
+    return parsed
+
+
+class SeriesToolCache:
+    """Serve market-chart tool calls from the time-series store.
+
+    A call whose window is already covered is answered locally. A call
+    missing only recent data fetches the missing tail (at its own, usually
+    finer, resolution, resampled into the requested one). Anything else is
+    fetched as requested and stored for later windows.
+    """
+
+    def __init__(self, store: Optional[TimeSeriesStore], specs: Dict[str, SeriesToolSpec],
+                 patterns: Optional[Dict[str, SeriesToolSpec]] = None):
+        """Create a cache for the tools in specs and matching patterns."""
+        self.store = store
+        self.specs = specs
+        self.patterns = [(re.compile(p, re.IGNORECASE), spec) for p, spec in (patterns or {}).items()]
+
+    def spec_for(self, tool) -> Optional[SeriesToolSpec]:
+        """Spec of a tool: an exact SERIES_TOOLS entry, else the first matching default pattern."""
+        if self.store is None:
+            return None
+        spec = self.specs.get(tool.name)
+        if spec is None:
+            spec = next((spec for pattern, spec in self.patterns if pattern.search(tool.name)), None)
+        return spec
+
+    def handles(self, tool) -> bool:
+        """Whether a tool returns a cacheable time series."""
+        return self.spec_for(tool) is not None
+
+    def _store_response(self, spec: SeriesToolSpec, asset: str, result: Any, covered: List[float],
+                        target: Optional[str]) -> bool:
+        parsed = _parse_response(result, spec)
+        for metric, (timestamps, values) in parsed.items():
+            resolution = infer_resolution(timestamps)
+            self.store.write((asset, metric, resolution), timestamps, values, covered)
+            if target and target != resolution and resolution_seconds(target) > resolution_seconds(resolution):
+                self.store.write((asset, metric, target), *resample(timestamps, values, resolution_seconds(target)),
+                                 covered)
+        return bool(parsed)
+
+    def _render(self, spec: SeriesToolSpec, asset: str, resolution: str, start: float, end: float) -> Optional[str]:
+        scale = 1000.0 if spec.response_time_unit == "ms" else 1.0
+        output: Dict[str, Any] = {}
+        for metric, response_key in spec.metrics.items():
+            timestamps, values = self.store.query((asset, metric, resolution), start, end)
+            if len(timestamps):
+                output[response_key] = np.column_stack([timestamps * scale, values]).tolist()
+        if not output:
+            return None
+        output["resolution"] = resolution
+        return json.dumps(output)
+
+    async def call(self, tool, args: dict, fetch: Callable[[dict], Awaitable[Any]]) -> Any:
+        """Run a market-chart tool call through the store.
+
+        Args:
+            tool: The tool being called
+            args: Its arguments
+            fetch: Calls the tool upstream with the given arguments
+
+        Returns:
+            The tool result, rebuilt from the store when it holds the window
+        """
+        spec = self.spec_for(tool)
+        now = time.time()
+        window = spec.window(args, now)
+        asset = spec.asset_key(args)
+        if window is None or not asset:
+            return await fetch(args)
+        start, end = window
+        target = spec.target_resolution(args, start, end)
+        if target is None:
+            return await fetch(args)
+
+        price_key = (asset, "price", target)
+        gaps = missing_ranges(self.store.ranges(price_key), start, end, tolerance=resolution_seconds(target))
+        if not gaps:
+            rendered = self._render(spec, asset, target, start, end)
+            if rendered is not None:
+                metrics.incr("series.store_hits", tool=tool.name)
+                return rendered
+            gaps = [[start, end]]
+
+        # A lookback argument can only express "from X until now": fetch the tail if that is all that is missing
+        if spec.lookback:
+            requests = [gaps[0]] if len(gaps) == 1 and gaps[0][1] >= end - resolution_seconds(target) else [[start, end]]
+        else:
+            requests = gaps if len(gaps) <= SERIES_MAX_GAPS else [[start, end]]
+
+        partial = requests != [[start, end]]
+        results = []
+        for gap_start, gap_end in requests:
+            call_args = spec.window_args(args, gap_start, gap_end, now) if partial else args
+            result = await fetch(call_args)
+            call_window = spec.window(call_args, now) or (gap_start, gap_end)
+            if not self._store_response(spec, asset, result, list(call_window), target):
+                # Not a series this store understands: pass the upstream answer through
+                return result if not partial else await fetch(args)
+            results.append(result)
+
+        metrics.incr("series.partial_fetches" if partial else "series.full_fetches", tool=tool.name)
+        if partial:
+            metrics.observe("series.fetched_fraction", sum(g[1] - g[0] for g in requests) / max(1.0, end - start),
+                            tool=tool.name)
+        rendered = self._render(spec, asset, target, start, end)
+        return rendered if rendered is not None else results[-1]
+
+
+_series_tool_cache: Optional[SeriesToolCache] = None
+
+
+def get_series_tool_cache() -> SeriesToolCache:
+    """Return the process-wide series tool cache, configured from SERIES_TOOLS and SERIES_DIR."""
+    global _series_tool_cache
+    if _series_tool_cache is None:
+        specs, patterns = load_series_tools(), default_series_tools()
+        # Without any spec there is nothing to store, so no store (nor SERIES_DIR) is created
+        store = TimeSeriesStore() if specs or patterns else None
+        _series_tool_cache = SeriesToolCache(store, specs, patterns)
+    return _series_tool_cache
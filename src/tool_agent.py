@@ -0,0 +1,379 @@
+"""Shared engine of the Heurist and Flipside tool-calling agents."""
+
+import asyncio
+import logging
+import time
+from typing import Awaitable, Callable, Dict, List, Literal, Optional
+
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage, ToolMessage
+from langchain_core.runnables import RunnableConfig
+from langchain_core.tools import ToolException
+from langgraph.graph import END, StateGraph
+from langgraph.types import Command
+
+from src.budget import AgentBudget, BudgetTracker
+from src.compaction import (
+    AGENT_CONTEXT_TOKEN_CEILING,
+    compact_tool_history,
+    content_text,
+)
+from src.credits import CreditBudgetExceeded
+from src.entities import with_resolved_entities
+from src.metrics import log_event, metrics
+from src.progress import emit_progress
+from src.prompt import budget_exhausted_prompt
+from src.reasoning import keep_reasoning, reasoning_trace, strip_reasoning
+from src.singleflight import tool_call_key
+from src.tool_catalog import ToolCatalogEntry
+from src.utils import bind_tools_cached, get_current_date_time, get_model
+
+##########################
+# Tool Agent Engine
+##########################
+ToolLoader = Callable[[RunnableConfig], Awaitable[ToolCatalogEntry]]
+ToolCaller = Callable[[object, dict, RunnableConfig], Awaitable[object]]
+
+
+async def _rejected_tool_call(reason: str):
+    raise ToolException(f"Tool call not executed: {reason}")
+
+
+REUSED_RESULT_MARKER = ("[Reused result: {tool} was already called with these arguments in this run. "
+                        "Do not repeat the call.]\n")
+# Characters of collected tool results kept in the canned answer when the final answer times out
+PARTIAL_ANSWER_MAX_CHARS = 6000
+
+
+def partial_answer(messages: list, reason: str) -> AIMessage:
+    """Canned answer from the tool results collected so far, for when the model cannot answer in time.
+
+    Args:
+        messages: Conversation of the agent run
+        reason: Name of the exhausted budget
+
+    Returns:
+        AIMessage: The latest tool results, newest first, within PARTIAL_ANSWER_MAX_CHARS
+    """
+    parts, left = [], PARTIAL_ANSWER_MAX_CHARS
+    for message in reversed(messages):
+        if not isinstance(message, ToolMessage) or left <= 0:
+            continue
+        text = content_text(message.content)[:left]
+        parts.append(f"[{message.name}]\n{text}")
+        left -= len(text)
+    header = (f"Research budget exhausted ({reason}) and no final answer was written in time. "
+              "Raw data collected so far, not analyzed:")
+    return AIMessage(content="\n\n".join([header] + parts) if parts else f"{header} none.")
+
+
+class ToolCallMemo:
+    """Tool calls of one agent run, keyed by tool and canonical arguments.
+
+    Identical calls in the same round share one execution, and a call
+    repeating an earlier successful call gets its result without running
+    again. Failed calls are forgotten so they can be retried.
+    """
+
+    def __init__(self):
+        """Create an empty registry."""
+        self.calls: Dict[str, asyncio.Future] = {}
+        self.attempted = 0
+        self.redundant = 0
+
+    def lookup(self, key: str) -> Optional[asyncio.Future]:
+        """Return the running or successful call for a key; failed calls are forgotten."""
+        task = self.calls.get(key)
+        if task is not None and task.done() and (task.cancelled() or task.exception() is not None):
+            del self.calls[key]
+            return None
+        return task
+
+    def forget(self, tasks):
+        """Forget the given calls, e.g. after they were cancelled."""
+        self.calls = {key: task for key, task in self.calls.items() if task not in tasks}
+
+    def finish(self, agent_name: str):
+        """Record the attempted and redundant call counts of a run."""
+        metrics.incr("tool_calls.attempted", self.attempted, agent=agent_name)
+        metrics.incr("tool_calls.redundant", self.redundant, agent=agent_name)
+        if self.attempted:
+            metrics.observe("tool_calls.redundant_rate", self.redundant / self.attempted, agent=agent_name)
+        if self.redundant:
+            log_event(agent_name, f"{agent_name} agent reused {self.redundant}/{self.attempted} redundant tool calls", logging.INFO)
+
+
+def _reused_content(tool_name: str, result):
+    marker = REUSED_RESULT_MARKER.format(tool=tool_name)
+    if isinstance(result, list):
+        return [{"type": "text", "text": marker}] + result
+    return marker + (result if isinstance(result, str) else str(result))
+
+
+class ToolAgent:
+    """Reusable tool-calling agent loop for one data source.
+
+    The model is called with the source's tools bound; tool calls of each
+    round run concurrently under a per-agent semaphore through the
+    `call_tool` policy (retry, cache, coalescing live there). Start, tool
+    call, tool result and finish events are streamed as progress events. The loop stops when the
+    model answers without tool calls or the agent budget runs out, in which
+    case the model is forced into a final answer without tools. Tool results
+    the model has already read are compacted into digests before each round.
+    Calls repeating an earlier call of the same run are answered from a
+    per-run memo instead of running again.
+
+    State keys are `{name}_queries` and `{name}_results`.
+    """
+
+    def __init__(self, name: str, load_tools: ToolLoader, system_prompt: str, call_tool: ToolCaller,
+                 label: str, error_prefix: str = "Tool call failed after retries",
+                 max_concurrency: int = 4, model=None, role: str = "tool_agent"):
+        """Configure an agent; tools are loaded per run with load_tools."""
+        self.name = name
+        self.load_tools = load_tools
+        self.system_prompt = system_prompt
+        self.call_tool = call_tool
+        self.label = label
+        self.error_prefix = error_prefix
+        self.max_concurrency = max_concurrency
+        # A fixed model, or None to resolve the `role` model per run from the config
+        self.model = model
+        self.role = role
+        self.queries_key = f"{name}_queries"
+        self.results_key = f"{name}_results"
+
+    def initial_messages(self, task: str) -> list:
+        """Build the agent's opening messages for a task from the supervisor.
+
+        Identifiers of entities named in the task are appended from the local
+        entity index, so the model can skip lookup tool calls.
+
+        Args:
+            task: Task description for this agent
+
+        Returns:
+            list: System prompt and task message
+        """
+        return [
+            SystemMessage(content=self.system_prompt.format(current_datetime=get_current_date_time())),
+            HumanMessage(content=with_resolved_entities(task)),
+        ]
+
+    async def node(self, state: dict, config: RunnableConfig) -> Command[Literal["__end__"]]:
+        """Run the agent on its queries and return its results."""
+        query = state.get(self.queries_key, [])
+        if not query:
+            return Command(
+                goto="__end__",
+                update={
+                    self.queries_key: [HumanMessage(content="No messages provided")],
+                    self.results_key: ["No messages provided"]
+                }
+            )
+        messages = list(query) if isinstance(query, list) else [HumanMessage(content=query)]
+        started = time.monotonic()
+        emit_progress(self.name, "start")
+
+        tools = await self.load_tools(config)
+        if not tools:
+            emit_progress(self.name, "finish", ok=False, seconds=round(time.monotonic() - started, 2))
+            # Surface the outage instead of letting the model answer without data
+            return Command(
+                goto="__end__",
+                update={
+                    self.queries_key: query,
+                    self.results_key: f"{self.label} tools are unavailable, no data was collected from this source."
+                }
+            )
+
+        traces = []
+        response = await self.run(messages, tools, config, traces)
+        emit_progress(self.name, "finish", ok=True, seconds=round(time.monotonic() - started, 2))
+        update = {
+            self.queries_key: query,
+            self.results_key: response.content
+        }
+        if keep_reasoning(config) and traces:
+            update["reasoning_traces"] = traces
+        return Command(goto="__end__", update=update)
+
+    async def run(self, messages: list, tools: ToolCatalogEntry, config: RunnableConfig,
+                  traces: Optional[list] = None) -> AIMessage:
+        """Run the tool loop until the model answers.
+
+        Reasoning traces are stripped from every model response, so neither
+        the loop history nor the final answer carries them.
+
+        Args:
+            messages: Conversation so far; extended in place with each round
+            tools: Tool catalog available to the agent
+            config: RunnableConfig of the current run
+            traces: Optional list collecting the stripped reasoning traces
+
+        Returns:
+            AIMessage: The model's final answer, without reasoning
+        """
+        traces = [] if traces is None else traces
+        base_model = self.model or get_model(self.role, config)
+        model = bind_tools_cached(base_model, tools)
+        budget = BudgetTracker(AgentBudget.from_config(config, self.name), self.name)
+        memo = ToolCallMemo()
+        token_ceiling = self.context_token_ceiling(config)
+        tokens_saved = 0
+        try:
+            while True:
+                tokens_saved += compact_tool_history(messages, token_ceiling)
+                exhausted = budget.exhausted(messages)
+                if exhausted:
+                    response = await self.force_final_answer(base_model, messages, exhausted, config, budget)
+                    return self._strip_reasoning(response, traces)
+                try:
+                    response = await asyncio.wait_for(model.ainvoke(messages, config), budget.remaining_seconds)
+                except asyncio.TimeoutError:
+                    response = await self.force_final_answer(base_model, messages, "max_seconds", config, budget)
+                    return self._strip_reasoning(response, traces)
+                response = self._strip_reasoning(response, traces)
+                if not response.tool_calls:
+                    return response
+
+                tool_messages = await self.execute_tool_calls(response.tool_calls, tools, budget, config, memo)
+                messages.append(response)
+                messages.extend(tool_messages)
+        finally:
+            budget.finish()
+            memo.finish(self.name)
+            metrics.observe("compaction.tokens_saved", tokens_saved, agent=self.name)
+            if tokens_saved:
+                log_event(self.name, f"{self.name} agent compaction saved ~{tokens_saved} prompt tokens", logging.DEBUG)
+
+    def _strip_reasoning(self, response: AIMessage, traces: list) -> AIMessage:
+        response, reasoning = strip_reasoning(response, self.name)
+        traces.extend(reasoning_trace(self.name, reasoning))
+        return response
+
+    def context_token_ceiling(self, config: RunnableConfig) -> Optional[int]:
+        """Prompt token ceiling for history compaction.
+
+        `configurable.context_token_ceiling` may be a number for every agent or
+        a {agent name: number} dict; AGENT_CONTEXT_TOKEN_CEILING is the default.
+        """
+        ceiling = (config or {}).get("configurable", {}).get("context_token_ceiling")
+        if isinstance(ceiling, dict):
+            ceiling = ceiling.get(self.name)
+        return AGENT_CONTEXT_TOKEN_CEILING if ceiling is None else int(ceiling)
+
+    async def execute_tool_calls(self, tool_calls: list, tools: ToolCatalogEntry, budget: BudgetTracker,
+                                 config: RunnableConfig, memo: Optional[ToolCallMemo] = None) -> List[ToolMessage]:
+        """Execute one round of tool calls concurrently.
+
+        Calls found in `memo` reuse the earlier result, marked as reused, and
+        do not count against the tool call budget.
+
+        Args:
+            tool_calls: Tool calls requested by the model
+            tools: Tool catalog to resolve names against
+            budget: Budget tracker of this run
+            config: RunnableConfig of the current run
+            memo: Tool calls made earlier in this run
+
+        Returns:
+            List[ToolMessage]: One message per tool call, in the order requested
+        """
+        memo = ToolCallMemo() if memo is None else memo
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        async def bounded(coro):
+            async with semaphore:
+                return await coro
+
+        allowed = budget.remaining_tool_calls
+        slots: List[asyncio.Future] = []
+        reused = set()
+        for i, call in enumerate(tool_calls):
+            tool = tools.get(call["name"])
+            key = tool_call_key(tool, call["args"]) if tool is not None else None
+            if key is not None:
+                memo.attempted += 1
+                earlier = memo.lookup(key)
+                if earlier is not None:
+                    memo.redundant += 1
+                    reused.add(i)
+                    slots.append(earlier)
+                    emit_progress(self.name, "tool_reused", tool=call["name"], args=call["args"])
+                    continue
+            if allowed is not None and i - len(reused) >= allowed:
+                task = asyncio.ensure_future(_rejected_tool_call("tool call budget exhausted"))
+            elif tool is None:
+                task = asyncio.ensure_future(_rejected_tool_call(f"unknown tool '{call['name']}'"))
+            else:
+                task = asyncio.ensure_future(bounded(self.call_tool(tool, call["args"], config)))
+                memo.calls[key] = task
+                emit_progress(self.name, "tool_call", tool=call["name"], args=call["args"])
+            slots.append(task)
+        budget.record_round(len(tool_calls) - len(reused))
+
+        pending = {task for task in slots if not task.done()}
+        timed_out = set()
+        while pending:
+            remaining = budget.remaining_seconds
+            done, pending = await asyncio.wait(pending, timeout=remaining, return_when=asyncio.FIRST_COMPLETED)
+            if not done:
+                # Time budget ran out with calls still in flight
+                for task in pending:
+                    task.cancel()
+                timed_out = pending
+                memo.forget(timed_out)
+                break
+            for i, task in enumerate(slots):
+                if task in done and i not in reused:
+                    emit_progress(self.name, "tool_result", tool=tool_calls[i]["name"],
+                                  ok=task.exception() is None)
+
+        tool_messages = []
+        for i, (call, task) in enumerate(zip(tool_calls, slots)):
+            if task in timed_out:
+                result = asyncio.TimeoutError("Tool call cancelled: agent time budget exhausted")
+            else:
+                result = task.exception() or task.result()
+            if isinstance(result, CreditBudgetExceeded):
+                # Structured rejection the model can plan around; nothing was attempted
+                content = str(result)
+            elif isinstance(result, BaseException):
+                content = f"{self.error_prefix}: {str(result)}"
+            elif i in reused:
+                content = _reused_content(call["name"], result)
+            else:
+                content = result
+            tool_messages.append(ToolMessage(name=call["name"], tool_call_id=call["id"], content=content))
+        return tool_messages
+
+    async def force_final_answer(self, model, messages: list, reason: str, config: RunnableConfig,
+                                 budget: Optional[BudgetTracker] = None) -> AIMessage:
+        """Answer without tools from the data collected so far once the budget runs out.
+
+        The model gets what is left of the time budget, at least
+        AGENT_FINAL_ANSWER_GRACE_SECONDS; past that, the answer is the
+        collected tool results (see `partial_answer`).
+        """
+        log_event(self.name, f"{self.name} agent budget exhausted ({reason}), forcing final answer", logging.INFO)
+        prompt = messages + [HumanMessage(content=budget_exhausted_prompt.format(reason=reason))]
+        try:
+            return await asyncio.wait_for(model.ainvoke(prompt, config), budget.final_answer_seconds if budget else None)
+        except asyncio.TimeoutError:
+            metrics.incr("agent_budget.final_answer_timeouts", agent=self.name)
+            return partial_answer(messages, reason)
+
+    def build_subgraph(self, state_schema):
+        """Compile a single-node subgraph running this agent.
+
+        Args:
+            state_schema: TypedDict state with this agent's queries/results keys
+
+        Returns:
+            CompiledStateGraph: The compiled subgraph
+        """
+        builder = StateGraph(state_schema)
+        builder.add_node(f"{self.name}_agent", self.node)
+        builder.set_entry_point(f"{self.name}_agent")
+        builder.add_edge(f"{self.name}_agent", END)
+        return builder.compile()
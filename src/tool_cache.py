@@ -0,0 +1,146 @@
+"""TTL cache of MCP tool results, by tool category."""
+
+import json
+import logging
+import os
+import re
+from typing import Any, Awaitable, Callable, List, Optional, Tuple
+
+from langchain_core.runnables import RunnableConfig
+
+from src.cache import MISS, ResponseCache, open_cache_store
+from src.metrics import log_event, metrics
+from src.singleflight import tool_call_key, tool_server
+
+##########################
+# MCP Tool Result Cache
+##########################
+# (category, tool name pattern, TTL seconds); first match wins.
+# Heurist tool names carry their agent prefix (e.g. "coingeckotokeninfoagent_..."),
+# Flipside tool names are used as-is. Prediction, social and news come before the
+# broad trading pattern, which would otherwise catch "allorapricepredictionagent_..."
+# or Elfa's "..._get_trending_tokens".
+DEFAULT_TOOL_CACHE_POLICY: List[Tuple[str, str, float]] = [
+    ("sql", r"^run_public_sql_query$", 3600),
+    ("metadata", r"protocol_lookup|gather_metadata|find_relevant_metrics|get_meta_prompt|evaluate_protocol_fit", 6 * 3600),
+    ("expert", r"^ask_\w+_expert$|growth_playbook", 3600),
+    ("scores", r"score", 1800),
+    ("prediction", r"allora|predict", 300),
+    ("social", r"twitter|tweet|elfa|kol|mind", 180),
+    ("news", r"news|search_web|web_search", 300),
+    ("trading", r"coingecko|dexscreener|gmgn|trading|price|market|trending|token_?info", 30),
+    ("onchain", r"arkham|wallet|pond|address|transaction", 300),
+]
+DEFAULT_TOOL_CACHE_TTL = float(os.getenv("TOOL_CACHE_DEFAULT_TTL", "60"))
+
+
+class ToolCachePolicy:
+    """Maps tool names to a cache category and TTL.
+
+    Exact tool names in `overrides` win over the category patterns. A TTL of
+    0 disables caching for that tool.
+    """
+
+    def __init__(self, rules: List[Tuple[str, str, float]] = DEFAULT_TOOL_CACHE_POLICY,
+                 overrides: Optional[dict] = None, default_ttl: float = DEFAULT_TOOL_CACHE_TTL):
+        """Compile the TTL rules; overrides map tool names or categories to TTLs."""
+        self.rules = [(category, re.compile(pattern, re.IGNORECASE), ttl) for category, pattern, ttl in rules]
+        self.overrides = dict(overrides or {})
+        self.default_ttl = default_ttl
+
+    def resolve(self, tool_name: str, overrides: Optional[dict] = None) -> Tuple[str, float]:
+        """Resolve the cache category and TTL for a tool.
+
+        Args:
+            tool_name: Tool name
+            overrides: Optional per-request {tool_name: ttl} overrides
+
+        Returns:
+            Tuple[str, float]: (category, ttl in seconds)
+        """
+        category = "default"
+        ttl = self.default_ttl
+        for rule_category, pattern, rule_ttl in self.rules:
+            if pattern.search(tool_name):
+                category, ttl = rule_category, rule_ttl
+                break
+        for source in (self.overrides, overrides or {}):
+            if tool_name in source:
+                ttl = float(source[tool_name])
+            elif category in source:
+                ttl = float(source[category])
+        return category, ttl
+
+
+def _env_overrides() -> dict:
+    raw = os.getenv("TOOL_CACHE_TTLS")
+    if not raw:
+        return {}
+    try:
+        return json.loads(raw)
+    except json.JSONDecodeError as e:
+        log_event("tool_cache", f"Ignoring invalid TOOL_CACHE_TTLS: {e}", logging.WARNING)
+        return {}
+
+
+class ToolResultCache:
+    """Result cache in front of MCP tool invocation, with per-category TTLs."""
+
+    def __init__(self, policy: ToolCachePolicy, cache: ResponseCache):
+        """Create a cache applying policy over cache."""
+        self.policy = policy
+        self.cache = cache
+
+    async def call(self, tool, args: Any, fn: Callable[[], Awaitable[Any]], config: RunnableConfig = None) -> Any:
+        """Serve a tool call from cache or run it and cache the result.
+
+        Per request, `configurable.tool_cache_ttls` ({tool name or category: ttl})
+        overrides the TTL policy and `configurable.max_staleness` (seconds, or a
+        {tool name or category: seconds} dict) bounds the age of a cached result.
+
+        Args:
+            tool: Tool being called
+            args: Tool arguments
+            fn: Zero-argument coroutine factory doing the actual call
+            config: RunnableConfig with optional per-request overrides
+
+        Returns:
+            The cached or fresh tool result
+        """
+        configurable = (config or {}).get("configurable", {})
+        category, ttl = self.policy.resolve(tool.name, configurable.get("tool_cache_ttls"))
+        if ttl <= 0:
+            return await fn()
+
+        max_age = resolve_max_staleness(configurable.get("max_staleness"), tool.name, category)
+        key = tool_call_key(tool, args)
+        labels = {"server": tool_server(tool), "category": category}
+        result = await self.cache.get(key, max_age=max_age)
+        if result is not MISS:
+            metrics.incr("tool_cache.hits", **labels)
+            return result
+        metrics.incr("tool_cache.misses", **labels)
+
+        result = await fn()
+        await self.cache.set(key, result, ttl)
+        return result
+
+
+def resolve_max_staleness(value, tool_name: str, category: str) -> Optional[float]:
+    """Maximum result age for a tool from a `max_staleness` setting (seconds or a per-tool/category dict)."""
+    if value is None:
+        return None
+    if isinstance(value, dict):
+        value = value.get(tool_name, value.get(category))
+        if value is None:
+            return None
+    return float(value)
+
+
+tool_result_cache = ToolResultCache(
+    ToolCachePolicy(overrides=_env_overrides()),
+    ResponseCache(
+        max_entries=int(os.getenv("TOOL_CACHE_MAX_ENTRIES", "2048")),
+        store=open_cache_store("TOOL_CACHE_DB", table="tool_results"),
+    ),
+)
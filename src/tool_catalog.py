@@ -0,0 +1,203 @@
+"""Cache of MCP tool catalogs and their bound-model schemas."""
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import time
+import traceback
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+from langchain_core.tools import BaseTool
+from mcp.types import Tool as MCPTool
+
+from src.cache import CACHE_DIR
+from src.mcp_pool import get_mcp_session_manager
+from src.metrics import log_event
+
+##########################
+# Tool Catalog Cache
+##########################
+TOOL_CATALOG_DIR = os.getenv("TOOL_CATALOG_DIR", os.path.join(CACHE_DIR, "tool_catalog"))
+TOOL_CATALOG_TTL_SECONDS = float(os.getenv("TOOL_CATALOG_TTL_SECONDS", "600"))
+MAX_BOUND_MODELS = 64
+
+
+@dataclass
+class ToolCatalogEntry:
+    """Tools of one source with their JSON schemas and an O(1) name index."""
+    tools: List[BaseTool]
+    schemas: List[dict] = field(default_factory=list)
+    fetched_at: float = 0.0
+    version: str = ""
+    by_name: Dict[str, BaseTool] = field(init=False)
+
+    def __post_init__(self):
+        """Index the tools by name and derive the version from their schemas."""
+        self.by_name = {t.name: t for t in self.tools}
+        if not self.version:
+            self.version = _schemas_version(self.schemas or [t.name for t in self.tools])
+
+    @classmethod
+    def from_tools(cls, tools: List[BaseTool]) -> "ToolCatalogEntry":
+        """Wrap a static list of local tools (e.g. Tavily) as a catalog entry."""
+        return cls(tools=list(tools), fetched_at=time.time())
+
+    def get(self, name: str) -> Optional[BaseTool]:
+        """Return the tool with a given name, if any."""
+        return self.by_name.get(name)
+
+    def __bool__(self) -> bool:
+        """Whether the catalog has any tools."""
+        return bool(self.tools)
+
+
+def _schemas_version(schemas: list) -> str:
+    payload = json.dumps(schemas, sort_keys=True, default=str)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()[:16]
+
+
+class ToolCatalog:
+    """Cache of MCP tool catalogs keyed by server URL.
+
+    Lookups are served from memory while fresh. A stale entry is still
+    returned immediately while a background task refreshes it, and a cold
+    worker starts from the on-disk snapshot of the last successful listing,
+    so agents can bind tools without waiting on the MCP server.
+    """
+
+    def __init__(self, ttl: float = TOOL_CATALOG_TTL_SECONDS, snapshot_dir: str = TOOL_CATALOG_DIR):
+        """Create a catalog with snapshots in snapshot_dir."""
+        self.ttl = ttl
+        self.snapshot_dir = snapshot_dir
+        self._entries: Dict[str, ToolCatalogEntry] = {}
+        self._refreshing: Dict[str, asyncio.Task] = {}
+        self._bound: Dict[tuple, object] = {}
+
+    async def get(self, name: str, url: str) -> ToolCatalogEntry:
+        """Get the tool catalog for an MCP server.
+
+        Args:
+            name: Server name
+            url: SSE endpoint of the server
+
+        Returns:
+            ToolCatalogEntry: The cached, snapshotted or freshly listed catalog
+
+        Raises:
+            Exception: If nothing is cached and listing the tools fails
+        """
+        entry = self._entries.get(url)
+        if entry is None:
+            entry = self._load_snapshot(name, url)
+            if entry is not None:
+                self._entries[url] = entry
+                self._schedule_refresh(name, url)
+                return entry
+            return await self._refresh(name, url)
+
+        if time.time() - entry.fetched_at > self.ttl:
+            self._schedule_refresh(name, url)
+        return entry
+
+    def bind_tools(self, model, entry: ToolCatalogEntry):
+        """Memoized `model.bind_tools(entry.tools)` per model and catalog version.
+
+        Args:
+            model: Chat model to bind
+            entry: Tool catalog to bind to the model
+
+        Returns:
+            Runnable: The model with the catalog's tools bound
+        """
+        key = (id(model), entry.version)
+        bound = self._bound.get(key)
+        if bound is None:
+            if len(self._bound) >= MAX_BOUND_MODELS:
+                self._bound.pop(next(iter(self._bound)))
+            bound = model.bind_tools(entry.tools)
+            self._bound[key] = bound
+        return bound
+
+    def _schedule_refresh(self, name: str, url: str):
+        task = self._refreshing.get(url)
+        if task is not None and not task.done():
+            return
+        self._refreshing[url] = asyncio.create_task(self._background_refresh(name, url))
+
+    async def _background_refresh(self, name: str, url: str):
+        try:
+            await self._refresh(name, url)
+        except Exception as e:
+            log_event("tool_catalog", f"Background refresh of MCP tool catalog '{name}' failed: {e}", logging.WARNING)
+
+    async def _refresh(self, name: str, url: str) -> ToolCatalogEntry:
+        manager = get_mcp_session_manager()
+        mcp_tools = await manager.list_tools(name, url)
+        schemas = [t.model_dump(mode="json", exclude_none=True) for t in mcp_tools]
+        version = _schemas_version(schemas)
+
+        current = self._entries.get(url)
+        if current is not None and current.version == version:
+            # Same catalog, keep the already bound tools
+            current.fetched_at = time.time()
+            entry = current
+        else:
+            entry = ToolCatalogEntry(
+                tools=manager.build_tools(name, url, mcp_tools),
+                schemas=schemas,
+                fetched_at=time.time(),
+                version=version,
+            )
+            self._entries[url] = entry
+        await asyncio.to_thread(self._write_snapshot, name, url, entry)
+        return entry
+
+    def _snapshot_path(self, url: str) -> str:
+        digest = hashlib.sha1(url.encode("utf-8")).hexdigest()[:16]
+        return os.path.join(self.snapshot_dir, f"{digest}.json")
+
+    def _load_snapshot(self, name: str, url: str) -> Optional[ToolCatalogEntry]:
+        path = self._snapshot_path(url)
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path, encoding="utf-8") as f:
+                snapshot = json.load(f)
+            schemas = snapshot["tools"]
+            mcp_tools = [MCPTool.model_validate(s) for s in schemas]
+        except Exception as e:
+            log_event("tool_catalog", f"Ignoring unreadable MCP tool catalog snapshot {path}: {e}", logging.WARNING)
+            return None
+        # Backdate so the first lookup triggers a refresh
+        return ToolCatalogEntry(
+            tools=get_mcp_session_manager().build_tools(name, url, mcp_tools),
+            schemas=schemas,
+            fetched_at=0.0,
+            version=snapshot.get("version") or _schemas_version(schemas),
+        )
+
+    def _write_snapshot(self, name: str, url: str, entry: ToolCatalogEntry):
+        path = self._snapshot_path(url)
+        try:
+            os.makedirs(self.snapshot_dir, exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"name": name, "url": url, "version": entry.version, "tools": entry.schemas}, f)
+            os.replace(tmp_path, path)
+        except Exception as e:
+            log_event("tool_catalog", f"Error writing MCP tool catalog snapshot: {e}", logging.WARNING)
+            traceback.print_exception(type(e), e, e.__traceback__)
+
+
+_tool_catalog: Optional[ToolCatalog] = None
+
+
+def get_tool_catalog() -> ToolCatalog:
+    """Return the process-wide tool catalog cache."""
+    global _tool_catalog
+    if _tool_catalog is None:
+        _tool_catalog = ToolCatalog()
+    return _tool_catalog
@@ -1,33 +1,135 @@
-import os
+"""Model registry, Tavily search and MCP tool helpers."""
+
 import asyncio
-from typing import List, Literal, Annotated
+import json
+import logging
+import os
+import traceback
 from datetime import datetime
+from typing import Annotated, List, Literal, Type
+
 from langchain.chat_models import init_chat_model
-from langchain_core.runnables import RunnableConfig
-from langchain_core.tools import BaseTool, tool, InjectedToolArg
-from langchain_mcp_adapters.client import MultiServerMCPClient
+from langchain_core.runnables import RunnableConfig, RunnableLambda
+from langchain_core.tools import InjectedToolArg, tool
 from tavily import AsyncTavilyClient
-import traceback
-from dotenv import load_dotenv
 
-load_dotenv()
+from src.analytics import digest_market_output, market_analytics
+from src.cache import MISS, ResponseCache, open_cache_store
+from src.credits import credit_ledger, with_credit_cost
+from src.dedup import dedup_search_results, dedup_tool_output
+from src.metrics import log_event, metrics
+from src.passages import extract_passages_async
+from src.resilience import resilient_call
+from src.singleflight import tool_call_flight, tool_call_key, tool_server
+from src.sql_cache import SQL_TOOL_NAME, get_sql_result_cache
+from src.timeseries import get_series_tool_cache
+from src.tool_cache import tool_result_cache
+from src.tool_catalog import ToolCatalogEntry, get_tool_catalog
 
-configurable_model = init_chat_model(
-    model= "deepseek/deepseek-r1-distill-llama-70b",
-    model_provider= "openai",
-    api_key= os.getenv("HEURIST_API_KEY"),
-    base_url= os.getenv("HEURIST_BASE_URL"),
-    temperature=0
-)
+##########################
+# Model Registry
+##########################
+LARGE_MODEL = os.getenv("LARGE_MODEL", "deepseek/deepseek-r1-distill-llama-70b")
+FAST_MODEL = os.getenv("FAST_MODEL", "meta-llama/llama-3.1-8b-instruct")
 
-# Summary agent model with higher temperature for more creative output
-summary_model = init_chat_model(
-    model= "deepseek/deepseek-r1-distill-llama-70b",
-    model_provider= "openai",
-    api_key= os.getenv("HEURIST_API_KEY"),
-    base_url= os.getenv("HEURIST_BASE_URL"),
-    temperature=0.5
-)
+# Default model per role: short classification/routing hops use the fast model,
+# tool use and report writing use the large reasoning model
+MODEL_ROLES = {
+    "clarify": {"model": os.getenv("CLARIFY_MODEL", FAST_MODEL), "temperature": 0},
+    "route": {"model": os.getenv("ROUTE_MODEL", FAST_MODEL), "temperature": 0},
+    "tool_agent": {"model": os.getenv("TOOL_AGENT_MODEL", LARGE_MODEL), "temperature": 0},
+    # Condenses each worker result into a per-source digest as soon as it lands
+    "digest": {"model": os.getenv("DIGEST_MODEL", LARGE_MODEL), "temperature": 0},
+    # Summary agent model with higher temperature for more creative output
+    "summary": {"model": os.getenv("SUMMARY_MODEL", LARGE_MODEL), "temperature": 0.5},
+}
+MODEL_FALLBACK = os.getenv("MODEL_FALLBACK", "true").lower() == "true"
+_models = {}
+
+def init_model(model: str, temperature: float = 0):
+    """Get a chat model served by the Heurist endpoint, reusing instances.
+    
+    Args:
+        model: Model name
+        temperature: Sampling temperature
+    
+    Returns:
+        BaseChatModel: The chat model
+    """
+    key = (model, temperature)
+    if key not in _models:
+        _models[key] = init_chat_model(
+            model= model,
+            model_provider= "openai",
+            api_key= os.getenv("HEURIST_API_KEY"),
+            base_url= os.getenv("HEURIST_BASE_URL"),
+            temperature=temperature
+        )
+    return _models[key]
+
+def get_model_settings(role: str, config: RunnableConfig = None) -> dict:
+    """Resolve the model settings for a role.
+    
+    `configurable.models` may override a role with a model name or a
+    {"model": ..., "temperature": ...} dict.
+    
+    Args:
+        role: One of MODEL_ROLES (clarify, route, tool_agent, digest, summary)
+        config: RunnableConfig of the current run
+    
+    Returns:
+        dict: Model name and temperature
+    """
+    settings = dict(MODEL_ROLES[role])
+    override = (config or {}).get("configurable", {}).get("models", {}).get(role)
+    if isinstance(override, str):
+        settings["model"] = override
+    elif isinstance(override, dict):
+        settings.update(override)
+    return settings
+
+def get_model(role: str, config: RunnableConfig = None):
+    """Get the chat model configured for a role.
+    
+    Args:
+        role: One of MODEL_ROLES (clarify, route, tool_agent, digest, summary)
+        config: RunnableConfig of the current run
+    
+    Returns:
+        BaseChatModel: The chat model
+    """
+    settings = get_model_settings(role, config)
+    return init_model(settings["model"], settings.get("temperature", 0))
+
+def get_structured_model(role: str, schema: Type, config: RunnableConfig = None):
+    """Get a structured-output model for a role, falling back to the large model.
+    
+    When the role runs on a model other than LARGE_MODEL, output that fails
+    schema validation (or any other error) is retried once on LARGE_MODEL
+    unless `configurable.model_fallback` / MODEL_FALLBACK disables it.
+    
+    Args:
+        role: One of MODEL_ROLES
+        schema: Pydantic schema of the structured output
+        config: RunnableConfig of the current run
+    
+    Returns:
+        Runnable: Model returning `schema` instances
+    """
+    settings = get_model_settings(role, config)
+    fallback = (config or {}).get("configurable", {}).get("model_fallback", MODEL_FALLBACK)
+    model = get_model(role, config)
+    if not fallback or settings["model"] == LARGE_MODEL:
+        return model.with_structured_output(schema).with_retry(stop_after_attempt=max_structured_output_retries)
+
+    def count_fallback(messages):
+        metrics.incr("model.structured_fallbacks", role=role)
+        log_event("utils", f"Structured output from {settings['model']} failed for '{role}', falling back to {LARGE_MODEL}", logging.WARNING)
+        return messages
+
+    large = init_model(LARGE_MODEL, settings.get("temperature", 0))
+    large_structured = large.with_structured_output(schema).with_retry(stop_after_attempt=max_structured_output_retries)
+    return model.with_structured_output(schema).with_fallbacks([RunnableLambda(count_fallback) | large_structured])
 
 max_structured_output_retries = 3
 allow_clarification = True
@@ -47,8 +149,7 @@ async def tavily_search(
     topic: Annotated[Literal["general", "news", "finance"], InjectedToolArg] = "general",
     config: RunnableConfig = None
 ) -> str:
-    """
-    Fetches results from Tavily search API.
+    """Fetch results from the Tavily search API.
 
     Args:
         queries (List[str]): List of search queries, you can pass in as many queries as you need.
@@ -67,7 +168,7 @@ async def tavily_search(
     )
     
     # Format the search results and deduplicate results by URL
-    formatted_output = f"Search results: \n\n"
+    formatted_output = "Search results: \n\n"
     unique_results = {}
     for response in search_results:
         for result in response['results']:
@@ -75,12 +176,20 @@ async def tavily_search(
             if url not in unique_results:
                 unique_results[url] = {**result, "query": response['query']}
     
-    for i, (url, result) in enumerate(unique_results.items()):
+    # Collapse syndicated copies of a story, then keep the raw-content passages
+    # that best match each result's query
+    results = await asyncio.to_thread(dedup_search_results, list(unique_results.values()))
+    passages = await extract_passages_async(results)
+    for i, (result, extract) in enumerate(zip(results, passages)):
         formatted_output += f"\n\n--- SOURCE {i+1}: {result['title']} ---\n"
-        formatted_output += f"URL: {url}\n\n"
-        formatted_output += f"CONTENT:\n{result['content']}\n\n"
-        if result.get('raw_content'):
-            formatted_output += f"RAW CONTENT:\n{result['raw_content'][:1000]}...\n\n"
+        formatted_output += f"URL: {result['url']}\n"
+        if result["also_reported_by"]:
+            formatted_output += f"ALSO REPORTED BY: {len(result['also_reported_by'])} other sources ({', '.join(result['also_reported_by'][:5])})\n"
+        if result["first_seen"]:
+            formatted_output += f"FIRST SEEN: {result['first_seen']} (story already seen in earlier results)\n"
+        formatted_output += f"\nCONTENT:\n{result['content']}\n\n"
+        if extract:
+            formatted_output += f"RELEVANT PASSAGES:\n{extract}\n\n"
         formatted_output += "\n\n" + "-" * 80 + "\n"
     
     if unique_results:
@@ -88,9 +197,54 @@ async def tavily_search(
     else:
         return "No valid search results found. Please try different search queries or use a different search API."
 
-async def tavily_search_async(search_queries, max_results: int = 5, topic: Literal["general", "news", "finance"] = "general", include_raw_content: bool = True, config: RunnableConfig = None):
+# Cache TTL in seconds per Tavily topic: news and prices go stale quickly
+TAVILY_CACHE_TTLS = {
+    "news": float(os.getenv("TAVILY_CACHE_TTL_NEWS", "120")),
+    "finance": float(os.getenv("TAVILY_CACHE_TTL_FINANCE", "60")),
+    "general": float(os.getenv("TAVILY_CACHE_TTL_GENERAL", "1800")),
+}
+tavily_cache = ResponseCache(
+    max_entries=int(os.getenv("TAVILY_CACHE_MAX_ENTRIES", "512")),
+    store=open_cache_store("TAVILY_CACHE_DB", table="tavily_search"),
+)
+_tavily_clients = {}
+
+def normalize_search_query(query: str) -> str:
+    """Normalize a search query for cache lookups.
+    
+    Args:
+        query: Raw search query
+    
+    Returns:
+        str: Lowercased query with collapsed whitespace and no trailing punctuation
     """
-    Performs concurrent web searches with the Tavily API
+    return " ".join(query.lower().split()).rstrip("?!. ")
+
+def tavily_cache_key(query: str, topic: str, max_results: int, include_raw_content: bool) -> str:
+    """Cache key of a Tavily query with its search options."""
+    return json.dumps([normalize_search_query(query), topic, max_results, include_raw_content])
+
+def get_tavily_client(api_key: str) -> AsyncTavilyClient:
+    """Get the pooled Tavily client for an API key.
+    
+    Args:
+        api_key: Tavily API key
+    
+    Returns:
+        AsyncTavilyClient: A client reusing one HTTP connection pool per key and event loop
+    """
+    key = (id(asyncio.get_running_loop()), api_key)
+    client = _tavily_clients.get(key)
+    if client is None:
+        client = AsyncTavilyClient(api_key=api_key)
+        _tavily_clients[key] = client
+    return client
+
+async def tavily_search_async(search_queries, max_results: int = 5, topic: Literal["general", "news", "finance"] = "general", include_raw_content: bool = True, config: RunnableConfig = None):
+    """Perform concurrent web searches with the Tavily API, serving repeated queries from cache.
+    
+    Each query is retried on timeouts, 429s and 5xx, and fails fast while the
+    Tavily circuit breaker is open.
     
     Args:
         search_queries: List of search queries to execute
@@ -102,23 +256,34 @@ async def tavily_search_async(search_queries, max_results: int = 5, topic: Liter
     Returns:
         List[dict]: List of search responses from Tavily API
     """
-    tavily_async_client = AsyncTavilyClient(api_key=get_tavily_api_key(config))
+    keys = [tavily_cache_key(query, topic, max_results, include_raw_content) for query in search_queries]
+    search_docs = [await tavily_cache.get(key) for key in keys]
+    missing = [i for i, doc in enumerate(search_docs) if doc is MISS]
+    if not missing:
+        return search_docs
+
+    tavily_async_client = get_tavily_client(get_tavily_api_key(config))
     search_tasks = []
-    for query in search_queries:
+    for i in missing:
         search_tasks.append(
-            tavily_async_client.search(
+            resilient_call("tavily", lambda query=search_queries[i]: tavily_async_client.search(
                 query,
                 max_results=max_results,
                 include_raw_content=include_raw_content,
                 topic=topic
-            )
+            ))
         )
-    search_docs = await asyncio.gather(*search_tasks)
+    fetched = await asyncio.gather(*search_tasks)
+    ttl = TAVILY_CACHE_TTLS.get(topic, TAVILY_CACHE_TTLS["general"])
+    for i, doc in zip(missing, fetched):
+        search_docs[i] = doc
+        await tavily_cache.set(keys[i], doc, ttl)
     return search_docs
 
+TAVILY_CATALOG = ToolCatalogEntry.from_tools([tavily_search])
+
 def get_tavily_api_key(config: RunnableConfig):
-    """
-    Get Tavily API key from config or environment variables
+    """Get Tavily API key from config or environment variables.
     
     Args:
         config: RunnableConfig containing API keys
@@ -136,8 +301,7 @@ def get_tavily_api_key(config: RunnableConfig):
         return os.getenv("TAVILY_API_KEY")
 
 def get_current_date_time():
-    """
-    Get the current date and time in a formatted string.
+    """Get the current date and time in a formatted string.
     
     Returns:
         str: Current date and time in format "YYYY-MM-DD HH:MM:SS"
@@ -145,8 +309,7 @@ def get_current_date_time():
     return datetime.now().strftime("%Y-%m-%d %H:%M:%S")
 
 def get_current_date():
-    """
-    Get the current date in a formatted string.
+    """Get the current date in a formatted string.
     
     Returns:
         str: Current date in format "YYYY-MM-DD"
@@ -154,113 +317,220 @@ def get_current_date():
     return datetime.now().strftime("%Y-%m-%d")
 
 def get_current_time():
-    """
-    Get the current time in a formatted string.
+    """Get the current time in a formatted string.
     
     Returns:
         str: Current time in format "HH:MM:SS"
     """
     return datetime.now().strftime("%H:%M:%S")
 
-async def retry_mcp_tool_call(tool, args, max_retries=1, delay=3):
-    """
-    Retry MCP tool calls with delay on 400 errors.
+async def retry_mcp_tool_call(tool, args, config: RunnableConfig = None):
+    """Invoke an MCP tool with timeouts, backoff retries and the server's circuit breaker.
+    
+    Identical concurrent calls (same server, tool and canonical args) share
+    one upstream request, retries included. Paid tools are charged to the
+    request of the caller starting that upstream request only.
     
     Args:
         tool: The MCP tool to invoke
         args: Arguments for the tool call
-        max_retries: Maximum number of retries (default: 1)
-        delay: Delay in seconds between retries (default: 3)
+        config: RunnableConfig of the caller, for credit accounting
     
     Returns:
-        The tool result or raises the last exception
+        The tool result or raises the last exception (`CircuitOpenError` while the server is unhealthy)
+    
+    Raises:
+        CreditBudgetExceeded: When starting a paid call would exceed the request's credit budget
     """
-    last_exception = None
-    
-    for attempt in range(max_retries + 1):
-        try:
-            return await tool.ainvoke(args)
-        except Exception as e:
-            last_exception = e
-            error_str = str(e).lower()
-            
-            # Check if it's a 400 error or bad request
-            if ("400" in error_str or "bad request" in error_str or 
-                "client error" in error_str or "invalid request" in error_str):
-                
-                if attempt < max_retries:
-                    print(f"MCP tool call failed with 400 error (attempt {attempt + 1}/{max_retries + 1}). Retrying in {delay} seconds...")
-                    await asyncio.sleep(delay)
-                    continue
-                else:
-                    print(f"MCP tool call failed after {max_retries + 1} attempts. Returning error.")
-                    raise last_exception
-            else:
-                # For non-400 errors, don't retry
-                print(f"MCP tool call failed with non-400 error: {e}")
-                raise e
-    
-    # This should never be reached, but just in case
-    raise last_exception
-
-#tools heurist
-async def load_heurist_mcp(config: RunnableConfig) -> List[BaseTool]:
-    mcp_sse_url = os.getenv("HEURIST_MCP_URL")
-    mcp_server_config = {
-        "heurist_mcp": {
-            "transport": "sse",
-            "url": mcp_sse_url
-        }
-    }
+    server = tool_server(tool)
+    key = tool_call_key(tool, args)
+    # Checked right before `do` with no await in between, so only the leader reserves credits
+    reserved = 0.0 if tool_call_flight.joins(key) else credit_ledger.reserve(tool, config)
+    return await tool_call_flight.do(
+        key,
+        lambda: credit_ledger.settle(tool, config, reserved, lambda: resilient_call(server, lambda: tool.ainvoke(args))),
+        server=server,
+    )
 
+async def load_mcp_catalog(name: str, mcp_sse_url: str) -> ToolCatalogEntry:
+    """Load an MCP server's tools from the shared tool catalog cache.
+    
+    Args:
+        name: MCP server name
+        mcp_sse_url: SSE endpoint of the MCP server
+    
+    Returns:
+        ToolCatalogEntry: Cached tools with a name index, empty if the server is unreachable and nothing is cached
+    """
+    if not mcp_sse_url:
+        log_event("utils", f"Warning: no URL configured for MCP server '{name}'", logging.WARNING)
+        return ToolCatalogEntry(tools=[])
     try:
-        client = MultiServerMCPClient(mcp_server_config)
-        mcp_tools = await client.get_tools()
+        return await get_tool_catalog().get(name, mcp_sse_url)
     except Exception as e:
-        print(f"Error loading MCP tools: {e}")
+        log_event("utils", f"Error loading MCP tools: {e}", logging.WARNING)
         traceback.print_exception(type(e), e, e.__traceback__)
-        return []
-    return mcp_tools
-#tools flipside
-async def load_flipside_mcp(config: RunnableConfig) -> List[BaseTool]:
-    mcp_sse_url = os.getenv("FLIPSIDE_MCP_URLV2")
-    mcp_server_config = {
-        "flipside_mcp": {
-            "transport": "sse",
-            "url": mcp_sse_url
-        }
-    }
+        return ToolCatalogEntry(tools=[])
 
-    try:
-        client = MultiServerMCPClient(mcp_server_config)
-        mcp_tools = await client.get_tools()
-    except Exception as e:
-        print(f"Error loading MCP tools: {e}")
-        traceback.print_exception(type(e), e, e.__traceback__)
-        return []
-    return mcp_tools
+def bind_tools_cached(model, catalog: ToolCatalogEntry):
+    """Bind a tool catalog to a model, reusing the binding for the same model and catalog version.
+    
+    Args:
+        model: Chat model to bind tools to
+        catalog: Tool catalog entry
+    
+    Returns:
+        Runnable: The model with tools bound
+    """
+    return get_tool_catalog().bind_tools(model, catalog)
 
-# Tavily search tool
-async def load_tavily_search(config: RunnableConfig) -> List[BaseTool]:
+# Tool cache categories whose results are clustered for near-duplicates
+DEDUP_TOOL_CATEGORIES = {"news", "social"}
+# Tool cache categories whose price series are replaced with analytics digests
+ANALYTICS_TOOL_CATEGORIES = {"trading"}
+
+async def cached_mcp_tool_call(tool, args, config: RunnableConfig = None):
+    """Serve an MCP tool call from the result cache, or run it with retries.
+    
+    Paid tools are charged to the request's credit budget when they reach
+    the upstream server only; cache hits are free.
+    
+    Args:
+        tool: The MCP tool to invoke
+        args: Arguments for the tool call
+        config: RunnableConfig with optional `tool_cache_ttls` / `max_staleness` overrides
+            and `request_id` / `thread_id` / `tenant_id` / `credit_budget` for credit accounting
+    
+    Returns:
+        The cached or fresh tool result
+    
+    Raises:
+        CreditBudgetExceeded: When a paid call would exceed the request's credit budget
     """
-    Load Tavily search tool
+    return await tool_result_cache.call(tool, args, lambda: retry_mcp_tool_call(tool, args, config), config)
+
+async def flipside_tool_call(tool, args, config: RunnableConfig = None):
+    """Flipside MCP tool call with SQL queries served from the SQL result cache.
+    
+    `run_public_sql_query` results are cached by normalized SQL, and queries
+    wrapping a cached query as a subquery are answered locally. Other tools
+    go through the tool result cache.
+    
+    Args:
+        tool: The MCP tool to invoke
+        args: Arguments for the tool call
+        config: RunnableConfig with optional `tool_cache_ttls` / `max_staleness` overrides
+    
+    Returns:
+        The cached, locally computed or fresh tool result
+    """
+    if tool.name != SQL_TOOL_NAME:
+        return await cached_mcp_tool_call(tool, args, config)
+    return await get_sql_result_cache().call(tool, args, lambda: retry_mcp_tool_call(tool, args, config), config)
+
+async def processed_mcp_tool_call(tool, args, config: RunnableConfig = None):
+    """Run a cached MCP tool call with category-specific post-processing.
+    
+    Market-chart tools listed in SERIES_TOOLS are served from the local
+    time-series store, fetching only missing ranges. News and social results
+    have near-duplicates collapsed; trading results have their price series
+    replaced by analytics digests. Local tools
+    (e.g. `market_analytics`) are run directly.
+    
+    Args:
+        tool: The MCP tool to invoke
+        args: Arguments for the tool call
+        config: RunnableConfig with optional `tool_cache_ttls` / `max_staleness` overrides
+    
+    Returns:
+        The processed tool result
+    """
+    if tool_server(tool) == "local":
+        return await coalesced_tool_call(tool, args)
+    series_cache = get_series_tool_cache()
+    if series_cache.handles(tool):
+        result = await series_cache.call(tool, args, lambda call_args: cached_mcp_tool_call(tool, call_args, config))
+    else:
+        result = await cached_mcp_tool_call(tool, args, config)
+    category, _ = tool_result_cache.policy.resolve(tool.name)
+    if category in DEDUP_TOOL_CATEGORIES:
+        return await asyncio.to_thread(dedup_tool_output, result, tool_server(tool))
+    if category in ANALYTICS_TOOL_CATEGORIES:
+        return await asyncio.to_thread(digest_market_output, result, tool.name)
+    return result
+
+async def coalesced_tool_call(tool, args):
+    """Invoke a local tool, sharing one call between identical concurrent requests.
+    
+    Args:
+        tool: The tool to invoke
+        args: Arguments for the tool call
+    
+    Returns:
+        The tool result
+    """
+    return await tool_call_flight.do(
+        tool_call_key(tool, args),
+        lambda: tool.ainvoke(args),
+        server=tool_server(tool),
+    )
+
+#tools heurist
+async def load_heurist_mcp(config: RunnableConfig) -> ToolCatalogEntry:
+    """Load the Heurist MCP tool catalog."""
+    return await load_mcp_catalog("heurist_mcp", os.getenv("HEURIST_MCP_URL"))
+
+_heurist_catalogs = {}
+
+async def load_heurist_tools(config: RunnableConfig) -> ToolCatalogEntry:
+    """Load the Heurist MCP tools together with the local `market_analytics` tool.
+    
+    Paid tools have their credit cost prefixed to their description. The merged entry is memoized per MCP catalog version, so tool bindings
+    are still reused across runs.
+    
+    Args:
+        config: RunnableConfig of the current run
+    
+    Returns:
+        ToolCatalogEntry: Heurist tools plus market analytics, empty if the MCP server is unavailable
+    """
+    entry = await load_heurist_mcp(config)
+    if not entry:
+        return entry
+    if entry.version not in _heurist_catalogs:
+        _heurist_catalogs.clear()
+        _heurist_catalogs[entry.version] = ToolCatalogEntry(
+            tools=[with_credit_cost(t) for t in entry.tools] + [market_analytics],
+            schemas=entry.schemas,
+            fetched_at=entry.fetched_at,
+            version=f"{entry.version}+analytics",
+        )
+    return _heurist_catalogs[entry.version]
+#tools flipside
+async def load_flipside_mcp(config: RunnableConfig) -> ToolCatalogEntry:
+    """Load the Flipside MCP tool catalog."""
+    return await load_mcp_catalog("flipside_mcp", os.getenv("FLIPSIDE_MCP_URLV2"))
+
+# Tavily search tool
+async def load_tavily_search(config: RunnableConfig) -> ToolCatalogEntry:
+    """Load Tavily search tool.
     
     Args:
         config: RunnableConfig for API key access
     
     Returns:
-        List[BaseTool]: List containing the Tavily search tool
+        ToolCatalogEntry: Catalog containing the Tavily search tool
     """
     try:
         # Check if Tavily API key is available
         api_key = get_tavily_api_key(config)
         if not api_key:
-            print("Warning: TAVILY_API_KEY not found in environment variables or config")
-            return []
+            log_event("utils", "Warning: TAVILY_API_KEY not found in environment variables or config", logging.WARNING)
+            return ToolCatalogEntry(tools=[])
         
         # Return the tavily_search tool
-        return [tavily_search]
+        return TAVILY_CATALOG
     except Exception as e:
-        print(f"Error loading Tavily search tool: {e}")
+        log_event("utils", f"Error loading Tavily search tool: {e}", logging.WARNING)
         traceback.print_exception(type(e), e, e.__traceback__)
-        return []
+        return ToolCatalogEntry(tools=[])
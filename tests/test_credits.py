@@ -0,0 +1,110 @@
+import asyncio
+import json
+
+import pytest
+
+from src.credits import CreditBudgetExceeded, CreditCosts, CreditLedger, credit_ledger
+from src.utils import retry_mcp_tool_call
+
+
+class FakeTool:
+    def __init__(self, name, server="heurist_mcp", result="ok", error=None):
+        self.name = name
+        self.metadata = {"mcp_server": server}
+        self.result = result
+        self.error = error
+        self.release = asyncio.Event()
+        self.calls = 0
+
+    async def ainvoke(self, args):
+        self.calls += 1
+        await self.release.wait()
+        if self.error:
+            raise self.error
+        return self.result
+
+
+def request(request_id, budget=None, thread_id="thread", tenant_id="tenant"):
+    configurable = {"request_id": request_id, "thread_id": thread_id, "tenant_id": tenant_id}
+    if budget is not None:
+        configurable["credit_budget"] = budget
+    return {"configurable": configurable}
+
+
+@pytest.fixture
+def ledger():
+    return CreditLedger(CreditCosts(overrides={"arkhamintelligenceagent_get_address_intelligence": 3}))
+
+
+def test_costs_follow_category_rules_and_overrides(ledger):
+    costs = ledger.costs
+    assert costs.resolve(FakeTool("coingeckotokeninfoagent_get_token_info")) == ("trading", 1)
+    assert costs.resolve(FakeTool("arkhamintelligenceagent_get_address_intelligence")) == ("blockchain_intelligence", 3)
+    assert costs.resolve(FakeTool("dexscreenertokeninfoagent_search_pairs")) == ("free", 0)
+    # Only Heurist tools are paid
+    assert costs.resolve(FakeTool("coingecko_prices", server="flipside_mcp")) == ("free", 0)
+
+
+def test_reserve_charges_request_thread_and_tenant(ledger):
+    tool = FakeTool("coingeckotokeninfoagent_get_token_info")
+    config = request("r1", budget=5)
+    assert ledger.reserve(tool, config) == 1
+    assert ledger.reserve(tool, config) == 1
+    assert ledger.spent(config) == 2
+    assert ledger.remaining(config) == 3
+    assert ledger.snapshot() == {"threads": {"thread": 2}, "tenants": {"tenant": 2}}
+    assert ledger.reserve(FakeTool("dexscreenertokeninfoagent_search_pairs"), config) == 0
+    assert ledger.spent(config) == 2
+
+
+def test_reserve_rejects_calls_over_budget(ledger):
+    tool = FakeTool("arkhamintelligenceagent_get_address_intelligence")
+    config = request("r1", budget=5)
+    ledger.reserve(tool, config)
+    with pytest.raises(CreditBudgetExceeded) as error:
+        ledger.reserve(tool, config)
+    payload = json.loads(str(error.value))
+    assert payload["error"] == "credit_budget_exceeded"
+    assert (payload["cost"], payload["spent"], payload["remaining"]) == (3, 3, 2)
+    # Rejected calls are not charged, and cheaper calls still fit
+    assert ledger.spent(config) == 3
+    assert ledger.reserve(FakeTool("coingeckotokeninfoagent_get_token_info"), config) == 1
+    # Other requests have their own budget
+    assert ledger.reserve(tool, request("r2", budget=5)) == 3
+
+
+def test_settle_refunds_failed_calls_only(ledger):
+    async def run():
+        ok = FakeTool("coingeckotokeninfoagent_get_token_info")
+        ok.release.set()
+        failing = FakeTool("coingeckotokeninfoagent_get_token_info", error=RuntimeError("boom"))
+        failing.release.set()
+        config = request("r1")
+
+        reserved = ledger.reserve(ok, config)
+        assert await ledger.settle(ok, config, reserved, lambda: ok.ainvoke({})) == "ok"
+        assert ledger.spent(config) == 1
+
+        reserved = ledger.reserve(failing, config)
+        with pytest.raises(RuntimeError):
+            await ledger.settle(failing, config, reserved, lambda: failing.ainvoke({}))
+        assert ledger.spent(config) == 1
+        assert ledger.snapshot()["tenants"] == {"tenant": 1}
+
+    asyncio.run(run())
+
+
+def test_only_the_leader_of_coalesced_calls_pays():
+    async def run():
+        tool = FakeTool("coingeckotokeninfoagent_get_token_info")
+        leader, follower = request("leader-request"), request("follower-request")
+        calls = [asyncio.ensure_future(retry_mcp_tool_call(tool, {"token": "aave"}, config))
+                 for config in (leader, follower)]
+        await asyncio.sleep(0.05)
+        tool.release.set()
+        assert await asyncio.gather(*calls) == ["ok", "ok"]
+        assert tool.calls == 1
+        assert credit_ledger.spent(leader) == 1
+        assert credit_ledger.spent(follower) == 0
+
+    asyncio.run(run())
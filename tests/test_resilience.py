@@ -0,0 +1,114 @@
+import pytest
+
+from src import resilience
+from src.resilience import CircuitBreaker, CircuitOpenError
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(resilience.time, "monotonic", clock)
+    return clock
+
+
+@pytest.fixture
+def breaker(clock):
+    return CircuitBreaker("test_server", failure_threshold=3, cooldown=10, max_cooldown=25)
+
+
+def trip(breaker):
+    for _ in range(breaker.failure_threshold):
+        breaker.record_failure("server")
+
+
+def test_opens_after_consecutive_failures(breaker):
+    breaker.record_failure("timeout")
+    breaker.record_failure("connection")
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.before_call() is False
+    breaker.record_failure("server")
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.available()
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+
+def test_success_resets_the_failure_count(breaker):
+    breaker.record_failure("server")
+    breaker.record_failure("server")
+    breaker.record_success()
+    breaker.record_failure("server")
+    breaker.record_failure("server")
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+@pytest.mark.parametrize("kind", ["rate_limited", "bad_request", "other"])
+def test_client_side_errors_do_not_count(breaker, kind):
+    for _ in range(5):
+        breaker.record_failure(kind)
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_single_probe_after_cooldown_closes_on_success(breaker, clock):
+    trip(breaker)
+    clock.now += 9
+    with pytest.raises(CircuitOpenError) as error:
+        breaker.before_call()
+    assert error.value.retry_in == pytest.approx(1)
+
+    clock.now += 1
+    assert breaker.available()
+    assert breaker.before_call() is True
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert not breaker.available()
+    # Only one probe at a time
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+    breaker.record_success(probe=True)
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.before_call() is False
+
+
+def test_failed_probe_reopens_with_doubled_cooldown(breaker, clock):
+    trip(breaker)
+    for cooldown in (20, 25, 25):
+        clock.now += breaker.cooldown
+        assert breaker.before_call() is True
+        breaker.record_failure("timeout", probe=True)
+        assert breaker.state == CircuitBreaker.OPEN
+        assert breaker.cooldown == cooldown
+        assert breaker.retry_in() == cooldown
+
+    clock.now += breaker.cooldown
+    assert breaker.before_call() is True
+    breaker.record_success(probe=True)
+    # A later trip starts again from the base cooldown
+    trip(breaker)
+    assert breaker.retry_in() == 10
+
+
+def test_probe_answered_with_a_client_error_closes(breaker, clock):
+    trip(breaker)
+    clock.now += 10
+    assert breaker.before_call() is True
+    breaker.record_failure("bad_request", probe=True)
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_released_probe_returns_to_open(breaker, clock):
+    trip(breaker)
+    clock.now += 10
+    assert breaker.before_call() is True
+    breaker.release_probe()
+    assert breaker.state == CircuitBreaker.OPEN
+    # The cooldown has passed, so the next call becomes the probe
+    assert breaker.before_call() is True
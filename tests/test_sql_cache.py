@@ -0,0 +1,115 @@
+import json
+
+import pytest
+
+from src.sql_cache import (
+    CachedResult,
+    SQLResultCache,
+    SQLResultStore,
+    normalize_sql,
+    parse_result,
+    sql_argument,
+    sql_cache_key,
+)
+
+# 2024-01-02T00:00:00Z
+NOW = 1704153600
+
+BASE_SQL = "SELECT chain, protocol, fees, txs, day FROM ez_protocol_daily"
+BASE_RESPONSE = json.dumps({
+    "columns": ["chain", "protocol", "fees", "txs", "day"],
+    "rows": [
+        ["ethereum", "Uniswap", 10, 4, "2024-01-01T00:00:00.000Z"],
+        ["ethereum", "uniswap-v2", 5, 2, "2024-01-02T00:00:00.000Z"],
+        ["solana", "Orca", 7, 2, "2024-01-03T00:00:00.000Z"],
+        ["solana", "Raydium", 1.5, None, "2024-01-03T00:00:00.000Z"],
+    ],
+})
+
+
+@pytest.mark.parametrize("sql, normalized", [
+    ("SELECT  *\nFROM T -- latest\n WHERE a = 1;", "select*from t where a=1"),
+    ("select * /* all */ from t where A=1", "select*from t where a=1"),
+    ("SELECT * FROM t WHERE name = 'Uniswap'", "select*from t where name='Uniswap'"),
+    ("SELECT \"MixedCase\" FROM t", 'select "MixedCase" from t'),
+    ("SELECT 'a -- not a comment' FROM t", "select 'a -- not a comment' from t"),
+    ("SELECT * FROM t WHERE addr = '0xAbC'", "select*from t where addr='0xabc'"),
+    ("SELECT * FROM t WHERE day >= CURRENT_DATE - 7", "select*from t where day>='2024-01-02'-7"),
+    ("select * from t where day >= dateadd(day, -7, GETDATE())", "select*from t where day>=dateadd(day,-7,'2024-01-02')"),
+])
+def test_normalize_sql(sql, normalized):
+    assert normalize_sql(sql, now=NOW) == normalized
+
+
+def test_cache_key_covers_options_and_day():
+    assert sql_cache_key("SELECT 1", {}, now=NOW) == sql_cache_key("select 1;", None, now=NOW)
+    assert sql_cache_key("SELECT 1", {"page": 2}, now=NOW) != sql_cache_key("SELECT 1", {}, now=NOW)
+    relative = "SELECT * FROM t WHERE day >= CURRENT_DATE"
+    assert sql_cache_key(relative, now=NOW) == sql_cache_key(relative, now=NOW + 3600)
+    assert sql_cache_key(relative, now=NOW) != sql_cache_key(relative, now=NOW + 86400)
+
+
+def test_sql_argument_splits_sql_from_options():
+    assert sql_argument({"sql": "SELECT 1", "page": 2}) == ("SELECT 1", {"page": 2})
+    assert sql_argument({"query": "SELECT 1"}) == ("SELECT 1", {})
+    assert sql_argument("SELECT 1") == (None, {})
+
+
+@pytest.fixture
+def cache(tmp_path):
+    store = SQLResultStore(str(tmp_path))
+    table = parse_result(BASE_RESPONSE)
+    store.set(sql_cache_key(BASE_SQL, {}), CachedResult(table=table, response=BASE_RESPONSE, complete=True))
+    return SQLResultCache(store)
+
+
+def local_rows(cache, outer_sql):
+    answer = cache._answer_locally(outer_sql.format(base=BASE_SQL), {}, 3600)
+    return None if answer is None else json.loads(answer.response)["rows"]
+
+
+# Expected rows are what Snowflake returns for the same query over the same data
+@pytest.mark.parametrize("outer_sql, snowflake_rows", [
+    ("SELECT COUNT(*) FROM ({base}) t WHERE protocol = 'Uniswap'", [[1]]),
+    ("SELECT SUM(fees) FROM ({base}) t WHERE chain = 'ethereum'", [[15]]),
+    ("SELECT SUM(fees) AS total FROM ({base}) t WHERE chain = 'solana'", [[8.5]]),
+    ("SELECT COUNT(txs), MIN(txs), MAX(fees) FROM ({base}) t", [[3, 2, 10]]),
+    ("SELECT chain, SUM(txs) AS n FROM ({base}) t GROUP BY chain HAVING n > 2", [["ethereum", 6]]),
+    ("SELECT COUNT(DISTINCT chain) FROM ({base}) t WHERE fees BETWEEN 5 AND 10", [[2]]),
+    ("SELECT protocol FROM ({base}) t WHERE chain IN ('solana') AND txs IS NULL", [["Raydium"]]),
+    ("SELECT protocol FROM ({base}) t WHERE day >= '2024-01-03T00:00:00.000Z' AND fees > -1 AND NOT fees < 7",
+     [["Orca"]]),
+])
+def test_local_answers_match_snowflake(cache, outer_sql, snowflake_rows):
+    assert local_rows(cache, outer_sql) == snowflake_rows
+
+
+@pytest.mark.parametrize("outer_sql", [
+    # SQLite divides integers: 15 / 6 gives 2, Snowflake 2.5
+    "SELECT SUM(fees) / SUM(txs) FROM ({base}) t WHERE chain = 'ethereum'",
+    # SQLite LIKE ignores case: 2 rows, Snowflake 1
+    "SELECT COUNT(*) FROM ({base}) t WHERE protocol LIKE 'uni%'",
+    # SQLite sorts NULLs first, Snowflake last
+    "SELECT protocol FROM ({base}) t ORDER BY txs LIMIT 1",
+    # Snowflake compares as timestamps: '2024-01-02' <= '2024-01-02T00:00:00.000Z' is true there
+    "SELECT COUNT(*) FROM ({base}) t WHERE day <= '2024-01-02'",
+    # Snowflake rejects ungrouped columns, SQLite picks an arbitrary row
+    "SELECT chain, protocol FROM ({base}) t GROUP BY chain",
+    "SELECT UPPER(protocol) FROM ({base}) t",
+    "SELECT fees + txs FROM ({base}) t",
+    "SELECT COUNT(*) FROM ({base}) t WHERE txs = '2'",
+])
+def test_dialect_dependent_queries_go_to_flipside(cache, outer_sql):
+    assert local_rows(cache, outer_sql) is None
+
+
+def test_partial_results_are_not_answered_locally(tmp_path):
+    store = SQLResultStore(str(tmp_path))
+    store.set(sql_cache_key(BASE_SQL, {}),
+              CachedResult(table=parse_result(BASE_RESPONSE), response=BASE_RESPONSE, complete=False))
+    assert local_rows(SQLResultCache(store), "SELECT COUNT(*) FROM ({base}) t") is None
+
+
+def test_integers_beyond_int64_are_kept_exact():
+    table = parse_result(json.dumps([{"amount": 10 ** 20}, {"amount": 1}]))
+    assert table.rows() == [["100000000000000000000"], ["1"]]
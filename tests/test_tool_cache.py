@@ -0,0 +1,31 @@
+import pytest
+
+from src.tool_cache import ToolCachePolicy
+
+
+@pytest.mark.parametrize("tool_name, category", [
+    ("run_public_sql_query", "sql"),
+    ("find_relevant_metrics", "metadata"),
+    ("coingeckotokeninfoagent_get_token_info", "trading"),
+    ("coingeckotokeninfoagent_get_trending_coins", "trading"),
+    ("coingeckotokeninfoagent_get_market_chart", "trading"),
+    ("dexscreenertokeninfoagent_search_pairs", "trading"),
+    ("bitquerysolanatokeninfoagent_get_top_trending_tokens", "trading"),
+    ("elfatwitterintelligenceagent_get_trending_tokens", "social"),
+    ("elfatwitterintelligenceagent_search_mentions", "social"),
+    ("twitterinsightagent_get_smart_mentions_feed", "social"),
+    ("mindaikolagent_get_kol_statistics", "social"),
+    ("allorapricepredictionagent_get_allora_prediction", "prediction"),
+    ("exasearchagent_exa_web_search", "news"),
+    ("firecrawlsearchagent_firecrawl_web_search", "news"),
+    ("arkhamintelligenceagent_get_address_intelligence", "onchain"),
+    ("pondwalletanalysisagent_analyze_ethereum_wallet", "onchain"),
+])
+def test_heurist_and_flipside_tools_get_their_category(tool_name, category):
+    assert ToolCachePolicy(overrides={}).resolve(tool_name)[0] == category
+
+
+def test_overrides_win_over_categories():
+    policy = ToolCachePolicy(overrides={"elfatwitterintelligenceagent_get_trending_tokens": 5, "social": 60})
+    assert policy.resolve("elfatwitterintelligenceagent_get_trending_tokens") == ("social", 5)
+    assert policy.resolve("twitterinsightagent_get_smart_mentions_feed") == ("social", 60)